@@ -0,0 +1,100 @@
+"""Check that streaming and normal urbs reports hold the same results
+
+Solves the urbs model of an input file once and writes its report twice,
+with pandas and streaming with xlsxwriter (urbs.report(..., streaming=True)).
+Both must hold the same sheets and values (see urbs.compare_reports). Besides
+the default report tuples, a grouped case is checked: repeated tuples and a
+group of all sites, which are added together into one sheet each.
+
+Usage:
+    python check_reports.py --input mimo.xlsx --length 10
+
+Exits with status 1 if a report pair differs.
+"""
+
+###############################################################################
+# IMPORTS
+###############################################################################
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import connection_oep as conn
+import urbs
+from mimo import create_um
+
+
+def check_reports(model, directory, **kwargs):
+    """
+    Writes a normal and a streaming report of a model and compares them
+
+    Args:
+        model: a solved urbs model instance
+        directory: directory the two report files are written to
+        **kwargs: keyword arguments of urbs.report, e.g. report_tuples
+
+    Returns:
+        list of differences, see urbs.compare_reports
+    """
+    filename = os.path.join(directory, 'report.xlsx')
+    streaming = os.path.join(directory, 'streaming.xlsx')
+    urbs.report(model, filename, **kwargs)
+    urbs.report(model, streaming, streaming=True, **kwargs)
+    return urbs.compare_reports(filename, streaming)
+
+
+def grouped_tuples(model):
+    """
+    Returns report tuples and names exercising the grouping of the report
+
+    Every demand tuple is given twice, and each demand commodity once more
+    for all sites together.
+
+    Args:
+        model: a urbs model instance
+
+    Returns:
+        (report_tuples, report_sites_name)
+    """
+    demand = list(urbs.get_input(model, 'demand').columns)
+    sites = tuple(sorted({sit for sit, com in demand}))
+    commodities = sorted({com for sit, com in demand})
+    report_tuples = demand + demand + [(list(sites), com)
+                                       for com in commodities]
+    return report_tuples, {sites: 'All sites'}
+
+
+def main(input_file, offset, length):
+    data = conn.write_data(conn.read_data(input_file))
+    urbs.validate_input(data)
+    model, _ = create_um(data, range(offset, offset + length + 1))
+
+    report_tuples, report_sites_name = grouped_tuples(model)
+    cases = {'default': {},
+             'grouped': {'report_tuples': report_tuples,
+                         'report_sites_name': report_sites_name}}
+
+    failed = False
+    directory = tempfile.mkdtemp(prefix='check-reports-')
+    try:
+        for name, kwargs in cases.items():
+            differences = check_reports(model, directory, **kwargs)
+            print('{}: {}'.format(name, 'same' if not differences else
+                                  '; '.join(differences)))
+            failed = failed or bool(differences)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', dest='input_file', default='mimo.xlsx')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='first time step')
+    parser.add_argument('--length', type=int, default=10,
+                        help='number of modelled time steps')
+    args = parser.parse_args()
+    sys.exit(1 if main(**vars(args)) else 0)
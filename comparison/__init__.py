@@ -2,4 +2,11 @@
 
 """
 
+from .benchmark import *
 from .compare import *
+from .engine import *
+from .lpstats import *
+from .metrics import *
+from .profiling import *
+from .report import *
+from .scaling import *
@@ -0,0 +1,268 @@
+import cProfile
+import math
+import multiprocessing
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .profiling import write_profile
+
+
+class PhaseRecorder:
+    """Wall time and memory peak of named phases of a run
+
+    Usage:
+        recorder = PhaseRecorder(trace_memory=True)
+        with recorder.phase('urbs_build'):
+            model = urbs.create_model(data, 1, timesteps)
+
+    Attributes:
+        trace_memory: whether to measure tracemalloc peaks per phase
+        profile_dir: directory to write a cProfile run of each phase to,
+                     as '<phase>.pstats' and '<phase>.collapsed' (see
+                     write_profile); None disables profiling
+        phases: A dict of phase name: {'time': seconds, 'memory': peak Mb
+                allocated by Python within the phase, or None}
+
+    Phases should not be nested while tracing memory or profiling, as each
+    phase resets the tracemalloc peak and only one profiler can be active.
+    """
+
+    def __init__(self, trace_memory=False, profile_dir=None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Records wall time (and tracemalloc peak) of the enclosed code"""
+        tracing = self.trace_memory
+        if tracing:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        profile = None
+        if self.profile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                write_profile(profile, self.profile_dir, name)
+            memory = None
+            if tracing:
+                memory = (tracemalloc.get_traced_memory()[1] - base) / \
+                    1024.0 ** 2
+                if started:
+                    tracemalloc.stop()
+            self.phases[name] = {'time': elapsed, 'memory': memory}
+
+    def time(self, name):
+        """Returns the wall time of a phase in seconds"""
+        return self.phases[name]['time']
+
+    def to_dict(self):
+        """Returns '<phase>_time' and '<phase>_memory' entries as flat dict"""
+        record = {}
+        for name, phase in self.phases.items():
+            record[name+'_time'] = phase['time']
+            record[name+'_memory'] = phase['memory']
+        return record
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of the current process in Mb
+
+    Returns:
+        peak memory in Mb, or None if it cannot be determined
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024.0 ** 2
+    # Linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_isolated(function, *args, **kwargs):
+    """
+    Runs a function in a freshly spawned Python process
+
+    The process starts from a clean interpreter (no models, caches or global
+    state of earlier runs), so its peak memory belongs to this run alone.
+
+    Args:
+        function: a picklable (module level) function
+        *args, **kwargs: its arguments
+
+    Returns:
+        the return value of function
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(function, *args, **kwargs).result()
+
+
+def run_points(function, points, repeat=3, isolated=True, **kwargs):
+    """
+    Runs a benchmark function for several points, repeatedly
+
+    Args:
+        function: function(point, **kwargs) returning a flat dict record
+        points: list of benchmark points, e.g. horizon lengths
+        repeat: number of runs per point
+        isolated: run each repetition in a fresh process (see run_isolated)
+        **kwargs: further arguments of function
+
+    Returns:
+        records: a DataFrame with one row per run, with the columns 'point'
+                 and 'repeat' and the entries of the records
+    """
+    records = []
+    for point in points:
+        for k in range(repeat):
+            if isolated:
+                record = run_isolated(function, point, **kwargs)
+            else:
+                record = function(point, **kwargs)
+            record = dict(record)
+            record['point'] = point
+            record['repeat'] = k
+            records.append(record)
+    return pd.DataFrame(records)
+
+
+def summarize_records(records, by='point'):
+    """
+    Summarizes repeated benchmark records per point
+
+    Args:
+        records: a DataFrame as returned by run_points
+        by: column identifying the point
+
+    Returns:
+        summary: a DataFrame indexed by point, with the columns
+                 (record column, 'median'/'min'/'max') for all numeric
+                 record columns
+    """
+    numeric = records.drop(columns=['repeat'], errors='ignore') \
+                     .select_dtypes('number')
+    if by not in numeric:
+        numeric[by] = records[by]
+    return numeric.groupby(by).agg(['median', 'min', 'max'])
+
+
+def geometric_grid(start, stop, points):
+    """
+    Returns integer points spaced evenly on a logarithmic scale
+
+    Args:
+        start: first point (at least 1)
+        stop: last point
+        points: number of points; fewer are returned where rounding makes
+                neighbours equal
+
+    Returns:
+        a sorted list of integers, including start and stop
+    """
+    grid = np.round(np.geomspace(start, stop, points)).astype(int)
+    return sorted(set(grid.tolist()))
+
+
+def bend_points(points, values, tolerance=0.25):
+    """
+    Returns new points where a curve bends on a log-log scale
+
+    The slopes of neighbouring segments of the curve are compared in
+    log-log space, i.e. as local scaling exponents. Where two adjacent
+    slopes differ by more than tolerance, the geometric midpoints of both
+    segments are returned.
+
+    Args:
+        points: sorted sampled points
+        values: values at the points; points with non-positive or missing
+                values are ignored
+        tolerance: largest accepted change of the local exponent
+
+    Returns:
+        a sorted list of new integer points
+    """
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = (points > 0) & (values > 0) & np.isfinite(values)
+    points, values = points[valid], values[valid]
+    if len(points) < 3:
+        return []
+
+    slopes = np.diff(np.log(values)) / np.diff(np.log(points))
+    new = set()
+    for k in np.flatnonzero(np.abs(np.diff(slopes)) > tolerance):
+        for a, b in [(points[k], points[k+1]), (points[k+1], points[k+2])]:
+            middle = int(round(math.sqrt(a * b)))
+            if a < middle < b:
+                new.add(middle)
+    return sorted(new)
+
+
+def adaptive_points(function, start, stop, columns, initial=6, max_points=20,
+                    tolerance=0.25, repeat=3, isolated=True, **kwargs):
+    """
+    Runs a benchmark on a geometric grid, refined where the curves bend
+
+    Starts with a geometric grid of initial points between start and stop.
+    Then, as long as fewer than max_points have been sampled, the points
+    where the median of any of the given columns bends (see bend_points)
+    are added.
+
+    Args:
+        function: function(point, **kwargs) returning a flat dict record
+        start: smallest point, e.g. horizon length 1
+        stop: largest point
+        columns: record columns whose curves guide the refinement, e.g.
+                 ['urbs_build_time', 'oemof_build_time']
+        initial: number of points of the initial grid
+        max_points: largest number of sampled points
+        tolerance: largest accepted change of the local scaling exponent
+        repeat: number of runs per point
+        isolated: run each repetition in a fresh process (see run_isolated)
+        **kwargs: further arguments of function
+
+    Returns:
+        records: a DataFrame as returned by run_points, sorted by point
+    """
+    sampled = geometric_grid(start, stop, min(initial, max_points))
+    records = run_points(function, sampled, repeat, isolated, **kwargs)
+
+    while len(sampled) < max_points:
+        summary = summarize_records(records)
+        new = set()
+        for column in columns:
+            if column in summary:
+                median = summary[(column, 'median')]
+                new.update(bend_points(median.index, median.values,
+                                       tolerance))
+        new = sorted(new - set(sampled))[:max_points - len(sampled)]
+        if not new:
+            break
+        sampled.extend(new)
+        records = pd.concat([records, run_points(function, new, repeat,
+                                                 isolated, **kwargs)],
+                            ignore_index=True)
+
+    return records.sort_values(['point', 'repeat']).reset_index(drop=True)
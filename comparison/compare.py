@@ -1,12 +1,13 @@
 import os
 import sys
-import re as r
 import pandas as pd
 import numpy as np
-import oemof.solph as solph
-import oemof.outputlib as outputlib
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from urbs.plot import init_render_worker
+from .engine import (variable_mapping, aligned_timeseries, aligned_scalars,
+                     compare_models, urbs_set)
+from .lpstats import scan_lp_file, read_label_map
 
 
 def prepare_result_directory(result_name):
@@ -22,28 +23,21 @@ def prepare_result_directory(result_name):
     return result_dir
 
 
-def _file_len(filename):
-    with open(filename) as f:
-        for i, l in enumerate(f):
-            pass
-    return i
+def compare_cpu_and_memory(urbs_metrics, oemof_metrics):
+    """
+    Compares solver time and memory of the urbs and oemof solves
 
+    Args:
+        urbs_metrics: SolverMetrics of the urbs solve, see measure_solve
+        oemof_metrics: SolverMetrics of the oemof solve
 
-def compare_cpu_and_memory():
-    # memory info & cpu time
-    with open('urbs_log.txt', 'r') as urbslog:
-        urbslog = urbslog.read().replace('\n', ' ')
-        mem_urbs = float(urbslog[urbslog.find('Memory used:')+12:
-                                 urbslog.find('Mb')])
-        cpu_urbs = float(urbslog[urbslog.find('Time used:')+10:
-                                 urbslog.find('secs')])
-
-    with open('oemof_log.txt', 'r') as oemoflog:
-        oemoflog = oemoflog.read().replace('\n', ' ')
-        mem_oemof = float(oemoflog[oemoflog.find('Memory used:')+12:
-                                   oemoflog.find('Mb')])
-        cpu_oemof = float(oemoflog[oemoflog.find('Time used:')+10:
-                                   oemoflog.find('secs')])
+    Returns:
+        cpu_urbs, mem_urbs, cpu_oemof, mem_oemof: solver-reported time (wall
+        time if not reported) and measured peak memory (reported memory if
+        not measured)
+    """
+    cpu_urbs, mem_urbs = _time_and_memory(urbs_metrics)
+    cpu_oemof, mem_oemof = _time_and_memory(oemof_metrics)
 
     # Terminal Output CPU
     print('Time Used')
@@ -56,401 +50,254 @@ def compare_cpu_and_memory():
     print('Memory Used')
     print('urbs\t', mem_urbs, ' Mb')
     print('oemof\t', mem_oemof, ' Mb')
-    print('Diff\t', format(mem_urbs - mem_oemof, '.1f'), ' Mb')
+    if mem_urbs is not None and mem_oemof is not None:
+        print('Diff\t', format(mem_urbs - mem_oemof, '.1f'), ' Mb')
     print('----------------------------------------------------')
 
     return cpu_urbs, mem_urbs, cpu_oemof, mem_oemof
 
 
-def compare_lp_files():
-    # open urbs lp file
-    with open('mimo_urbs.lp', 'r') as urbslp:
-
-        # create constraint file
-        const = open('constraints_urbs.txt', 'w+')
-
-        for line in urbslp:
-            # find constraints
-            ce = r.match(r'c_e_(.*)\_', line)
-            cu = r.match(r'c_u_(.*)\_', line)
-            re = r.match(r'r_e_(.*)\_', line)
-            rl = r.match(r'r_l_(.*)\_', line)
-
-            # write constraints
-            if ce:
-                const.write(ce.group(1))
-                const.write('\n')
-            if cu:
-                const.write(cu.group(1))
-                const.write('\n')
-            if re:
-                const.write(re.group(1))
-                const.write('\n')
-            if rl:
-                const.write(rl.group(1))
-                const.write('\n')
-        const.close()
-
-    # open oemof lp file
-    with open('mimo_oemof.lp', 'r') as oemoflp:
-
-        # create constraint file
-        const = open('constraints_oemof.txt', 'w+')
-
-        for line in oemoflp:
-            # find constraints
-            ce = r.match(r'c_e_(.*)\_', line)
-            cu = r.match(r'c_u_(.*)\_', line)
-
-            # write constraints
-            if ce:
-                const.write(ce.group(1))
-                const.write('\n')
-            if cu:
-                const.write(cu.group(1))
-                const.write('\n')
-        const.close()
-
-    u_const_amount = _file_len('constraints_urbs.txt')
-    o_const_amount = _file_len('constraints_oemof.txt')
+def _time_and_memory(metrics):
+    # preferred time and memory figures of SolverMetrics
+    cpu = metrics.solver_time
+    if cpu is None:
+        cpu = metrics.wall_time
+    memory = metrics.peak_memory
+    if memory is None:
+        memory = metrics.reported_memory
+    return cpu, memory
 
-    # Terminal Output
-    print('Constraint Amount')
-    print('urbs\t', u_const_amount)
-    print('oemof\t', o_const_amount)
-    print('Diff\t', u_const_amount - o_const_amount)
-    print('----------------------------------------------------')
 
-    return u_const_amount, o_const_amount
+def compare_lp_files(urbs_file='mimo_urbs.lp', oemof_file='mimo_oemof.lp'):
+    """
+    Compares the size of the urbs and oemof LP (or MPS) files
 
+    Label maps next to the files (filename + '.labels', see write_label_map)
+    are used to name the constraint blocks.
 
-def compare_storages(urbs_model, oemof_model, threshold):
-    # restore oemof energysytem results
-    oemof_model = solph.EnergySystem()
-    oemof_model.restore(dpath=None, filename=None)
+    Args:
+        urbs_file: LP file of the urbs model
+        oemof_file: LP file of the oemof model
 
-    # storage dictionaries
-    sto_df = {}
-    sto_con_df = {}
-    sto_pwr_df = {}
-    sto_cap_df = {}
+    Returns:
+        urbs, oemof: LPStatistics of both files, see lpstats.scan_lp_file
+    """
+    urbs = scan_lp_file(urbs_file, _label_map(urbs_file))
+    oemof = scan_lp_file(oemof_file, _label_map(oemof_file))
 
-    for sit in urbs_model.sit:
-        # plot init
-        iterations = []
-        urbs_values = []
-        oemof_values = []
+    # Terminal Output
+    for title, attribute in [('Constraint Amount', 'n_constraints'),
+                             ('Variable Amount', 'variables'),
+                             ('Nonzero Amount', 'nonzeros')]:
+        print(title)
+        print('urbs\t', getattr(urbs, attribute))
+        print('oemof\t', getattr(oemof, attribute))
+        print('Diff\t', getattr(urbs, attribute) - getattr(oemof, attribute))
+        print('----------------------------------------------------')
 
-        # get storage variable values
-        results_bel = outputlib.views.node(oemof_model.results['main'],
-                                           'b_Elec_'+sit)
-        results_con = outputlib.views.node(oemof_model.results['main'],
-                                           'None')
+    return urbs, oemof
+
+
+def _label_map(filename):
+    # label map of an LP file, if there is one
+    if os.path.exists(filename + '.labels'):
+        return read_label_map(filename + '.labels')
+    return None
+
+
+def compare_storages(urbs_model, oemof_model, threshold, workers=None):
+    """
+    Compares and plots the storages of an urbs and an oemof model
+
+    Args:
+        urbs_model: a solved urbs model instance
+        oemof_model: the oemof energy system holding the results
+        threshold: minimum absolute difference to be listed
+        workers: number of processes rendering the plots
+
+    Returns:
+        diff: the differences, see engine.compare_models
+    """
+    results = oemof_model.results['main']
+    mapping = variable_mapping(urbs_model, results)
+    mapping = mapping[mapping['kind'] == 'storage']
+
+    diff = compare_models(urbs_model, results, threshold, mapping)
+    _print_diff('Storage', diff)
+
+    # plot storage contents, one graph per site
+    content = mapping[mapping['variable'] == 'e_sto_con']
+    timesteps, urbs_values, oemof_values = aligned_timeseries(
+        urbs_model, results, content)
+    graphs = _site_graphs(urbs_set(urbs_model, 'sit'), content,
+                          timesteps, urbs_values, oemof_values, 'Storage')
+    draw_graphs(graphs, workers)
+
+    return diff
+
+
+def compare_transmission(urbs_model, oemof_model, threshold, workers=None):
+    """
+    Compares and plots the transmission lines of an urbs and an oemof model
+
+    Args:
+        urbs_model: a solved urbs model instance
+        oemof_model: the oemof energy system holding the results
+        threshold: minimum absolute difference to be listed
+        workers: number of processes rendering the plots
+
+    Returns:
+        diff: the differences, see engine.compare_models
+    """
+    results = oemof_model.results['main']
+    mapping = variable_mapping(urbs_model, results)
+    mapping = mapping[mapping['kind'] == 'transmission']
+
+    diff = compare_models(urbs_model, results, threshold, mapping)
+    _print_diff('Transmission', diff)
+
+    # plot new line capacities, one graph per site of origin
+    capacity = mapping[mapping['variable'] == 'cap_tra_new']
+    urbs_values, oemof_values = aligned_scalars(urbs_model, results,
+                                                capacity)
+    graphs = []
+    for sit in urbs_set(urbs_model, 'sit'):
+        rows = np.flatnonzero(capacity['site'].values == sit)
+        if len(rows) == 0:
+            continue
+        sit_outs = list(capacity['name'].values[rows])
+        graphs.append((sit, sit_outs,
+                       dict(zip(sit_outs, urbs_values[rows])),
+                       dict(zip(sit_outs, oemof_values[rows])),
+                       'Transmission'))
+    draw_graphs(graphs, workers)
+
+    return diff
+
+
+def compare_process(urbs_model, oemof_model, threshold, workers=None):
+    """
+    Compares and plots the processes of an urbs and an oemof model
+
+    Args:
+        urbs_model: a solved urbs model instance
+        oemof_model: the oemof energy system holding the results
+        threshold: minimum absolute difference to be listed
+        workers: number of processes rendering the plots
+
+    Returns:
+        diff: the differences, see engine.compare_models
+    """
+    results = oemof_model.results['main']
+    mapping = variable_mapping(urbs_model, results)
+    mapping = mapping[mapping['kind'] == 'process']
+
+    diff = compare_models(urbs_model, results, threshold, mapping)
+    _print_diff('Process', diff)
+
+    # plot process outputs, stock (pp) and intermittent (rs) processes in
+    # separate graphs per site
+    output = mapping[mapping['variable'] == 'e_pro_out']
+    timesteps, urbs_values, oemof_values = aligned_timeseries(
+        urbs_model, results, output)
+    intermittent = np.array([key[0].startswith('rs_')
+                             for key in output['key']], dtype=bool)
+    sites = urbs_set(urbs_model, 'sit')
+    graphs = []
+    for rows, name in [(~intermittent, 'Process (PP)'),
+                       (intermittent, 'Process (fPP)')]:
+        graphs += _site_graphs(sites, output[rows], timesteps,
+                               urbs_values[rows], oemof_values[rows], name)
+    draw_graphs(graphs, workers)
+
+    return diff
+
+
+def _print_diff(name, diff):
+    # terminal output of a diff table
+    print('----------------------------------------------------')
+    print(name, '\t', '(urbs - oemof)')
+    if not diff.empty:
+        print(diff.to_string(index=False))
+    print('----------------------------------------------------')
 
-        # charge/discharge
-        sto_df[sit] = results_bel['sequences']
-        sto_df[sit] = sto_df[sit].filter(like='storage')
 
-        # content
-        sto_con_df[sit] = results_con['sequences']
-        sto_con_df[sit] = sto_con_df[sit].filter(like=sit)
+def _site_graphs(sites, mapping, timesteps, urbs_values, oemof_values,
+                 name):
+    # one (site, timesteps, urbs, oemof, name) graph per site, with one
+    # curve per mapping row of that site, labelled by the row's name
+    graphs = []
+    for sit in sites:
+        rows = np.flatnonzero(mapping['site'].values == sit)
+        if len(rows) == 0:
+            continue
+        keys = mapping['name'].values[rows]
+        graphs.append((sit, list(timesteps),
+                       dict(zip(keys, urbs_values[rows])),
+                       dict(zip(keys, oemof_values[rows])),
+                       name))
+    return graphs
+
+
+def draw_graphs(graphs, workers=None):
+    """
+    Draws and saves comparison plots, optionally in worker processes
+
+    Args:
+        graphs: list of (site, i, urbs_values, oemof_values, name) tuples,
+                see draw_graph
+        workers: number of worker processes, default: None (draw in this
+                 process, one after another)
+
+    Returns:
+        Nothing
+    """
+    # one result directory for all plots of this call
+    result_dir = prepare_result_directory('plots')
 
-        # power
-        sto_pwr_df[sit] = results_bel['scalars']
-        sto_pwr_df[sit] = sto_pwr_df[sit].filter(like=sit)
+    if not workers:
+        for graph in graphs:
+            draw_graph(*graph, result_dir=result_dir)
+        return
 
-        # capacity
-        sto_cap_df[sit] = results_con['scalars']
-        sto_cap_df[sit] = sto_cap_df[sit].filter(like=sit)
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=init_render_worker) as pool:
+        futures = [pool.submit(draw_graph, *graph, result_dir=result_dir)
+                   for graph in graphs]
+        for future in futures:
+            future.result()
 
-        # output template
-        print('----------------------------------------------------')
-        print('i', '\t', 'Storage', sit, '\t', '(urbs - oemof)')
-
-        # storage power
-        if abs(urbs_model.cap_sto_p_new[(sit, 'Pump', 'Elec')]() -
-               sto_pwr_df[sit][(('b_Elec_'+sit, 'storage_Pump_'+sit),
-                               'invest')]) >= threshold:
-            print('\t', 'Storage PWR', '\t', 'Diff:',
-                  urbs_model.cap_sto_p_new[(sit, 'Pump', 'Elec')]() -
-                  sto_pwr_df[sit][(('b_Elec_'+sit, 'storage_Pump_'+sit),
-                                  'invest')])
-
-        # storage capacity
-        if abs(urbs_model.cap_sto_c_new[(sit, 'Pump', 'Elec')]() -
-               sto_cap_df[sit][(('storage_Pump_'+sit, 'None'),
-                               'invest')]) >= threshold:
-            print('\t', 'Storage CAP', '\t', 'Diff:',
-                  urbs_model.cap_sto_c_new[(sit, 'Pump', 'Elec')]() -
-                  sto_cap_df[sit][(('storage_Pump_'+sit, 'None'),
-                                  'invest')])
-
-        for i in range(1, len(oemof_model.timeindex)):
-            # storage unit charge
-            if abs(urbs_model.e_sto_in[(i, sit, 'Pump', 'Elec')]() -
-                   sto_df[sit][(('b_Elec_'+sit, 'storage_Pump_'+sit),
-                               'flow')][(i-1)]) >= threshold:
-
-                print(i, '\t', 'Storage IN', '\t', 'Diff:',
-                      urbs_model.e_sto_in[(i, sit, 'Pump', 'Elec')]() -
-                      sto_df[sit][(('b_Elec_'+sit, 'storage_Pump_'+sit),
-                                  'flow')][(i-1)])
-
-            # storage unit discharge
-            if abs(urbs_model.e_sto_out[(i, sit, 'Pump', 'Elec')]() -
-                   sto_df[sit][(('storage_Pump_'+sit, 'b_Elec_'+sit),
-                               'flow')][(i-1)]) >= threshold:
-
-                print(i, '\t', 'Storage OUT', '\t', 'Diff:',
-                      urbs_model.e_sto_out[(i, sit, 'Pump', 'Elec')]() -
-                      sto_df[sit][(('storage_Pump_'+sit, 'b_Elec_'+sit),
-                                  'flow')][(i-1)])
-            # storage unit content
-            if abs(urbs_model.e_sto_con[(i, sit, 'Pump', 'Elec')]() -
-                   sto_con_df[sit][(('storage_Pump_'+sit, 'None'),
-                                   'capacity')][(i-1)]) >= threshold:
-
-                print(i, '\t', 'Storage CON', '\t', 'Diff:',
-                      urbs_model.e_sto_con[(i, sit, 'Pump', 'Elec')]() -
-                      sto_con_df[sit][(('storage_Pump_'+sit, 'None'),
-                                      'capacity')][(i-1)])
-
-            # plot details
-            iterations.append(i)
-            urbs_values.append(urbs_model.e_sto_con[(i, sit, 'Pump', 'Elec')]())
-            oemof_values.append(sto_con_df[sit][(('storage_Pump_'+sit, 'None'),
-                                                'capacity')][(i-1)])
-
-        # plot
-        draw_graph(sit, iterations, urbs_values, oemof_values, 'Storage')
-
-    return print('----------------------------------------------------')
-
-
-def compare_transmission(urbs_model, oemof_model, threshold):
-    # restore oemof energysytem results
-    oemof_model = solph.EnergySystem()
-    oemof_model.restore(dpath=None, filename=None)
-
-    # transmission dictionaries
-    tra_df = {}
-    tra_cap_df = {}
-
-    for sit in urbs_model.sit:
-        # plot init
-        sit_outs = []
-        urbs_values = {}
-        oemof_values = {}
-
-        # get transmission variable values
-        results_bel = outputlib.views.node(oemof_model.results['main'],
-                                           'b_Elec_'+sit)
-
-        # in/out
-        tra_df[sit] = results_bel['sequences']
-        tra_df[sit] = tra_df[sit].filter(like='line')
-
-        # capacity
-        tra_cap_df[sit] = results_bel['scalars']
-        tra_cap_df[sit] = tra_cap_df[sit].filter(like='line')
 
-        print('----------------------------------------------------')
-        print('i', '\t', 'Transmission', sit, '\t', '(urbs - oemof)')
-
-        # transmission capacity
-        out = []
-        for sit_out in urbs_model.sit:
-            if sit_out is not sit:
-                try:
-                    urbs_model.cap_tra_new[(sit, sit_out, 'hvac', 'Elec')]
-                    out.append(sit_out)
-                except KeyError:
-                    pass
-
-        for sit_out in out:
-            if abs(urbs_model.cap_tra_new[(sit, sit_out, 'hvac', 'Elec')]() -
-                   tra_cap_df[sit][(('b_Elec_'+sit, 'line_'+sit+'_'+sit_out),
-                                    'invest')]) >= threshold:
-
-                print('\t', 'Transmission CAP', '\t', sit+'_'+sit_out, '\t', 'Diff:',
-                      urbs_model.cap_tra_new[(sit, sit_out, 'hvac', 'Elec')]() -
-                      tra_cap_df[sit][(('b_Elec_'+sit, 'line_'+sit+'_'+sit_out),
-                                       'invest')])
-
-            # plot details
-            sit_outs.append(sit_out)
-            urbs_values[sit_out] = urbs_model.cap_tra_new[(sit, sit_out, 'hvac', 'Elec')]()
-            oemof_values[sit_out] = tra_cap_df[sit][(('b_Elec_'+sit, 'line_'+sit+'_'+sit_out),
-                                                    'invest')]
-
-        for i in range(1, len(oemof_model.timeindex)):
-            for sit_out in out:
-                # transmission in
-                if abs(urbs_model.e_tra_in[(i, sit, sit_out, 'hvac', 'Elec')]() -
-                       tra_df[sit][(('b_Elec_'+sit, 'line_'+sit+'_'+sit_out),
-                                   'flow')][(i-1)]) >= threshold:
-
-                    print(i, '\t', 'Transmission IN', '\t', sit+'_'+sit_out, '\t', 'Diff:',
-                          urbs_model.e_tra_in[(i, sit, sit_out, 'hvac', 'Elec')]() -
-                          tra_df[sit][(('b_Elec_'+sit, 'line_'+sit+'_'+sit_out),
-                                      'flow')][(i-1)])
-
-                # transmission out
-                if abs(urbs_model.e_tra_out[(i, sit_out, sit, 'hvac', 'Elec')]() -
-                       tra_df[sit][(('line_'+sit_out+'_'+sit, 'b_Elec_'+sit),
-                                   'flow')][(i-1)]) >= threshold:
-
-                    print(i, '\t', 'Transmission OUT', '\t', sit+'_'+sit_out, '\t', 'Diff:',
-                          urbs_model.e_tra_out[(i, sit_out, sit, 'hvac', 'Elec')]() -
-                          tra_df[sit][(('line_'+sit_out+'_'+sit, 'b_Elec_'+sit),
-                                      'flow')][(i-1)])
-
-        # plot
-        draw_graph(sit, sit_outs, urbs_values, oemof_values, 'Transmission')
-
-    return print('----------------------------------------------------')
-
-
-def compare_process(urbs_model, oemof_model, threshold):
-    # restore oemof energysytem results
-    oemof_model = solph.EnergySystem()
-    oemof_model.restore(dpath=None, filename=None)
-
-    # non-f process dictionaries
-    pro_df = {}
-    pro_cap_df = {}
-
-    # f process dictionaries
-    pro_r_df = {}
-    pro_cap_r_df = {}
-
-    for sit in urbs_model.sit:
-        # nf process list
-        p1 = urbs_model.commodity.index.get_level_values('Site') == sit
-        p2 = urbs_model.commodity.index.get_level_values('Type') == 'Stock'
-        pro_list = urbs_model.commodity[p1 & p2].index.remove_unused_levels() \
-            .get_level_values('Commodity')
-
-        # f process list
-        r1 = urbs_model.commodity.index.get_level_values('Type') == 'SupIm'
-        ren_list = urbs_model.commodity[p1 & r1].index.remove_unused_levels() \
-            .get_level_values('Commodity')
-
-        # plot init
-        iterations = [i for i in range(1, len(oemof_model.timeindex))]
-        urbs_values = dict([(key, []) for key in pro_list])
-        oemof_values = dict([(key, []) for key in pro_list])
-
-        # get process unit variable values
-        results_bel = outputlib.views.node(oemof_model.results['main'],
-                                           'b_Elec_'+sit)
-
-        # nf process unit
-        pro_df[sit] = results_bel['sequences']
-        pro_df[sit] = pro_df[sit].filter(like='pp')
-
-        # f process unit
-        pro_r_df[sit] = results_bel['sequences']
-        pro_r_df[sit] = pro_r_df[sit].filter(like='rs')
-
-        # f process capacity
-        pro_cap_r_df[sit] = results_bel['scalars']
-        pro_cap_r_df[sit] = pro_cap_r_df[sit].filter(like='rs')
+def draw_graph(site, i, urbs_values, oemof_values, name, result_dir=None):
+    import matplotlib.pyplot as plt
 
-        print('----------------------------------------------------')
-        print('i', '\t', 'Process', sit, '\t', '(urbs - oemof)')
-
-        # get nf process capacity variable values
-        for pro in pro_list:
-            results_con = outputlib.views.node(oemof_model.results['main'], 'pp_'+pro+'_'+sit)
-
-            # nf process capacity
-            pro_cap_df[sit] = results_con['scalars']
-
-            if abs(urbs_model.cap_pro_new[(sit, pro+' plant')]() -
-                   pro_cap_df[sit][(('b_'+pro+'_'+sit, 'pp_'+pro+'_'+sit),
-                                   'invest')]) >= threshold:
-
-                print('\t', 'CAP', '\t', pro, '\t', 'Diff:',
-                      urbs_model.cap_pro_new[(sit, pro+' plant')]() -
-                      pro_cap_df[sit][(('b_'+pro+'_'+sit, 'pp_'+pro+'_'+sit),
-                                      'invest')])
-
-            for i in range(1, len(oemof_model.timeindex)):
-                # plot details
-                urbs_values[pro].append(urbs_model.e_pro_out[(i, sit, pro+' plant', 'Elec')]())
-                oemof_values[pro].append(pro_df[sit][(('pp_'+pro+'_'+sit, 'b_Elec_'+sit),
-                                                     'flow')][(i-1)])
-                # nf process unit
-                if abs(urbs_model.e_pro_out[(i, sit, pro+' plant', 'Elec')]() -
-                       pro_df[sit][(('pp_'+pro+'_'+sit, 'b_Elec_'+sit),
-                                   'flow')][(i-1)]) >= threshold:
-
-                    print(i, '\t', 'UNIT', '\t', pro, '\t', 'Diff:',
-                          urbs_model.e_pro_out[(i, sit, pro+' plant', 'Elec')]() -
-                          pro_df[sit][(('pp_'+pro+'_'+sit, 'b_Elec_'+sit),
-                                       'flow')][(i-1)])
-
-        # plot
-        draw_graph(sit, iterations, urbs_values, oemof_values, 'Process (PP)')
-
-        # plot init
-        urbs_values = dict([(key, []) for key in ren_list])
-        oemof_values = dict([(key, []) for key in ren_list])
-
-        # get f process capacity variable values
-        for ren in ren_list:
-            # f process capacity
-            if abs(urbs_model.cap_pro_new[(sit, ren+' plant')]() -
-                   pro_cap_r_df[sit][(('rs_'+ren+'_'+sit, 'b_Elec_'+sit),
-                                     'invest')]) >= threshold:
-
-                print('\t', 'CAP', '\t', ren, '\t', 'Diff:',
-                      urbs_model.cap_pro_new[(sit, ren+' plant')]() -
-                      pro_cap_r_df[sit][(('rs_'+ren+'_'+sit, 'b_Elec_'+sit),
-                                        'invest')])
-
-            for i in range(1, len(oemof_model.timeindex)):
-                # plot details
-                urbs_values[ren].append(urbs_model.e_pro_out[(i, sit, ren+' plant', 'Elec')]())
-                oemof_values[ren].append(pro_r_df[sit][(('rs_'+ren+'_'+sit, 'b_Elec_'+sit),
-                                                       'flow')][(i-1)])
-                # f process unit
-                if abs(urbs_model.e_pro_out[(i, sit, ren+' plant', 'Elec')]() -
-                       pro_r_df[sit][(('rs_'+ren+'_'+sit, 'b_Elec_'+sit),
-                                     'flow')][(i-1)]) >= threshold:
-
-                    print(i, '\t', 'UNIT', '\t', ren, '\t', 'Diff:',
-                          urbs_model.e_pro_out[(i, sit, ren+' plant', 'Elec')]() -
-                          pro_r_df[sit][(('rs_'+ren+'_'+sit, 'b_Elec_'+sit),
-                                        'flow')][(i-1)])
-
-        # plot
-        draw_graph(sit, iterations, urbs_values, oemof_values, 'Process (fPP)')
-
-    return print('----------------------------------------------------')
-
-
-def draw_graph(site, i, urbs_values, oemof_values, name):
     # result directory
-    result_dir = prepare_result_directory('plots')
+    if result_dir is None:
+        result_dir = prepare_result_directory('plots')
+
+    if name == 'Storage':
+        # init
+        u = {}
+        o = {}
 
-    if name is 'Storage':
         # create figure
         fig = plt.figure()
 
         # x-Axis (timesteps)
         i = np.array(i)
 
-        # y-Axis (values)
-        u = np.array(urbs_values)
-        o = np.array(oemof_values)
+        for key in urbs_values:
+            # y-Axis (values)
+            u[key] = np.array(urbs_values[key])
+            o[key] = np.array(oemof_values[key])
 
-        # draw plots
-        plt.plot(i, u, label='urbs', linestyle='None', marker='x')
-        plt.ticklabel_format(axis='y', style='sci', scilimits=(0, 0))
-        plt.plot(i, o, label='oemof', linestyle='None', marker='.')
-        plt.ticklabel_format(axis='y', style='sci', scilimits=(0, 0))
+            # draw plots
+            plt.plot(i, u[key], label='urbs_'+str(key), linestyle='None',
+                     marker='x')
+            plt.ticklabel_format(axis='y', style='sci', scilimits=(0, 0))
+            plt.plot(i, o[key], label='oemof_'+str(key), linestyle='None',
+                     marker='.')
+            plt.ticklabel_format(axis='y', style='sci', scilimits=(0, 0))
 
         # plot specs
         plt.xlabel('Timesteps [h]')
@@ -464,7 +311,7 @@ def draw_graph(site, i, urbs_values, oemof_values, name):
         fig.savefig(os.path.join(result_dir, 'comp_'+name+'_'+site+'.png'), dpi=300)
         plt.close(fig)
 
-    elif name is 'Transmission':
+    elif name == 'Transmission':
         # create figure
         fig = plt.figure()
 
@@ -533,56 +380,3 @@ def draw_graph(site, i, urbs_values, oemof_values, name):
         # save plot
         fig.savefig(os.path.join(result_dir, 'comp_'+name+'_'+site+'.png'), dpi=300)
         plt.close(fig)
-
-
-def process_benchmark(benchmark_data):
-    # result directory
-    result_dir = prepare_result_directory('benchmark')
-
-    for item in ['obj', 'cpu', 'memory', 'const', 'build']:
-        # create figure
-        fig = plt.figure()
-
-        # x-Axis (timesteps)
-        ts = np.array(list(benchmark_data.keys()))
-
-        # y-Axis (values)
-        u = []
-        o = []
-        for i in ts:
-            u.append(benchmark_data[i][0][item])
-            o.append(benchmark_data[i][1][item])
-        u_array = np.array(u)
-        o_array = np.array(o)
-
-        # draw plots
-        plt.plot(ts, u_array, label='urbs', linestyle='None', marker='x')
-        plt.ticklabel_format(axis='y')
-        plt.plot(ts, o_array, label='oemof', linestyle='None', marker='.')
-        plt.ticklabel_format(axis='y')
-
-        # plot specs
-        plt.xlabel('Timesteps [h]')
-
-        if item is 'obj':
-            plt.ylabel('Objective Value [€]')
-            plt.title('Objective Values')
-        elif item is 'cpu':
-            plt.ylabel('CPU Time [secs]')
-            plt.title('Solver CPU Time')
-        elif item is 'memory':
-            plt.ylabel('Memory [Mb]')
-            plt.title('Solver Memory Used')
-        elif item is 'const':
-            plt.ylabel('Constraint')
-            plt.title('Model Constraint Amount')
-        elif item is 'build':
-            plt.ylabel('Build Time [secs]')
-            plt.title('Model Build Time')
-        plt.grid(True)
-        plt.legend()
-        #plt.show()
-
-        # save plot
-        fig.savefig(os.path.join(result_dir, 'comp_'+item+'.png'), dpi=300)
-        plt.close(fig)
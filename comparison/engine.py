@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+from urbs import get_entity
+
+# oemof result types holding one value per timestep
+TIMESERIES = ('flow', 'content')
+
+
+def urbs_set(urbs_model, name):
+    """
+    Returns the elements of an urbs set
+
+    Works on model instances as well as on result containers (see
+    urbs.load), which hold the sets in their result cache.
+
+    Args:
+        urbs_model: an urbs model instance or result container
+        name: set name, e.g. 'sit' or 'sto_tuples'
+
+    Returns:
+        a list of set elements (tuples for multi-dimensional sets)
+    """
+    return list(get_entity(urbs_model, name).index)
+
+
+def variable_mapping(urbs_model, results):
+    """
+    Maps urbs variables onto the corresponding oemof results
+
+    The oemof labels follow oemofm.create_model: 'pp_<input>_<site>' for
+    stock commodity processes, 'rs_<input>_<site>' for intermittent
+    processes, 'storage_<storage>_<site>', 'line_<site in>_<site out>' and
+    'b_<commodity>_<site>' for buses.
+
+    Args:
+        urbs_model: a solved urbs model instance or result container
+        results: oemof results, as returned by oemofm.extract_results
+
+    Returns:
+        mapping: a DataFrame with one row per pair of corresponding values,
+            with the columns 'kind' ('process', 'storage' or 'transmission'),
+            'site', 'name' (process, storage or target site), 'variable'
+            (urbs variable), 'index' (urbs index tuple without timestep),
+            'oemof' (result type: 'flow', 'content', 'invest' or
+            'storage_invest') and 'key' (oemof flow or storage label);
+            only pairs present in both models are listed
+    """
+    flows = set(results.flows)
+    storages = set(results.storages)
+    rows = []
+
+    def add(kind, site, name, variable, index, oemof, key):
+        if oemof == 'flow' and key in flows or \
+           oemof == 'content' and key in storages or \
+           oemof == 'invest' and key in results.invest or \
+           oemof == 'storage_invest' and key in results.storage_invest:
+            rows.append((kind, site, name, variable, index, oemof, key))
+
+    # processes, one oemof node per (site, input commodity)
+    supim = set(com for sit, com, com_type
+                in urbs_set(urbs_model, 'com_tuples')
+                if com_type == 'SupIm')
+    outputs = {}
+    for sit, pro, com in urbs_set(urbs_model, 'pro_output_tuples'):
+        outputs.setdefault((sit, pro), []).append(com)
+
+    for sit, pro, com in urbs_set(urbs_model, 'pro_input_tuples'):
+        bus_in = 'b_'+com+'_'+sit
+        if com in supim:
+            label = 'rs_'+com+'_'+sit
+            cap_flows = []
+        else:
+            label = 'pp_'+com+'_'+sit
+            cap_flows = [(bus_in, label)]
+
+        for out in outputs.get((sit, pro), []):
+            bus_out = 'b_'+out+'_'+sit
+            add('process', sit, pro, 'e_pro_out', (sit, pro, out),
+                'flow', (label, bus_out))
+            cap_flows.append((label, bus_out))
+
+        # capacity is invested on the input (pp) or output (rs) flow
+        for flow in cap_flows:
+            if flow in results.invest:
+                add('process', sit, pro, 'cap_pro_new', (sit, pro),
+                    'invest', flow)
+                break
+
+    # storages
+    for sit, sto, com in urbs_set(urbs_model, 'sto_tuples'):
+        label = 'storage_'+sto+'_'+sit
+        bus = 'b_'+com+'_'+sit
+        index = (sit, sto, com)
+        add('storage', sit, sto, 'e_sto_in', index, 'flow', (bus, label))
+        add('storage', sit, sto, 'e_sto_out', index, 'flow', (label, bus))
+        add('storage', sit, sto, 'e_sto_con', index, 'content', label)
+        add('storage', sit, sto, 'cap_sto_p_new', index,
+            'invest', (bus, label))
+        add('storage', sit, sto, 'cap_sto_c_new', index,
+            'storage_invest', label)
+
+    # transmission lines, one oemof node per direction
+    for sit, sit_, tra, com in urbs_set(urbs_model, 'tra_tuples'):
+        label = 'line_'+sit+'_'+sit_
+        index = (sit, sit_, tra, com)
+        add('transmission', sit, sit_, 'e_tra_in', index,
+            'flow', ('b_'+com+'_'+sit, label))
+        add('transmission', sit, sit_, 'e_tra_out', index,
+            'flow', (label, 'b_'+com+'_'+sit_))
+        add('transmission', sit, sit_, 'cap_tra_new', index,
+            'invest', ('b_'+com+'_'+sit, label))
+
+    return pd.DataFrame(rows, columns=['kind', 'site', 'name', 'variable',
+                                       'index', 'oemof', 'key'])
+
+
+def aligned_timeseries(urbs_model, results, mapping):
+    """
+    Extracts the timeseries of mapped variables from both models
+
+    urbs timestep t (set tm, starting at 1) is aligned with oemof timestep
+    t-1 (starting at 0).
+
+    Args:
+        urbs_model: a solved urbs model instance or result container
+        results: oemof results, as returned by oemofm.extract_results
+        mapping: rows of variable_mapping with a timeseries result type
+
+    Returns:
+        (timesteps, urbs, oemof): the compared urbs timesteps and two arrays
+        (mapping rows x timesteps) of the aligned values
+    """
+    timesteps = sorted(urbs_set(urbs_model, 'tm'))
+    timesteps = timesteps[:len(results.timesteps)]
+
+    urbs = np.full((len(mapping), len(timesteps)), np.nan)
+    for variable, group in _groups(mapping, 'variable'):
+        # one unstacked frame (index x timestep) per urbs variable
+        values = get_entity(urbs_model, variable).unstack(0)
+        values = values.reindex(index=pd.MultiIndex.from_tuples(
+                                    list(mapping['index'].values[group])),
+                                columns=timesteps)
+        urbs[group] = values.values
+
+    oemof = np.full((len(mapping), len(timesteps)), np.nan)
+    for k, (kind, key) in enumerate(zip(mapping['oemof'], mapping['key'])):
+        if kind == 'flow':
+            oemof[k] = results.flow(*key)[:len(timesteps)]
+        else:
+            oemof[k] = results.content(key)[:len(timesteps)]
+
+    return timesteps, urbs, oemof
+
+
+def aligned_scalars(urbs_model, results, mapping):
+    """
+    Extracts the invested capacities of mapped variables from both models
+
+    Args:
+        urbs_model: a solved urbs model instance or result container
+        results: oemof results, as returned by oemofm.extract_results
+        mapping: rows of variable_mapping with the result type 'invest' or
+                 'storage_invest'
+
+    Returns:
+        (urbs, oemof): two arrays of the aligned values
+    """
+    urbs = np.full(len(mapping), np.nan)
+    for variable, group in _groups(mapping, 'variable'):
+        values = get_entity(urbs_model, variable)
+        index = list(mapping['index'].values[group])
+        if values.index.nlevels > 1:
+            index = pd.MultiIndex.from_tuples(index)
+        urbs[group] = values.reindex(index).values
+
+    oemof = np.array([results.invest[key] if kind == 'invest'
+                      else results.storage_invest[key]
+                      for kind, key in zip(mapping['oemof'], mapping['key'])],
+                     dtype=float)
+    return urbs, oemof
+
+
+def compare_models(urbs_model, results, threshold=0.1, mapping=None):
+    """
+    Compares all mapped variables of an urbs and an oemof model
+
+    Args:
+        urbs_model: a solved urbs model instance or result container
+        results: oemof results, as returned by oemofm.extract_results
+        threshold: minimum absolute difference to be listed
+        mapping: (optional) rows of variable_mapping to compare; default:
+                 all mapped variables
+
+    Returns:
+        diff: a DataFrame with one row per difference of at least threshold
+            and the columns 'kind', 'site', 'name', 'variable', 't' (None
+            for capacities), 'urbs', 'oemof' and 'diff' (urbs - oemof)
+    """
+    if mapping is None:
+        mapping = variable_mapping(urbs_model, results)
+    columns = ['kind', 'site', 'name', 'variable']
+    is_timeseries = mapping['oemof'].isin(TIMESERIES).values
+
+    # capacities
+    scalars = mapping[~is_timeseries]
+    urbs, oemof = aligned_scalars(urbs_model, results, scalars)
+    diff = [scalars[columns].assign(t=None, urbs=urbs, oemof=oemof)]
+
+    # timeseries, one row per mapped variable and timestep
+    series = mapping[is_timeseries]
+    timesteps, urbs, oemof = aligned_timeseries(urbs_model, results, series)
+    table = series[columns].iloc[np.repeat(np.arange(len(series)),
+                                           len(timesteps))]
+    diff.append(table.assign(t=np.tile(np.array(timesteps, dtype=object),
+                                       len(series)),
+                             urbs=urbs.ravel(), oemof=oemof.ravel()))
+
+    diff = pd.concat(diff, ignore_index=True)
+    diff['diff'] = diff['urbs'] - diff['oemof']
+    return diff[diff['diff'].abs() >= threshold].reset_index(drop=True)
+
+
+def _groups(mapping, column):
+    # (value, boolean row mask) for all values of a mapping column
+    values = mapping[column].values
+    for value in pd.unique(values):
+        yield value, values == value
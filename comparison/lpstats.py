@@ -0,0 +1,377 @@
+import glob
+import itertools
+import math
+import os
+import shutil
+import tempfile
+import weakref
+from contextlib import contextmanager
+
+# row name prefixes written by the Pyomo LP writer
+ROW_PREFIXES = ('c_e_', 'c_l_', 'c_u_', 'r_l_', 'r_u_')
+
+# relational operators of LP files
+RELATIONS = ('=', '<=', '>=', '<', '>', '=<', '=>')
+
+
+class LPStatistics:
+    """Size and numerics of a linear program, as read from an LP/MPS file
+
+    Attributes:
+        filename: name of the scanned file
+        constraints: A dict of block name: number of constraints (range
+                     constraints count once)
+        rows: number of constraint rows (range constraints count twice in
+              LP files)
+        variables: number of variables
+        nonzeros: number of nonzero constraint coefficients
+        bounds: A dict of bound kind ('free', 'lower', 'upper', 'boxed',
+                'fixed'): number of variables (of BOUNDS entries for MPS
+                files, where boxed variables have a lower and upper entry)
+        ranges: A dict of 'coefficient', 'objective', 'rhs', 'bound':
+                (min, max) of the absolute nonzero finite values, or None
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.constraints = {}
+        self.rows = 0
+        self.variables = 0
+        self.nonzeros = 0
+        self.bounds = dict.fromkeys(
+            ['free', 'lower', 'upper', 'boxed', 'fixed'], 0)
+        self.ranges = dict.fromkeys(
+            ['coefficient', 'objective', 'rhs', 'bound'])
+
+    @property
+    def n_constraints(self):
+        """Total number of constraints"""
+        return sum(self.constraints.values())
+
+    def to_dict(self):
+        """Returns the statistics as flat dict, e.g. for benchmark records"""
+        record = {'constraints': self.n_constraints,
+                  'rows': self.rows,
+                  'variables': self.variables,
+                  'nonzeros': self.nonzeros}
+        for kind, amount in self.bounds.items():
+            record['bounds_'+kind] = amount
+        for kind, values in self.ranges.items():
+            low, high = values if values else (None, None)
+            record[kind+'_min'] = low
+            record[kind+'_max'] = high
+        return record
+
+    def _count(self, block):
+        self.constraints[block] = self.constraints.get(block, 0) + 1
+
+    def _value(self, kind, value):
+        # extend the range of absolute values of kind
+        value = abs(value)
+        if value == 0 or math.isinf(value):
+            return
+        current = self.ranges[kind]
+        if current is None:
+            self.ranges[kind] = (value, value)
+        elif value < current[0]:
+            self.ranges[kind] = (value, current[1])
+        elif value > current[1]:
+            self.ranges[kind] = (current[0], value)
+
+    def _bound(self, low, high):
+        # classify the bounds of one variable
+        if low == high:
+            kind = 'fixed'
+        elif low == -math.inf and high == math.inf:
+            kind = 'free'
+        elif high == math.inf:
+            kind = 'lower'
+        elif low == -math.inf:
+            kind = 'upper'
+        else:
+            kind = 'boxed'
+        self.bounds[kind] += 1
+        self._value('bound', low)
+        self._value('bound', high)
+
+
+def scan_lp_file(filename, labels=None):
+    """
+    Reads the statistics of an LP or MPS file in a single streaming pass
+
+    Only counters and ranges are kept, so memory use does not depend on the
+    file size and no intermediate files are written. Files ending in '.mps'
+    are read as (free or fixed) MPS, all others as CPLEX LP files as written
+    by Pyomo.
+
+    Args:
+        filename: name of the LP or MPS file
+        labels: (optional) dict of row name: constraint name, see
+                read_label_map; used to find the block names of files
+                written without symbolic labels
+
+    Returns:
+        stats: an LPStatistics object
+    """
+    with open(filename, 'r') as f:
+        if os.path.splitext(filename)[1].lower() == '.mps':
+            return _scan_mps(f, LPStatistics(filename), labels or {})
+        return _scan_lp(f, LPStatistics(filename), labels or {})
+
+
+def block_name(row):
+    """
+    Returns the block (constraint family) of a row name
+
+    'c_e_res_vertex(1_Mid_Elec_Demand)_' and 'res_vertex(1,Mid)' become
+    'res_vertex', as does the constraint name 'res_vertex[1,Mid]'; rows
+    written without symbolic labels ('c_u_x12_') become 'x'.
+
+    Args:
+        row: row name
+
+    Returns:
+        block: block name
+    """
+    if row.startswith(ROW_PREFIXES):
+        row = row[4:]
+        if row.endswith('_'):
+            row = row[:-1]
+    for bracket in '([':
+        if bracket in row:
+            return row[:row.index(bracket)]
+    return row.rstrip('0123456789') or row
+
+
+def _scan_lp(f, stats, labels):
+    section = None
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('\\'):
+            continue
+        lower = line.lower()
+
+        # section headers
+        if lower in ('min', 'max', 'minimize', 'maximize', 'minimise',
+                     'maximise'):
+            section = 'objective'
+            continue
+        if lower in ('s.t.', 'st', 'subject to', 'such that'):
+            section = 'constraints'
+            continue
+        if lower == 'bounds':
+            section = 'bounds'
+            continue
+        if lower in ('binary', 'binaries', 'general', 'generals',
+                     'integer', 'semi-continuous', 'sos'):
+            section = 'integers'
+            continue
+        if lower == 'end':
+            break
+
+        if section == 'bounds':
+            _lp_bound(line, stats)
+            continue
+        if section not in ('objective', 'constraints'):
+            continue
+
+        # row label, possibly followed by terms on the same line
+        if ':' in line:
+            label, line = line.split(':', 1)
+            if section == 'constraints':
+                stats.rows += 1
+                label = label.strip()
+                if not label.startswith('r_u_'):
+                    stats._count(block_name(labels.get(label, label)))
+            line = line.strip()
+            if not line:
+                continue
+
+        kind = 'objective' if section == 'objective' else 'coefficient'
+        _lp_terms(line.split(), kind, section == 'constraints', stats)
+    return stats
+
+
+def _lp_terms(tokens, kind, count, stats):
+    # terms ('+2 x', '- 3 y', 'z') and relation ('<= 5') of a row line
+    coefficient = None
+    tokens = iter(tokens)
+    for token in tokens:
+        if token in RELATIONS:
+            stats._value('rhs', float(next(tokens)))
+            return
+        if token == '+' or token == '-':
+            coefficient = float(token + '1')
+            continue
+        try:
+            value = float(token)
+        except ValueError:
+            # a variable name, with implicit coefficient 1 if none given
+            value = 1.0 if coefficient is None else coefficient
+            stats._value(kind, value)
+            if count:
+                stats.nonzeros += 1
+            coefficient = None
+            continue
+        coefficient = value if coefficient is None else coefficient * value
+
+
+def _lp_bound(line, stats):
+    # bound lines: 'l <= x <= u', 'x >= l', 'x <= u', 'x = v', 'x free'
+    tokens = line.split()
+    stats.variables += 1
+    if len(tokens) == 5:
+        stats._bound(float(tokens[0]), float(tokens[4]))
+    elif len(tokens) == 2 and tokens[1].lower() == 'free':
+        stats._bound(-math.inf, math.inf)
+    elif tokens[1] in ('=', '=='):
+        value = float(tokens[2])
+        stats._bound(value, value)
+    elif tokens[1] in ('>=', '=>'):
+        stats._bound(float(tokens[2]), math.inf)
+    elif tokens[1] in ('<=', '=<'):
+        stats._bound(0.0, float(tokens[2]))
+    else:
+        stats.variables -= 1
+
+
+def _scan_mps(f, stats, labels):
+    section = None
+    objective = set()
+    column = None
+    for line in f:
+        if not line.strip() or line.startswith('*'):
+            continue
+        if not line[0].isspace():
+            section = line.split()[0].upper()
+            continue
+        tokens = line.split()
+
+        if section == 'ROWS':
+            if tokens[0].upper() == 'N':
+                objective.add(tokens[1])
+            else:
+                stats.rows += 1
+                stats._count(block_name(labels.get(tokens[1], tokens[1])))
+
+        elif section == 'COLUMNS':
+            if tokens[1] == "'MARKER'":
+                continue
+            # columns are contiguous, so a new name is a new variable
+            if tokens[0] != column:
+                column = tokens[0]
+                stats.variables += 1
+            for row, value in zip(tokens[1::2], tokens[2::2]):
+                if row in objective:
+                    stats._value('objective', float(value))
+                else:
+                    stats._value('coefficient', float(value))
+                    stats.nonzeros += 1
+
+        elif section == 'RHS':
+            # (row, value) pairs from the end, the set name is optional
+            for row, value in zip(tokens[-2::-2], tokens[::-2]):
+                if row not in objective:
+                    stats._value('rhs', float(value))
+
+        elif section == 'BOUNDS':
+            kind = tokens[0].upper()
+            value = float(tokens[3]) if len(tokens) > 3 else None
+            if kind == 'FR':
+                stats.bounds['free'] += 1
+            elif kind == 'FX':
+                stats.bounds['fixed'] += 1
+            elif kind in ('UP', 'UI', 'MI'):
+                stats.bounds['upper'] += 1
+            elif kind in ('LO', 'LI', 'PL'):
+                stats.bounds['lower'] += 1
+            if value is not None:
+                stats._value('bound', value)
+
+        elif section == 'ENDATA':
+            break
+    return stats
+
+
+@contextmanager
+def keep_problem_file(filename):
+    """
+    Keeps the problem file a Pyomo solver plugin writes, as filename
+
+    Solve within this context with keepfiles=True. The temporary files of
+    the solve are created in a fresh directory next to filename; the LP
+    file is moved to filename and the directory removed afterwards, so the
+    model does not need to be written a second time.
+
+    Usage:
+        with keep_problem_file('model.lp'):
+            optim.solve(model, keepfiles=True)
+
+    Args:
+        filename: name the problem file is moved to
+
+    Returns:
+        Nothing
+    """
+    try:
+        from pyomo.common.tempfiles import TempfileManager
+    except ImportError:
+        from pyutilib.services import TempfileManager
+
+    tempdir = tempfile.mkdtemp(dir=os.path.dirname(filename) or None)
+    previous = TempfileManager.tempdir
+    TempfileManager.tempdir = tempdir
+    try:
+        yield
+    finally:
+        TempfileManager.tempdir = previous
+        problem_files = glob.glob(os.path.join(tempdir, '*.lp'))
+        if problem_files:
+            os.replace(problem_files[0], filename)
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+
+def write_label_map(model, results, filename):
+    """
+    Writes the row and column names of a solve without symbolic labels
+
+    Call after a solve with load_solutions=False, before the solution is
+    loaded with model.solutions.load_from(results). Each line holds a name
+    used in the problem file and the Pyomo component name, tab separated.
+
+    Args:
+        model: the solved Pyomo model
+        results: results of the solve
+        filename: name of the label map file
+
+    Returns:
+        Nothing
+    """
+    symbol_map = model.solutions.symbol_map[results._smap_id]
+    with open(filename, 'w') as f:
+        for symbol, obj in itertools.chain(symbol_map.bySymbol.items(),
+                                           symbol_map.aliases.items()):
+            if isinstance(obj, weakref.ref):
+                obj = obj()
+            if obj is not None:
+                f.write('{}\t{}\n'.format(symbol, obj.name))
+
+
+def read_label_map(filename):
+    """
+    Reads a label map written by write_label_map
+
+    The whole map is held in memory, unlike the statistics of scan_lp_file.
+
+    Args:
+        filename: name of the label map file
+
+    Returns:
+        labels: a dict of name in the problem file: Pyomo component name
+    """
+    labels = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            symbol, name = line.rstrip('\n').split('\t', 1)
+            labels[symbol] = name
+    return labels
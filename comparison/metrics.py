@@ -0,0 +1,473 @@
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+class SolverMetrics:
+    """Measured and solver-reported figures of one solve
+
+    Attributes:
+        solver: solver name
+        wall_time: measured wall-clock time of the solve call in seconds
+        solver_time: time reported by the solver in seconds, or None
+        iterations: iterations reported by the solver, or None
+        peak_memory: measured peak resident memory of the solver
+                     subprocess(es) in Mb, or None
+        reported_memory: memory reported by the solver in Mb, or None
+        status: solver status, e.g. 'ok'
+        termination: termination condition, e.g. 'optimal'
+    """
+
+    def __init__(self, solver, wall_time=None, solver_time=None,
+                 iterations=None, peak_memory=None, reported_memory=None,
+                 status=None, termination=None):
+        self.solver = solver
+        self.wall_time = wall_time
+        self.solver_time = solver_time
+        self.iterations = iterations
+        self.peak_memory = peak_memory
+        self.reported_memory = reported_memory
+        self.status = status
+        self.termination = termination
+
+    def __repr__(self):
+        return 'SolverMetrics({})'.format(', '.join(
+            '{}={!r}'.format(k, v) for k, v in self.to_dict().items()))
+
+    def to_dict(self):
+        """Returns the metrics as flat dict, e.g. for benchmark records"""
+        return {'solver': self.solver,
+                'wall_time': self.wall_time,
+                'solver_time': self.solver_time,
+                'iterations': self.iterations,
+                'peak_memory': self.peak_memory,
+                'reported_memory': self.reported_memory,
+                'status': self.status,
+                'termination': self.termination}
+
+
+###############################################################################
+# Solver log parsers
+###############################################################################
+
+def _last(pattern, text, cast=float):
+    # last match of the first group of pattern in text, or None
+    matches = re.findall(pattern, text, re.MULTILINE)
+    if not matches:
+        return None
+    return cast(matches[-1])
+
+
+def parse_glpk_log(text):
+    """Reads time, memory and iterations from a GLPK log"""
+    return {'solver_time': _last(r'Time used:\s*([\d.eE+-]+)\s*secs', text),
+            'reported_memory': _last(r'Memory used:\s*([\d.eE+-]+)\s*Mb',
+                                     text),
+            'iterations': _last(r'^[* ]\s*(\d+): obj', text, int)}
+
+
+def parse_cbc_log(text):
+    """Reads time and iterations from a CBC/CLP log"""
+    iterations = _last(r'Iterations:\s*(\d+)', text, int)
+    if iterations is None:
+        iterations = _last(r'(\d+) iterations', text, int)
+    return {'solver_time': _last(r'Total time \(CPU seconds\):\s*([\d.]+)',
+                                 text),
+            'iterations': iterations}
+
+
+def parse_gurobi_log(text):
+    """Reads time and iterations from a Gurobi log"""
+    return {'solver_time': _last(
+                r'Solved in \d+ iterations and ([\d.]+) seconds', text),
+            'iterations': _last(r'Solved in (\d+) iterations', text, int)}
+
+
+def parse_cplex_log(text):
+    """Reads time and iterations from a CPLEX log"""
+    return {'solver_time': _last(r'Solution time =\s*([\d.]+) sec', text),
+            'iterations': _last(r'Iterations = (\d+)', text, int)}
+
+
+# log parsers by solver name, extend with register_log_parser
+LOG_PARSERS = {
+    'glpk': parse_glpk_log,
+    'cbc': parse_cbc_log,
+    'clp': parse_cbc_log,
+    'gurobi': parse_gurobi_log,
+    'cplex': parse_cplex_log,
+    }
+
+
+def register_log_parser(solver, parser):
+    """
+    Registers a log parser for a solver
+
+    Args:
+        solver: solver name, as passed to SolverFactory
+        parser: function(log text) returning a dict with any of the keys
+                'solver_time', 'iterations' and 'reported_memory'
+
+    Returns:
+        Nothing
+    """
+    LOG_PARSERS[solver] = parser
+
+
+def parse_solver_log(solver, logfile):
+    """
+    Reads solver-reported figures from a log file
+
+    Args:
+        solver: solver name, selects the parser in LOG_PARSERS
+        logfile: name of the solver log file
+
+    Returns:
+        a dict with the keys 'solver_time', 'iterations' and
+        'reported_memory', None where unknown
+    """
+    figures = dict.fromkeys(['solver_time', 'iterations', 'reported_memory'])
+    parser = LOG_PARSERS.get(solver.split('_')[0].lower())
+    if parser is None or logfile is None:
+        return figures
+    try:
+        with open(logfile, 'r') as f:
+            text = f.read()
+    except (IOError, OSError):
+        return figures
+    figures.update(parser(text))
+    return figures
+
+
+###############################################################################
+# Live solver output
+###############################################################################
+
+_NUMBER = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+_GLPK_SIMPLEX = re.compile(r'^[*\s]\s*(\d+): obj =\s*' + _NUMBER +
+                           r'(?:\s+inf(?:eas)? =\s*' + _NUMBER + ')?')
+_GLPK_MIP = re.compile(r'^\+\s*(\d+): mip =\s*' + _NUMBER +
+                       r'\s*[<>]=\s*(?:' + _NUMBER + r'|tree is empty)' +
+                       r'(?:\s+' + _NUMBER + '%)?')
+_CBC_NODES = re.compile(r'After (\d+) nodes, \d+ on tree, ' + _NUMBER +
+                        r' best solution, best possible ' + _NUMBER)
+_CLP_ITERATION = re.compile(r'Clp\d+I\s+(\d+)\s+Obj\s+' + _NUMBER +
+                            r'(?:\s+Primal inf\s+' + _NUMBER + ')?')
+
+
+def parse_glpk_line(line):
+    """Reads iteration, objective and bounds from a GLPK output line"""
+    match = _GLPK_MIP.match(line)
+    if match:
+        iteration, objective, bound, gap = match.groups()
+        return {'iteration': int(iteration),
+                'objective': float(objective),
+                'bound': float(bound) if bound is not None else None,
+                'gap': float(gap) / 100 if gap is not None else None}
+    match = _GLPK_SIMPLEX.match(line)
+    if match:
+        iteration, objective, infeasibility = match.groups()
+        return {'iteration': int(iteration),
+                'objective': float(objective),
+                'infeasibility': float(infeasibility)
+                if infeasibility is not None else None}
+    return None
+
+
+def parse_cbc_line(line):
+    """Reads iteration or node, objective and bounds from a CBC/CLP line"""
+    match = _CBC_NODES.search(line)
+    if match:
+        nodes, objective, bound = match.groups()
+        objective, bound = float(objective), float(bound)
+        return {'nodes': int(nodes), 'objective': objective, 'bound': bound,
+                'gap': abs(objective - bound) / max(abs(objective), 1e-10)}
+    match = _CLP_ITERATION.search(line)
+    if match:
+        iteration, objective, infeasibility = match.groups()
+        return {'iteration': int(iteration),
+                'objective': float(objective),
+                'infeasibility': float(infeasibility)
+                if infeasibility is not None else None}
+    return None
+
+
+# live output parsers by solver name, extend with register_progress_parser
+PROGRESS_PARSERS = {
+    'glpk': parse_glpk_line,
+    'cbc': parse_cbc_line,
+    'clp': parse_cbc_line,
+    }
+
+
+def register_progress_parser(solver, parser):
+    """
+    Registers a parser of live solver output
+
+    Args:
+        solver: solver name, as passed to SolverFactory
+        parser: function(output line) returning a dict of progress figures
+                (e.g. 'iteration', 'objective', 'bound', 'gap') or None
+
+    Returns:
+        Nothing
+    """
+    PROGRESS_PARSERS[solver] = parser
+
+
+class SolverProgress(object):
+    """Output stream reporting the progress figures of a solver
+
+    Solve with tee=True while sys.stdout is redirected to this stream (see
+    measure_solve). Each complete line is parsed with the parser of the
+    solver in PROGRESS_PARSERS; parsed figures are reported as 'solve'
+    events with the reporter (see urbs.ProgressReporter), together with the
+    iteration rate. Output written while reporting, e.g. by callbacks
+    printing the events, goes to the original sys.stdout.
+
+    Args:
+        solver: solver name, selects the parser
+        reporter: object with a method report(event, model, **fields)
+        model: model name used in the reported events
+        echo: (optional) stream to copy the solver output to
+    """
+
+    def __init__(self, solver, reporter, model=None, echo=None):
+        self.parser = PROGRESS_PARSERS.get(solver.split('_')[0].lower())
+        self.solver = solver
+        self.reporter = reporter
+        self.model = model
+        self.echo = echo
+        self._stdout = sys.stdout
+        self._buffer = ''
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._reporting = threading.local()
+
+    def write(self, text):
+        if getattr(self._reporting, 'active', False):
+            return self._stdout.write(text)
+        if self.echo is not None:
+            self.echo.write(text)
+        with self._lock:
+            self._buffer += text
+            *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._parse(line)
+        return len(text)
+
+    def flush(self):
+        if self.echo is not None:
+            self.echo.flush()
+        self._stdout.flush()
+
+    def close(self):
+        """Parses the last, unterminated line"""
+        with self._lock:
+            line, self._buffer = self._buffer, ''
+        if line:
+            self._parse(line)
+
+    def _parse(self, line):
+        figures = self.parser(line) if self.parser is not None else None
+        if not figures:
+            return
+        seconds = time.perf_counter() - self._start
+        if figures.get('iteration') and seconds > 0:
+            figures['rate'] = figures['iteration'] / seconds
+        self._reporting.active = True
+        try:
+            self.reporter.report('solve', self.model, solver=self.solver,
+                                 **figures)
+        finally:
+            self._reporting.active = False
+
+
+###############################################################################
+# Measurement
+###############################################################################
+
+class _ChildMemoryMonitor(threading.Thread):
+    # polls the memory of the child processes started after its creation
+    # (e.g. the solver) and their descendants: with psutil their summed
+    # resident memory, else (Linux) the sum of their peak resident memory
+    # (VmHWM) read from /proc, which also catches peaks between two polls;
+    # children running before (pool workers, the multiprocessing resource
+    # tracker) are not counted
+    def __init__(self, psutil, interval):
+        super(_ChildMemoryMonitor, self).__init__()
+        self.daemon = True
+        self.psutil = psutil
+        self.interval = interval
+        self.peak = 0
+        self._peaks = {}
+        self._stop_event = threading.Event()
+        if psutil is not None:
+            self._existing = {child.pid
+                              for child in psutil.Process().children()}
+        else:
+            self._existing = set(_child_pids(os.getpid(), recursive=False))
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self.psutil is not None:
+                self._poll_psutil()
+            else:
+                self._poll_proc()
+            self._stop_event.wait(self.interval)
+
+    def _poll_psutil(self):
+        rss = 0
+        for child in self.psutil.Process().children():
+            if child.pid in self._existing:
+                continue
+            try:
+                for process in [child] + child.children(recursive=True):
+                    rss += process.memory_info().rss
+            except self.psutil.Error:
+                pass
+        self.peak = max(self.peak, rss)
+
+    def _poll_proc(self):
+        # the latest value per child: VmHWM only grows, but starts anew
+        # when a forked child executes the solver
+        for pid in _child_pids(os.getpid(), skip=self._existing):
+            hwm = _proc_status(pid, 'VmHWM')
+            if hwm is not None:
+                self._peaks[pid] = hwm
+        self.peak = sum(self._peaks.values())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak / 1024.0 ** 2
+
+
+def _proc_status(pid, field):
+    # a memory field of /proc/<pid>/status in bytes, None if not readable
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _child_pids(pid, recursive=True, skip=()):
+    # ids of the (recursive) child processes of a process from /proc,
+    # without the children in skip and their descendants
+    children = []
+    todo = [pid]
+    while todo:
+        parent = todo.pop()
+        try:
+            tasks = os.listdir('/proc/{}/task'.format(parent))
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open('/proc/{}/task/{}/children'.format(
+                        parent, task)) as f:
+                    pids = [int(child) for child in f.read().split()
+                            if int(child) not in skip]
+            except (OSError, ValueError):
+                continue
+            children.extend(pids)
+            if recursive:
+                todo.extend(pids)
+    return children
+
+
+def _children_maxrss():
+    # largest peak resident memory of all waited-for children in Mb
+    if resource is None:
+        return None
+    # Linux reports kilobytes (macOS bytes; not distinguished here)
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+
+
+def measure_solve(solve, solver, logfile=None, interval=0.05,
+                  progress=None, model=None):
+    """
+    Runs a solve and records its SolverMetrics
+
+    Peak memory of the solver subprocess is measured by polling with psutil,
+    if installed, else by polling the peak resident memory of each child
+    process from /proc (Linux); only child processes started during the
+    solve and their descendants are counted. The peak resident memory of
+    all children from getrusage is exact, but only known if it exceeds that
+    of any earlier child process; it is used then, and if neither polling
+    method is available or the solver exited before the first poll (None
+    else).
+
+    Usage:
+        result, metrics = measure_solve(
+            lambda: optim.solve(model, logfile='urbs_log.txt'),
+            'glpk', 'urbs_log.txt')
+
+    Args:
+        solve: function without arguments running the solve and returning
+               the Pyomo solver results
+        solver: solver name, selects the log parser
+        logfile: (optional) solver log file to parse for solver-reported
+                 time, iterations and memory
+        interval: (optional) polling interval of the memory measurement in
+                  seconds
+        progress: (optional) reporter of the live solver output, see
+                  SolverProgress; solve must then echo the solver output to
+                  sys.stdout (tee=True)
+        model: (optional) model name used in the progress events
+
+    Returns:
+        (result, metrics): return value of solve and SolverMetrics
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    monitor = None
+    if psutil is not None or os.path.exists('/proc/self/status'):
+        monitor = _ChildMemoryMonitor(psutil, interval)
+        monitor.start()
+    maxrss_before = _children_maxrss()
+
+    start = time.perf_counter()
+    try:
+        if progress is None:
+            result = solve()
+        else:
+            stream = SolverProgress(solver, progress, model)
+            try:
+                with redirect_stdout(stream):
+                    result = solve()
+            finally:
+                stream.close()
+    finally:
+        wall_time = time.perf_counter() - start
+        peak_memory = None
+        if monitor is not None:
+            peak_memory = monitor.stop() or None
+        # getrusage is exact, but only if above all earlier children
+        maxrss = _children_maxrss()
+        if maxrss is not None and maxrss > maxrss_before:
+            peak_memory = max(peak_memory or 0, maxrss)
+
+    metrics = SolverMetrics(solver, wall_time=wall_time,
+                            peak_memory=peak_memory,
+                            **parse_solver_log(solver, logfile))
+    if result is not None and hasattr(result, 'solver'):
+        metrics.status = str(result.solver.status)
+        metrics.termination = str(result.solver.termination_condition)
+    return result, metrics
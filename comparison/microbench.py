@@ -0,0 +1,508 @@
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from .compare import compare_lp_files, prepare_result_directory
+
+# (sites, timesteps) of the default fixtures
+DEFAULT_SIZES = [(3, 24), (6, 168), (12, 720)]
+
+# modules whose import time is measured, see run_import_benchmarks
+IMPORT_MODULES = ['urbs', 'comparison', 'connection_oep', 'oemofm', 'mimo']
+
+
+###############################################################################
+# Fixtures
+###############################################################################
+
+def scale_input(data, sites, timesteps):
+    """
+    Scales input data to a number of sites and timesteps
+
+    The sites of the input data are cloned ('Mid' becomes 'Mid1', 'Mid2',
+    ...) with all their commodities, processes, storages and timeseries.
+    Each generation of clones repeats the transmission lines of the
+    original sites and is connected to the previous one by a copy of the
+    first line. Timeseries are repeated to the required length.
+
+    Args:
+        data: input data, as returned by conn.write_data or urbs.read_excel
+        sites: number of sites
+        timesteps: number of timesteps (the timeseries get timesteps + 1
+                   rows, including the initial timestep 0)
+
+    Returns:
+        data: scaled copy of the input data
+    """
+    template = list(data['site'].index)
+    names = {}
+    for k in range(sites):
+        site, generation = template[k % len(template)], k // len(template)
+        names.setdefault(generation, {})[site] = \
+            site + str(generation) if generation else site
+
+    def clone(df, levels):
+        # rows of all generations whose sites all exist, renamed
+        frames = []
+        for generation, rename in names.items():
+            part = df
+            for level in levels:
+                part = part[part.index.get_level_values(level).isin(rename)]
+            part = part.rename(index=rename, level=levels[0])
+            for level in levels[1:]:
+                part = part.rename(index=rename, level=level)
+            frames.append(part)
+        return pd.concat(frames)
+
+    scaled = {}
+    for key, df in data.items():
+        if key == 'site':
+            df = pd.DataFrame(index=pd.Index(
+                [site for rename in names.values()
+                 for site in rename.values()], name=df.index.name),
+                columns=df.columns)
+        elif key in ('demand', 'supim', 'eff_factor') and not df.empty:
+            columns = [(rename[site], com) for rename in names.values()
+                       for site, com in df.columns if site in rename]
+            values = df[[(site, com) for rename in names.values()
+                         for site, com in df.columns if site in rename]]
+            values = values.iloc[[t % len(df) for t in range(timesteps + 1)]]
+            df = pd.DataFrame(values.values, columns=pd.MultiIndex.from_tuples(
+                columns), index=pd.Index(range(timesteps + 1),
+                                         name=df.index.name))
+        elif key == 'transmission':
+            df = clone(df, ['Site In', 'Site Out'])
+            if not data[key].empty:
+                df = pd.concat([df] + _link_generations(data[key], names))
+        elif 'Site' in getattr(df.index, 'names', []):
+            df = clone(df, ['Site'])
+        scaled[key] = df.copy()
+
+    for key in scaled:
+        if isinstance(scaled[key].index, pd.MultiIndex):
+            scaled[key].sort_index(inplace=True)
+    return scaled
+
+
+def _link_generations(transmission, names):
+    # copies of the first transmission line, in both directions, between
+    # the first sites of consecutive generations of clones
+    line = transmission.iloc[[0]]
+    site = line.index.get_level_values('Site In')[0]
+    links = []
+    for generation in range(1, len(names)):
+        if site not in names[generation]:
+            break
+        a, b = names[generation - 1][site], names[generation][site]
+        for sin, sout in [(a, b), (b, a)]:
+            links.append(line.rename(index={site: sin}, level='Site In')
+                             .rename(index=lambda s: sout,
+                                     level='Site Out'))
+    return links
+
+
+def raw_input(data):
+    """
+    Returns input data in the tabular layout of conn.read_data
+
+    Args:
+        data: input data, as returned by conn.write_data
+
+    Returns:
+        raw: a dict of DataFrames without index, timeseries columns named
+             'Site.Commodity'
+    """
+    raw = {}
+    for key, df in data.items():
+        if key in ('demand', 'supim', 'eff_factor'):
+            df = df.copy()
+            df.columns = ['.'.join(column) for column in df.columns]
+        raw[key] = df.reset_index()
+    return raw
+
+
+class Fixture:
+    """Input data and derived objects of one benchmark size
+
+    Derived objects are created on first use and shared by all
+    micro-benchmarks of the size; their creation is not measured.
+
+    Attributes:
+        sites: number of sites
+        timesteps: number of timesteps
+        data: scaled input data, see scale_input
+        directory: temporary directory for written files
+    """
+
+    def __init__(self, data, sites, timesteps):
+        self.sites = sites
+        self.timesteps = timesteps
+        self.data = scale_input(data, sites, timesteps)
+        self.directory = tempfile.mkdtemp(prefix='microbench-')
+        self._cache = {}
+
+    def close(self):
+        """Removes the written files"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _cached(self, name, create):
+        if name not in self._cache:
+            self._cache[name] = create()
+        return self._cache[name]
+
+    @property
+    def raw(self):
+        """Input data in the layout of conn.read_data"""
+        return self._cached('raw', lambda: raw_input(self.data))
+
+    @property
+    def urbs_model(self):
+        """urbs model instance with all variables set to 1
+
+        The constant values stand in for a solution, so that result
+        functions can be measured without a solver.
+        """
+        def create():
+            import pyomo.core as pyomo
+            import urbs
+            model = urbs.create_model(self.data, 1,
+                                      range(0, self.timesteps + 1))
+            for var in model.component_data_objects(pyomo.Var):
+                var.value = 1.0
+            return model
+        return self._cached('urbs_model', create)
+
+    @property
+    def lp_files(self):
+        """(urbs, oemof) LP files of the fixture models"""
+        def create():
+            import oemofm
+            urbs_file = os.path.join(self.directory, 'urbs.lp')
+            oemof_file = os.path.join(self.directory, 'oemof.lp')
+            options = {'symbolic_solver_labels': True}
+            self.urbs_model.write(urbs_file, io_options=options)
+            es, model = oemofm.create_model(self.data,
+                                            range(0, self.timesteps + 1))
+            model.write(oemof_file, io_options=options)
+            return urbs_file, oemof_file
+        return self._cached('lp_files', create)
+
+
+###############################################################################
+# Micro-benchmarks
+###############################################################################
+
+def bench_commodity_balance(fixture):
+    """commodity_balance for all commodities of one timestep"""
+    from urbs.modelhelper import commodity_balance
+    model = fixture.urbs_model
+    tm = next(iter(model.tm))
+    tuples = [(sit, com) for sit, com, com_type in model.com_tuples]
+
+    def run():
+        for sit, com in tuples:
+            commodity_balance(model, tm, sit, com)
+    return run, len(tuples)
+
+
+def bench_pyomo_model_prep(fixture):
+    """pyomo_model_prep, including the compilation of the input data"""
+    from urbs.input import pyomo_model_prep
+    timesteps = range(0, fixture.timesteps + 1)
+
+    def run():
+        pyomo_model_prep(fixture.data, timesteps)
+    return run, 1
+
+
+def bench_get_entity(fixture):
+    """get_entity of the largest urbs variable"""
+    from urbs import get_entity
+    model = fixture.urbs_model
+    return lambda: get_entity(model, 'e_pro_out'), 1
+
+
+def bench_get_entities(fixture):
+    """get_entities of the process capacity variables"""
+    from urbs import get_entities
+    model = fixture.urbs_model
+    return lambda: get_entities(model, ['cap_pro', 'cap_pro_new']), 1
+
+
+def bench_get_timeseries(fixture):
+    """get_timeseries of 'Elec' for each site"""
+    from urbs import get_timeseries
+    model = fixture.urbs_model
+    sites = list(fixture.data['site'].index)
+
+    def run():
+        for sit in sites:
+            get_timeseries(model, 'Elec', sit)
+    return run, len(sites)
+
+
+def bench_validate_input(fixture):
+    """validate_input of the input data"""
+    from urbs import validate_input
+    return lambda: validate_input(fixture.data), 1
+
+
+def bench_oemof_create_model(fixture):
+    """oemofm.create_model, including the energy system"""
+    import oemofm
+    timesteps = range(0, fixture.timesteps + 1)
+    return lambda: oemofm.create_model(fixture.data, timesteps), 1
+
+
+def bench_normalize(fixture):
+    """conn.normalize of all input tables"""
+    import connection_oep as conn
+    raw = fixture.raw
+
+    def run():
+        for key, df in raw.items():
+            conn.normalize(df, key)
+    return run, len(raw)
+
+
+def bench_denormalize(fixture):
+    """conn.denormalize of all normalized input tables"""
+    import connection_oep as conn
+    normalized = {key: conn.normalize(df, key)
+                  for key, df in fixture.raw.items()}
+
+    def run():
+        for key, df in normalized.items():
+            conn.denormalize(df, key)
+    return run, len(normalized)
+
+
+def bench_compare_lp_files(fixture):
+    """compare_lp_files of the urbs and oemof LP files"""
+    urbs_file, oemof_file = fixture.lp_files
+
+    def run():
+        # the printed report is not part of the measured work
+        with redirect_stdout(io.StringIO()):
+            compare_lp_files(urbs_file, oemof_file)
+    return run, 1
+
+
+# micro-benchmarks by name, extend with register_microbenchmark
+MICROBENCHMARKS = {
+    'commodity_balance': bench_commodity_balance,
+    'pyomo_model_prep': bench_pyomo_model_prep,
+    'get_entity': bench_get_entity,
+    'get_entities': bench_get_entities,
+    'get_timeseries': bench_get_timeseries,
+    'validate_input': bench_validate_input,
+    'oemof_create_model': bench_oemof_create_model,
+    'normalize': bench_normalize,
+    'denormalize': bench_denormalize,
+    'compare_lp_files': bench_compare_lp_files,
+    }
+
+
+def register_microbenchmark(name, setup):
+    """
+    Registers a micro-benchmark
+
+    Args:
+        name: benchmark name
+        setup: function(fixture) returning (run, calls): a function without
+               arguments to be timed and the number of calls of the
+               benchmarked function it makes
+
+    Returns:
+        Nothing
+    """
+    MICROBENCHMARKS[name] = setup
+
+
+###############################################################################
+# Measurement
+###############################################################################
+
+def measure_call(run, calls=1, repeat=5, number=1):
+    """
+    Measures time and allocations of a function
+
+    Timings use timeit (garbage collection disabled). Allocations are
+    traced with tracemalloc in one extra, untimed run.
+
+    Args:
+        run: function without arguments
+        calls: number of calls of the benchmarked function per run
+        repeat: number of timed repetitions
+        number: runs per repetition
+
+    Returns:
+        a dict with the median and minimum time per call in seconds
+        ('time', 'time_min') and the peak and retained memory allocated by
+        Python per run in Mb ('memory_peak', 'memory_retained')
+    """
+    times = timeit.Timer(run).repeat(repeat, number)
+    per_call = pd.Series(times) / (number * calls)
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = run()
+    current, peak = tracemalloc.get_traced_memory()
+    del result
+    if started:
+        tracemalloc.stop()
+
+    return {'time': per_call.median(),
+            'time_min': per_call.min(),
+            'memory_peak': (peak - base) / 1024.0 ** 2,
+            'memory_retained': (current - base) / 1024.0 ** 2}
+
+
+def run_microbenchmarks(data, sizes=None, names=None, repeat=5):
+    """
+    Runs micro-benchmarks on fixtures of several sizes
+
+    No solver is needed: result functions work on models whose variables
+    are set to constant values (see Fixture.urbs_model). Benchmarks whose
+    dependencies are missing or that fail are reported with their error.
+
+    Args:
+        data: template input data, see scale_input
+        sizes: (optional) list of (sites, timesteps); default: DEFAULT_SIZES
+        names: (optional) list of benchmark names; default: all registered
+               in MICROBENCHMARKS
+        repeat: number of timed repetitions
+
+    Returns:
+        records: a DataFrame with one row per benchmark and size, with the
+                 columns 'benchmark', 'sites', 'timesteps', 'calls', the
+                 entries of measure_call and 'error'
+    """
+    records = []
+    for sites, timesteps in sizes or DEFAULT_SIZES:
+        fixture = Fixture(data, sites, timesteps)
+        try:
+            for name in names or list(MICROBENCHMARKS):
+                record = {'benchmark': name, 'sites': sites,
+                          'timesteps': timesteps, 'error': None}
+                try:
+                    run, calls = MICROBENCHMARKS[name](fixture)
+                    record['calls'] = calls
+                    record.update(measure_call(run, calls, repeat))
+                except Exception as error:
+                    record['error'] = '{}: {}'.format(
+                        type(error).__name__, error)
+                records.append(record)
+        finally:
+            fixture.close()
+    return pd.DataFrame(records)
+
+
+###############################################################################
+# Import Times
+###############################################################################
+
+def measure_import(module, repeat=5, top=5):
+    """
+    Measures the import time of a module in fresh interpreters
+
+    Each repetition imports the module in a new Python process started with
+    -X importtime, so no module is imported already. That is what a spawned
+    worker process pays before it can run a model.
+
+    Args:
+        module: module name, e.g. 'urbs'
+        repeat: number of processes
+        top: number of heaviest imported modules to report
+
+    Returns:
+        record: a dict with the median, min and max import time in seconds,
+                the number of imported 'modules' and the 'heaviest' ones
+                by own import time, as 'name (ms)'
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+            cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        if process.returncode != 0:
+            raise ImportError(process.stderr.strip().splitlines()[-1])
+
+        # lines 'import time: <own us> | <cumulative us> | <indented name>'
+        imported = []
+        for line in process.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            own = int(fields[0].split(':')[-1])
+            imported.append((fields[2].strip(), own, int(fields[1])))
+        total = [cumulative for name, _, cumulative in imported
+                 if name == module]
+        times.append(total[-1] / 1e6)
+
+    heaviest = sorted(imported, key=lambda item: -item[1])[:top]
+    return {'median': statistics.median(times),
+            'min': min(times),
+            'max': max(times),
+            'modules': len(imported),
+            'heaviest': ', '.join('{} ({:.0f})'.format(name, own / 1e3)
+                                  for name, own, _ in heaviest)}
+
+
+def run_import_benchmarks(modules=None, repeat=5):
+    """
+    Measures the import times of the urbs, oemof and mimo modules
+
+    Modules with missing dependencies are reported with their error.
+
+    Args:
+        modules: (optional) list of module names; default: IMPORT_MODULES
+        repeat: number of processes per module
+
+    Returns:
+        records: a DataFrame with one row per module, with the columns
+                 'module', the entries of measure_import and 'error'
+    """
+    records = []
+    for module in modules or IMPORT_MODULES:
+        record = {'module': module}
+        try:
+            record.update(measure_import(module, repeat))
+            record['error'] = None
+        except ImportError as error:
+            record['error'] = str(error)
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+if __name__ == '__main__':
+    import connection_oep as conn
+
+    # import times of fresh processes
+    imports = run_import_benchmarks()
+
+    # template input file, scaled to the benchmark sizes
+    input_file = 'mimo.xlsx'
+    data = conn.write_data(conn.read_data(input_file))
+
+    records = run_microbenchmarks(data)
+    result_dir = prepare_result_directory('microbenchmark')
+    records.to_csv(os.path.join(result_dir, 'microbenchmark.csv'),
+                   index=False)
+    imports.to_csv(os.path.join(result_dir, 'imports.csv'), index=False)
+    print(records.to_string(float_format='{:.4g}'.format))
+    print(imports.to_string(float_format='{:.4g}'.format))
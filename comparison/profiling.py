@@ -0,0 +1,113 @@
+import os
+import pstats
+from datetime import datetime
+
+# environment variable enabling the profiling of mimo runs: '1' profiles
+# into a new time stamped result directory, any other value is taken as
+# output directory
+PROFILE_ENV = 'MIMO_PROFILE'
+
+
+def profile_directory(setting=None):
+    """
+    Returns the output directory of a profiled run, if profiling is enabled
+
+    Args:
+        setting: (optional) None, '' or '0' to disable profiling, '1' for a
+                 new time stamped directory 'result/profile-<time>' or a
+                 directory name; default: the environment variable
+                 MIMO_PROFILE
+
+    Returns:
+        the created directory, or None if profiling is disabled
+    """
+    if setting is None:
+        setting = os.environ.get(PROFILE_ENV)
+    if not setting or setting == '0':
+        return None
+    if setting == '1':
+        now = datetime.now().strftime('%Y%m%dT%H%M%S')
+        setting = os.path.join('result', 'profile-{}'.format(now))
+    os.makedirs(setting, exist_ok=True)
+    return setting
+
+
+def write_profile(profile, directory, name):
+    """
+    Writes a finished cProfile run as .pstats and collapsed stack file
+
+    Args:
+        profile: a disabled cProfile.Profile
+        directory: output directory
+        name: file name without extension, e.g. the phase name
+
+    Returns:
+        Nothing
+    """
+    profile.dump_stats(os.path.join(directory, name+'.pstats'))
+    stats = pstats.Stats(profile)
+    with open(os.path.join(directory, name+'.collapsed'), 'w') as f:
+        for stack, seconds in sorted(collapsed_stacks(stats).items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds > 0:
+                f.write('{} {}\n'.format(';'.join(stack), microseconds))
+
+
+def collapsed_stacks(stats, min_time=1e-6, max_depth=64):
+    """
+    Derives call stacks with their own time from profile statistics
+
+    cProfile only records caller-callee pairs, so the time of a function
+    called from several places is split over the stacks leading to it in
+    proportion to their cumulative time. Recursive calls are cut off. The
+    result is the input format of flame graph tools such as flamegraph.pl
+    and speedscope.
+
+    Args:
+        stats: a pstats.Stats object
+        min_time: stacks below this cumulative time in seconds are dropped
+        max_depth: largest stack depth
+
+    Returns:
+        stacks: a dict of (function label, ...) tuple: own time in seconds
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge))
+
+    # roots: calls from frames entered before profiling started have no
+    # recorded caller, they make up the time not attributed to callers
+    todo = []
+    for func, (_, _, tt, ct, callers) in stats.stats.items():
+        own = tt - sum(edge[2] for edge in callers.values())
+        cumulative = ct - sum(edge[3] for edge in callers.values())
+        if not callers or cumulative >= min_time:
+            todo.append(((func,), max(own, 0.0), max(cumulative, 0.0)))
+
+    stacks = {}
+    while todo:
+        path, own, cumulative = todo.pop()
+        key = tuple(_label(func) for func in path)
+        stacks[key] = stacks.get(key, 0) + own
+
+        # share of all calls of the function that belongs to this path
+        total = stats.stats[path[-1]][3]
+        if total <= 0 or len(path) >= max_depth:
+            continue
+        share = min(cumulative / total, 1.0)
+        for func, (_, _, tt, ct) in callees.get(path[-1], []):
+            if func not in path and ct * share >= min_time:
+                todo.append((path + (func,), tt * share, ct * share))
+    return stacks
+
+
+def _label(func):
+    # 'name (file:line)' of a pstats function key; no semicolons, these
+    # separate the frames of collapsed stacks
+    filename, line, name = func
+    if filename == '~':
+        label = name
+    else:
+        label = '{} ({}:{})'.format(name, os.path.basename(filename), line)
+    return label.replace(';', ',')
@@ -0,0 +1,300 @@
+import html
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .compare import prepare_result_directory
+from .scaling import scaling_table
+
+# compared figures of both frameworks: record suffix, label
+MEMORY_ITEMS = [('memory', 'Solver Memory [Mb]')]
+LP_ITEMS = [('const', 'Constraints'),
+            ('lp_variables', 'Variables'),
+            ('lp_nonzeros', 'Nonzeros')]
+RATIO_ITEMS = [('build_time', 'Build Time'),
+               ('solve_time', 'Solve Time'),
+               ('memory', 'Solver Memory'),
+               ('const', 'Constraints'),
+               ('lp_nonzeros', 'Nonzeros'),
+               ('obj', 'Objective Value')]
+FRAMEWORKS = ('urbs', 'oemof')
+
+
+def benchmark_metadata():
+    """
+    Describes the machine and code a benchmark ran on
+
+    Returns:
+        a dict with the keys 'created', 'python', 'platform', 'machine',
+        'processor', 'cpu_count', 'commit' (git commit of the working
+        directory, or None) and 'versions' (of the main packages)
+    """
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        commit = commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    versions = {}
+    for package in ('pyomo', 'oemof', 'pandas', 'numpy'):
+        module = sys.modules.get(package)
+        versions[package] = getattr(module, '__version__', None)
+
+    return {'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'commit': commit,
+            'versions': versions}
+
+
+def write_benchmark_report(records, summary, fits, by='timesteps',
+                           extrapolate=None, result_dir=None):
+    """
+    Writes the benchmark results as tables and a self-contained HTML report
+
+    Written files:
+        benchmark.csv: one row per run
+        scaling.csv: fitted scaling models, see scaling_table
+        benchmark.json: metadata (see benchmark_metadata), runs and fits
+        benchmark.html: per-phase timings, memory, LP size, oemof/urbs
+                        ratios and fitted scaling curves; the figures are
+                        embedded as SVG
+
+    Args:
+        records: a DataFrame with one row per run, see mimo.benchmarking
+        summary: its median/min/max per problem size
+        fits: a dict of column: ScalingFit, see fit_scaling
+        by: column holding the problem size
+        extrapolate: (optional) problem size the fits are extrapolated to
+        result_dir: (optional) output directory; default: a new time
+                    stamped 'benchmark' directory
+
+    Returns:
+        result_dir: the output directory
+    """
+    if result_dir is None:
+        result_dir = prepare_result_directory('benchmark')
+    metadata = benchmark_metadata()
+    table = scaling_table(fits, extrapolate)
+
+    # raw tables
+    records.to_csv(os.path.join(result_dir, 'benchmark.csv'), index=False)
+    table.to_csv(os.path.join(result_dir, 'scaling.csv'))
+    with open(os.path.join(result_dir, 'benchmark.json'), 'w') as f:
+        json.dump({'metadata': metadata,
+                   'by': by,
+                   'extrapolate': extrapolate,
+                   'records': json.loads(records.to_json(orient='records')),
+                   'scaling': json.loads(table.reset_index().to_json(
+                       orient='records'))},
+                  f, indent=1)
+
+    # html summary
+    xlabel = {'timesteps': 'Timesteps [h]'}.get(by, by.capitalize())
+    sections = [
+        ('Timings per Phase', _phase_figure(summary, xlabel)),
+        ('Memory', _series_figure(
+            summary, xlabel, _framework_columns(MEMORY_ITEMS) +
+            [('peak_rss', 'Peak RSS per Run [Mb]')] +
+            [(phase+'_memory', phase.replace('_', ' ')+' Python Peak [Mb]')
+             for phase in _phases(summary)])),
+        ('LP Size', _series_figure(
+            summary, xlabel, _framework_columns(LP_ITEMS))),
+        ('Ratios oemof / urbs', _ratio_figure(summary, xlabel)),
+        ('Scaling', _fit_figure(records, fits, by, xlabel)),
+        ]
+    with open(os.path.join(result_dir, 'benchmark.html'), 'w',
+              encoding='utf-8') as f:
+        f.write(_html(metadata, sections, table, summary))
+
+    return result_dir
+
+
+###############################################################################
+# Figures
+###############################################################################
+
+def _framework_columns(items):
+    # (column, label) of both frameworks for (suffix, label) items
+    return [(name+'_'+suffix, name+' '+label)
+            for suffix, label in items for name in FRAMEWORKS]
+
+
+def _medians(summary, column):
+    # median, lower and upper error of a summary column
+    median = summary[(column, 'median')].values.astype(float)
+    low = summary[(column, 'min')].values.astype(float)
+    high = summary[(column, 'max')].values.astype(float)
+    return median, median - low, high - median
+
+
+def _phases(summary):
+    # recorded phases, see PhaseRecorder
+    return [column[:-len('_time')] for column in
+            summary.columns.get_level_values(0).unique()
+            if column.endswith('_time') and
+            not column.endswith(('_wall_time', '_solver_time'))]
+
+
+def _phase_figure(summary, xlabel):
+    # stacked median phase timings, one bar per framework and size
+    import matplotlib.pyplot as plt
+    phases = _phases(summary)
+    if not phases:
+        return None
+
+    fig, ax = plt.subplots(figsize=(9, 4.5))
+    positions = np.arange(len(summary.index))
+    width = 0.8 / len(FRAMEWORKS)
+    for k, name in enumerate(FRAMEWORKS):
+        bottom = np.zeros(len(positions))
+        for phase in phases:
+            if not phase.startswith(name+'_'):
+                continue
+            median = summary[(phase+'_time', 'median')].values.astype(float)
+            ax.bar(positions + (k - 0.5) * width, median, width,
+                   bottom=bottom, label=phase.replace('_', ' '))
+            bottom += np.nan_to_num(median)
+
+    ax.set_xticks(positions)
+    ax.set_xticklabels([str(point) for point in summary.index])
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Median Time [secs]')
+    ax.grid(True, axis='y')
+    ax.legend()
+    return fig
+
+
+def _series_figure(summary, xlabel, columns):
+    # medians with min/max error bars of some summary columns
+    import matplotlib.pyplot as plt
+    columns = [(column, label) for column, label in columns
+               if column in summary]
+    if not columns:
+        return None
+
+    fig, ax = plt.subplots(figsize=(9, 4.5))
+    for column, label in columns:
+        median, low, high = _medians(summary, column)
+        ax.errorbar(summary.index, median, yerr=[low, high], label=label,
+                    marker='.', capsize=2)
+    ax.set_xscale('log')
+    ax.set_xlabel(xlabel)
+    ax.grid(True)
+    ax.legend()
+    return fig
+
+
+def _ratio_figure(summary, xlabel):
+    # oemof median / urbs median of compared figures
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(9, 4.5))
+    drawn = False
+    for suffix, label in RATIO_ITEMS:
+        urbs, oemof = ['{}_{}'.format(name, suffix) for name in FRAMEWORKS]
+        if urbs not in summary or oemof not in summary:
+            continue
+        ratio = (summary[(oemof, 'median')].values.astype(float) /
+                 summary[(urbs, 'median')].values.astype(float))
+        ax.plot(summary.index, ratio, label=label, marker='.')
+        drawn = True
+    if not drawn:
+        plt.close(fig)
+        return None
+
+    ax.axhline(1, color='grey', linewidth=1)
+    ax.set_xscale('log')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('oemof / urbs')
+    ax.grid(True)
+    ax.legend()
+    return fig
+
+
+def _fit_figure(records, fits, by, xlabel):
+    # measured runs and fitted curve with confidence band per fitted column
+    import matplotlib.pyplot as plt
+    if not fits:
+        return None
+
+    cols = 3
+    rows = -(-len(fits) // cols)
+    fig, axes = plt.subplots(rows, cols, figsize=(12, 3.5 * rows),
+                             squeeze=False)
+    x = records[by].values.astype(float)
+    grid = np.geomspace(max(x.min(), 1), x.max(), 50)
+    for ax, (column, fit) in zip(axes.flat, fits.items()):
+        prediction = np.array([fit.predict(point) for point in grid])
+        ax.plot(x, pd.to_numeric(records[column], errors='coerce'),
+                linestyle='None', marker='.', label='runs')
+        ax.plot(grid, prediction[:, 0], label='fit')
+        ax.fill_between(grid, prediction[:, 1], prediction[:, 2],
+                        alpha=0.3, label='{:.0%} interval'.format(
+                            fit.confidence))
+        ax.set_xscale('log')
+        if fit.model == 'power':
+            ax.set_yscale('log')
+        ax.set_title('{} ~ x^{:.2f}'.format(column, fit.exponent))
+        ax.set_xlabel(xlabel)
+        ax.grid(True)
+    axes.flat[0].legend()
+    for ax in list(axes.flat)[len(fits):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    return fig
+
+
+###############################################################################
+# HTML
+###############################################################################
+
+def _svg(fig):
+    # figure as inline SVG element
+    import matplotlib.pyplot as plt
+    buffer = io.StringIO()
+    fig.savefig(buffer, format='svg', bbox_inches='tight')
+    plt.close(fig)
+    svg = buffer.getvalue()
+    return svg[svg.index('<svg'):]
+
+
+def _html(metadata, sections, table, summary):
+    # self-contained html page of the report
+    rows = ''.join('<tr><th>{}</th><td>{}</td></tr>'.format(
+        html.escape(str(key)), html.escape(str(value)))
+        for key, value in metadata.items())
+
+    body = ['<h1>urbs / oemof Benchmark</h1>',
+            '<table class="meta">{}</table>'.format(rows)]
+    for title, fig in sections:
+        if fig is not None:
+            body.append('<h2>{}</h2>'.format(html.escape(title)))
+            body.append(_svg(fig))
+    if not table.empty:
+        body.append('<h2>Fitted Scaling</h2>')
+        body.append(table.to_html(float_format='{:.4g}'.format))
+    body.append('<h2>Medians</h2>')
+    medians = summary.xs('median', axis=1, level=1)
+    body.append(medians.T.to_html(float_format='{:.4g}'.format))
+
+    return ('<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+            '<title>urbs / oemof Benchmark</title><style>'
+            'body{font-family:sans-serif;margin:2em}'
+            'table{border-collapse:collapse;font-size:0.85em}'
+            'td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}'
+            'table.meta td,table.meta th{text-align:left}'
+            'svg{max-width:100%;height:auto}'
+            '</style></head><body>\n' + '\n'.join(body) +
+            '\n</body></html>\n')
@@ -0,0 +1,255 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# fitted models: 'power' y = coefficient * x ** exponent, 'polynomial'
+MODELS = ('power', 'polynomial')
+
+
+class ScalingFit:
+    """Least squares fit of a benchmark figure over the problem size
+
+    Power laws are fitted as straight lines in log-log space, so the
+    exponent is the slope and the intervals are those of the line.
+
+    Attributes:
+        column: name of the fitted record column
+        model: 'power' or 'polynomial'
+        parameters: power: array [coefficient, exponent]; polynomial:
+                    array of coefficients, highest degree first
+        intervals: array (parameters x 2) of the confidence intervals
+        confidence: confidence level of the intervals, e.g. 0.95
+        r_squared: coefficient of determination (power: in log-log space)
+        samples: number of fitted values
+    """
+
+    def __init__(self, column, model, parameters, intervals, covariance,
+                 confidence, r_squared, samples, dof):
+        self.column = column
+        self.model = model
+        self.parameters = parameters
+        self.intervals = intervals
+        self.confidence = confidence
+        self.r_squared = r_squared
+        self.samples = samples
+        self._covariance = covariance
+        self._dof = dof
+
+    def __repr__(self):
+        return 'ScalingFit({!r}, {!r}, parameters={})'.format(
+            self.column, self.model, self.parameters.tolist())
+
+    @property
+    def exponent(self):
+        """Scaling exponent: power law exponent or polynomial degree"""
+        if self.model == 'power':
+            return self.parameters[1]
+        return len(self.parameters) - 1
+
+    def predict(self, x):
+        """
+        Extrapolates the fitted figure
+
+        Args:
+            x: problem size, e.g. 8760 timesteps
+
+        Returns:
+            (value, low, high): the predicted value and the confidence
+            interval of the fitted curve at x
+        """
+        if self.model == 'power':
+            design = np.array([1.0, math.log(x)])
+        else:
+            design = float(x) ** np.arange(len(self.parameters))[::-1]
+        estimate = design.dot(self._parameters())
+        error = math.sqrt(max(design.dot(self._covariance).dot(design), 0))
+        margin = _t_quantile(self.confidence, self._dof) * error
+        values = np.array([estimate, estimate - margin, estimate + margin])
+        if self.model == 'power':
+            values = np.exp(values)
+        return tuple(values.tolist())
+
+    def to_dict(self):
+        """Returns the fit as flat dict, e.g. for benchmark reports"""
+        record = {'column': self.column,
+                  'model': self.model,
+                  'r_squared': self.r_squared,
+                  'samples': self.samples}
+        if self.model == 'power':
+            names = ['coefficient', 'exponent']
+        else:
+            names = ['p{}'.format(k) for k in
+                     range(len(self.parameters) - 1, -1, -1)]
+        for name, value, (low, high) in zip(names, self.parameters,
+                                            self.intervals):
+            record[name] = value
+            record[name+'_low'] = low
+            record[name+'_high'] = high
+        return record
+
+    def _parameters(self):
+        # parameters of the linear least squares problem
+        if self.model == 'power':
+            return np.array([math.log(self.parameters[0]),
+                             self.parameters[1]])
+        return self.parameters
+
+
+def fit_power_law(x, y, column=None, confidence=0.95):
+    """
+    Fits y = coefficient * x ** exponent
+
+    Args:
+        x: problem sizes, e.g. horizon lengths (of all repeated runs)
+        y: measured values; non-positive and missing values are ignored
+        column: (optional) name of the fitted figure
+        confidence: confidence level of the intervals
+
+    Returns:
+        fit: a ScalingFit, or None if fewer than 3 valid values are given
+    """
+    x, y = _valid(x, y)
+    valid = (x > 0) & (y > 0)
+    x, y = x[valid], y[valid]
+    if len(x) < 3 or len(np.unique(x)) < 2:
+        return None
+
+    design = np.column_stack([np.ones(len(x)), np.log(x)])
+    parameters, intervals, covariance, r_squared, dof = _least_squares(
+        design, np.log(y), confidence)
+    # coefficient and its interval back from log scale
+    parameters[0] = math.exp(parameters[0])
+    intervals[0] = np.exp(intervals[0])
+    return ScalingFit(column, 'power', parameters, intervals, covariance,
+                      confidence, r_squared, len(x), dof)
+
+
+def fit_polynomial(x, y, degree=2, column=None, confidence=0.95):
+    """
+    Fits a polynomial of the given degree
+
+    Args:
+        x: problem sizes, e.g. horizon lengths (of all repeated runs)
+        y: measured values; missing values are ignored
+        degree: polynomial degree
+        column: (optional) name of the fitted figure
+        confidence: confidence level of the intervals
+
+    Returns:
+        fit: a ScalingFit, or None if too few values are given
+    """
+    x, y = _valid(x, y)
+    if len(x) < degree + 2 or len(np.unique(x)) <= degree:
+        return None
+
+    design = np.vander(x, degree + 1)
+    parameters, intervals, covariance, r_squared, dof = _least_squares(
+        design, y, confidence)
+    return ScalingFit(column, 'polynomial', parameters, intervals,
+                      covariance, confidence, r_squared, len(x), dof)
+
+
+def fit_scaling(records, columns, by='point', model='power', degree=2,
+                confidence=0.95):
+    """
+    Fits the scaling of benchmark figures over the problem size
+
+    All repeated runs are fitted, so the intervals include their spread.
+
+    Args:
+        records: a DataFrame of benchmark runs, see run_points
+        columns: record columns to fit, e.g. ['urbs_build_time']
+        by: column holding the problem size
+        model: 'power' or 'polynomial'
+        degree: polynomial degree
+        confidence: confidence level of the intervals
+
+    Returns:
+        fits: a dict of column: ScalingFit, for all columns present in
+              records with enough values
+    """
+    if model not in MODELS:
+        raise ValueError("model must be one of {}".format(MODELS))
+
+    fits = {}
+    for column in columns:
+        if column not in records:
+            continue
+        y = pd.to_numeric(records[column], errors='coerce')
+        if model == 'power':
+            fit = fit_power_law(records[by], y, column, confidence)
+        else:
+            fit = fit_polynomial(records[by], y, degree, column, confidence)
+        if fit is not None:
+            fits[column] = fit
+    return fits
+
+
+def scaling_table(fits, extrapolate=None):
+    """
+    Tabulates fitted scaling models
+
+    Args:
+        fits: a dict of column: ScalingFit, see fit_scaling
+        extrapolate: (optional) problem size to predict the figures at, e.g.
+                     8760 timesteps
+
+    Returns:
+        table: a DataFrame indexed by column with the fitted parameters and
+               their intervals; with extrapolate, also 'prediction' and its
+               interval 'prediction_low' and 'prediction_high'
+    """
+    rows = []
+    for column, fit in fits.items():
+        row = fit.to_dict()
+        if extrapolate is not None:
+            (row['prediction'], row['prediction_low'],
+             row['prediction_high']) = fit.predict(extrapolate)
+        rows.append(row)
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).set_index('column')
+
+
+def _valid(x, y):
+    # float arrays of x, y without missing values
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    return x[valid], y[valid]
+
+
+def _least_squares(design, y, confidence):
+    # parameters, intervals, covariance, r squared and degrees of freedom
+    # of the linear least squares fit of design * parameters = y
+    parameters, _, rank, _ = np.linalg.lstsq(design, y, rcond=None)
+    residuals = y - design.dot(parameters)
+    dof = max(len(y) - design.shape[1], 1)
+    variance = residuals.dot(residuals) / dof
+    covariance = variance * np.linalg.pinv(design.T.dot(design))
+    margin = _t_quantile(confidence, dof) * np.sqrt(np.diag(covariance))
+    intervals = np.column_stack([parameters - margin, parameters + margin])
+
+    total = ((y - y.mean()) ** 2).sum()
+    r_squared = 1 - residuals.dot(residuals) / total if total > 0 else 1.0
+    return parameters, intervals, covariance, r_squared, dof
+
+
+def _t_quantile(confidence, dof):
+    # two-sided quantile of Student's t distribution: exact for 1 and 2
+    # degrees of freedom, else a Cornish-Fisher expansion of the normal
+    # quantile (error below 0.005 from 3 degrees of freedom on)
+    p = 0.5 + confidence / 2
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) * math.sqrt(2 / (4 * p * (1 - p)))
+    z = NormalDist().inv_cdf(p)
+    v = float(dof)
+    return (z + (z**3 + z) / (4 * v) +
+            (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2) +
+            (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3) +
+            (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 -
+             945 * z) / (92160 * v**4))
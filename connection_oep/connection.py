@@ -1,11 +1,8 @@
-import oedialect
 import getpass
 import pandas as pd
-import sqlalchemy as sa
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
 
-Base = declarative_base()
+# sqlalchemy and the OEP dialect (oedialect) are imported by the functions
+# talking to the OEP, reading and writing input files does not need them
 
 
 def read_data(filename):
@@ -36,6 +33,9 @@ def read_data(filename):
 
 
 def connect_oep(user=None, token=None):
+    import oedialect  # registers the postgresql+oedialect engine
+    import sqlalchemy as sa
+
     if user is None or token is None:
         user = input('Enter OEP-username:')
         token = getpass.getpass('Token:')
@@ -53,6 +53,8 @@ def connect_oep(user=None, token=None):
 
 def setup_table(table_name, schema_name='sandbox',
                 metadata=None):
+    import sqlalchemy as sa
+
     if table_name == 'mimo_global_prop':
         table = sa.Table(
             table_name,
@@ -190,6 +192,8 @@ def setup_table(table_name, schema_name='sandbox',
 
 
 def upload_to_oep(df, table, engine, metadata):
+    from sqlalchemy.orm import sessionmaker
+
     table_name = table.name
     schema_name = table.schema
 
@@ -222,6 +226,8 @@ def upload_to_oep(df, table, engine, metadata):
 
 
 def get_df(engine, table):
+    from sqlalchemy.orm import sessionmaker
+
     Session = sessionmaker(bind=engine)
     session = Session()
     df = pd.DataFrame(session.query(table).all())
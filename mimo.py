@@ -5,11 +5,8 @@
 import urbs
 from pyomo.opt.base import SolverFactory
 
-# oemof
-import oemofm
-import oemof.solph as solph
-import oemof.outputlib as outputlib
-from oemof.graph import create_nx_graph
+# oemof: oemofm (oemof.solph, networkx) is imported by create_om, so urbs
+# runs and workers do not load it
 
 # comparison
 import comparison as comp
@@ -18,91 +15,355 @@ import comparison as comp
 import connection_oep as conn
 
 # misc.
+import logging
 import os
-import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from modelinput import compile_input
+from urbs.saveload import ResultContainer, create_result_cache
 
 
 ###############################################################################
 # Comparison & Benchmarking
 ###############################################################################
-def benchmarking(input_data):
+# benchmark figures fitted over the problem size
+SCALING_COLUMNS = ['urbs_build_time', 'oemof_build_time',
+                   'urbs_solve_time', 'oemof_solve_time',
+                   'urbs_memory', 'oemof_memory', 'peak_rss',
+                   'urbs_const', 'oemof_const']
+
+# post-processing phases of urbs, see postprocessing_point
+POSTPROCESSING_PHASES = ['urbs_result_cache', 'urbs_result_cube',
+                         'urbs_hdf5_save', 'urbs_hdf5_load',
+                         'urbs_report', 'urbs_report_streaming',
+                         'urbs_figures']
+POSTPROCESSING_COLUMNS = (['urbs_solve_time', 'peak_rss'] +
+                          [phase+'_time' for phase in POSTPROCESSING_PHASES] +
+                          [phase+'_memory' for phase in POSTPROCESSING_PHASES])
+
+
+def benchmarking(input_data, lengths=None, max_length=1000, repeat=3,
+                 trace_memory=False, extrapolate=8760):
     """
     Function for benchmarking urbs & oemof
 
+    Each run of a benchmark point builds, solves and compares both models in
+    a freshly spawned process (see comp.run_points), so its memory figures
+    are not polluted by models, caches or global state of earlier runs.
+    Unless given, the horizon lengths are sampled on a geometric grid,
+    refined where the curves bend (see comp.adaptive_points).
+
     Args:
         input_data: input data
+        lengths: (optional) list of horizon lengths to benchmark
+        max_length: longest sampled horizon length, if lengths is not given
+        repeat: number of runs per horizon length
+        trace_memory: record the tracemalloc peak of each phase (slows down
+                      the measured phases)
+        extrapolate: horizon length to extrapolate the fitted figures to
 
     Returns:
-        bench: a dictionary containing benchmarking values
+        (records, summary, fits): a DataFrame with one row per run (see
+        benchmark_point), its median/min/max per horizon length and the
+        power laws fitted to SCALING_COLUMNS (see comp.fit_scaling)
     """
-    # init
-    bench = {}
-
-    # [1,10,20,30,40,50,60,70,80,90,100,200,300,400,500,600,700,800,900,1000]
-    for i in range(1, 1001):
-        # simulation timesteps
-        (offset, length) = (0, i)  # time step selection
-        timesteps = range(offset, offset + length + 1)
+    kwargs = {'input_data': input_data, 'trace_memory': trace_memory}
+    if lengths is None:
+        records = comp.adaptive_points(benchmark_point, 1, max_length,
+                                       SCALING_COLUMNS, repeat=repeat,
+                                       **kwargs)
+    else:
+        records = comp.run_points(benchmark_point, lengths, repeat=repeat,
+                                  **kwargs)
+    records = records.rename(columns={'point': 'timesteps'})
+    return evaluate_benchmark(records, 'timesteps', extrapolate)
 
-        if i == 1:
-            urbs_model, urbs_time = create_um(input_data, timesteps)
-            oemof_model, oemof_time = create_om(input_data, timesteps)
 
-            bench[i] = comparison(urbs_model, oemof_model,
-                                  threshold=0.1, benchmark=True)
+def site_benchmarking(input_data, length=100, repeat=3, trace_memory=False):
+    """
+    Function for benchmarking urbs & oemof over the number of sites
 
-            # setting build time for urbs
-            bench[i][0]['build'] = urbs_time
-            # setting build time for oemof
-            bench[i][1]['build'] = oemof_time
+    The first 1, 2, ... sites of the input data are modelled (see
+    select_sites), for a fixed horizon length.
 
-        elif i <= 100 and i % 10 == 0:
-            urbs_model, urbs_time = create_um(input_data, timesteps)
-            oemof_model, oemof_time = create_om(input_data, timesteps)
+    Args:
+        input_data: input data
+        length: horizon length in timesteps
+        repeat: number of runs per site count
+        trace_memory: record the tracemalloc peak of each phase
 
-            bench[i] = comparison(urbs_model, oemof_model,
-                                  threshold=0.1, benchmark=True)
+    Returns:
+        (records, summary, fits): see benchmarking, per site count
+    """
+    records = comp.adaptive_points(benchmark_sites, 1,
+                                   len(input_data['site'].index),
+                                   SCALING_COLUMNS, repeat=repeat,
+                                   input_data=input_data, length=length,
+                                   trace_memory=trace_memory)
+    records = records.rename(columns={'point': 'sites'})
+    return evaluate_benchmark(records, 'sites')
 
-            # setting build time for urbs
-            bench[i][0]['build'] = urbs_time
-            # setting build time for oemof
-            bench[i][1]['build'] = oemof_time
 
-        elif i > 100 and i % 100 == 0:
-            urbs_model, urbs_time = create_um(input_data, timesteps)
-            oemof_model, oemof_time = create_om(input_data, timesteps)
+def postprocessing_benchmarking(input_data, lengths=None, max_length=1000,
+                                sites=None, repeat=3, trace_memory=True):
+    """
+    Function for benchmarking the post-processing of urbs results
 
-            bench[i] = comparison(urbs_model, oemof_model,
-                                  threshold=0.1, benchmark=True)
+    The urbs model is solved once per run, then result cache, result cube,
+    HDF5 save and load, report and figures are measured separately (see
+    postprocessing_point). Each run takes place in a fresh process.
 
-            # setting build time for urbs
-            bench[i][0]['build'] = urbs_time
-            # setting build time for oemof
-            bench[i][1]['build'] = oemof_time
+    Args:
+        input_data: input data
+        lengths: (optional) list of horizon lengths to benchmark; default:
+                 sampled adaptively up to max_length
+        max_length: longest sampled horizon length, if lengths is not given
+        sites: (optional) list of site counts (see select_sites); default:
+               all sites of the input data
+        repeat: number of runs per horizon length
+        trace_memory: record the tracemalloc peak of each phase
 
+    Returns:
+        results: a dict of site count: (records, summary, fits), see
+                 benchmarking
+    """
+    if sites is None:
+        sites = [len(input_data['site'].index)]
+
+    results = {}
+    for n in sites:
+        kwargs = {'input_data': input_data, 'sites': n,
+                  'trace_memory': trace_memory}
+        if lengths is None:
+            records = comp.adaptive_points(postprocessing_point, 1,
+                                           max_length, POSTPROCESSING_COLUMNS,
+                                           repeat=repeat, **kwargs)
         else:
-            pass
+            records = comp.run_points(postprocessing_point, lengths,
+                                      repeat=repeat, **kwargs)
+        records = records.rename(columns={'point': 'timesteps'}).assign(
+            sites=n)
+        results[n] = evaluate_benchmark(records, 'timesteps',
+                                        columns=POSTPROCESSING_COLUMNS)
+    return results
+
 
-    # process benchmark
-    comp.process_benchmark(bench)
-    return bench
+def evaluate_benchmark(records, by, extrapolate=None,
+                       columns=SCALING_COLUMNS):
+    """
+    Summarizes, fits and plots benchmark records
+
+    Args:
+        records: a DataFrame with one row per run
+        by: column holding the problem size, 'timesteps' or 'sites'
+        extrapolate: (optional) problem size to extrapolate the fits to
+        columns: record columns to fit
+
+    Returns:
+        (records, summary, fits): see benchmarking
+    """
+    summary = comp.summarize_records(records, by=by)
+    fits = comp.fit_scaling(records, columns, by=by)
+
+    # terminal output
+    table = comp.scaling_table(fits, extrapolate)
+    if not table.empty:
+        columns = ['exponent', 'exponent_low', 'exponent_high', 'r_squared']
+        if extrapolate is not None:
+            columns += ['prediction', 'prediction_low', 'prediction_high']
+        print('----------------------------------------------------')
+        print('SCALING ({}, {:.0%} confidence)'.format(
+            by, next(iter(fits.values())).confidence))
+        if extrapolate is not None:
+            print('prediction at {} {}'.format(extrapolate, by))
+        print(table[columns].to_string(float_format='{:.4g}'.format))
+        print('----------------------------------------------------')
+
+    # benchmark report
+    result_dir = comp.write_benchmark_report(records, summary, fits, by,
+                                             extrapolate)
+    print('Benchmark report written to', result_dir)
+    return records, summary, fits
+
+
+def benchmark_point(length, input_data, trace_memory=False, sites=None):
+    """
+    Builds, solves and compares both models for one horizon length
 
+    Meant to run in a fresh process, see benchmarking.
 
-def comparison(u_model, o_model, threshold=0.1, benchmark=False):
+    Args:
+        length: horizon length in timesteps
+        input_data: input data
+        trace_memory: record the tracemalloc peak of each phase
+        sites: (optional) number of modelled sites, see select_sites
+
+    Returns:
+        record: a flat dict with the phase timings and memory peaks
+                ('urbs_build_time', 'oemof_solve_memory', ...), the compared
+                values ('urbs_obj', 'oemof_const', ...), the LP statistics
+                ('urbs_lp_nonzeros', ...), the solver metrics
+                ('urbs_solver_iterations', ...) and the peak resident memory
+                of the process ('peak_rss')
+    """
+    timesteps = range(0, length + 1)
+    if sites is not None:
+        input_data = select_sites(input_data, sites)
+    recorder = comp.PhaseRecorder(trace_memory)
+
+    # preprocessed once for both models
+    with recorder.phase('compile'):
+        input_data = compile_input(input_data)
+
+    urbs_model, urbs_time = create_um(input_data, timesteps,
+                                      recorder=recorder)
+    oemof_model, oemof_time = create_om(input_data, timesteps,
+                                        recorder=recorder)
+    urbs, oemof = comparison(urbs_model, oemof_model, benchmark=True,
+                             recorder=recorder)
+
+    record = recorder.to_dict()
+    for name, values in [('urbs', urbs), ('oemof', oemof)]:
+        for item in ['obj', 'cpu', 'memory', 'const']:
+            record[name+'_'+item] = values[item]
+        for item, value in values['lp'].items():
+            record[name+'_lp_'+item] = value
+        for item, value in values['solver'].items():
+            record[name+'_solver_'+item] = value
+    record['peak_rss'] = comp.peak_rss()
+    return record
+
+
+def benchmark_sites(sites, input_data, length, trace_memory=False):
+    # benchmark point of site_benchmarking
+    return benchmark_point(length, input_data, trace_memory, sites)
+
+
+def postprocessing_point(length, input_data, sites=None, trace_memory=True):
+    """
+    Solves urbs once and measures its post-processing for one horizon length
+
+    Meant to run in a fresh process, see postprocessing_benchmarking. All
+    files are written to a temporary directory, removed afterwards.
+
+    Args:
+        length: horizon length in timesteps
+        input_data: input data
+        sites: (optional) number of modelled sites, see select_sites
+        trace_memory: record the tracemalloc peak of each phase
+
+    Returns:
+        record: a flat dict with the timings and memory peaks of the phases
+                'urbs_build', 'urbs_solve' and POSTPROCESSING_PHASES (e.g.
+                'urbs_report_time'), the size of the HDF5 file in Mb
+                ('urbs_hdf5_size') and the peak resident memory of the
+                process ('peak_rss')
+    """
+    timesteps = range(0, length + 1)
+    if sites is not None:
+        input_data = select_sites(input_data, sites)
+    recorder = comp.PhaseRecorder(trace_memory)
+    model, _ = create_um(input_data, timesteps, recorder=recorder)
+
+    directory = tempfile.mkdtemp(prefix='postprocessing-')
+    filename = os.path.join(directory, 'urbs.h5')
+    try:
+        # the result cache is kept, so that the later phases only measure
+        # their own work; report and figures build their own result cube
+        with recorder.phase('urbs_result_cache'):
+            model._result = create_result_cache(model)
+        with recorder.phase('urbs_result_cube'):
+            urbs.create_result_cube(model)
+        with recorder.phase('urbs_hdf5_save'):
+            urbs.save(model, filename)
+        with recorder.phase('urbs_hdf5_load'):
+            urbs.load(filename)
+        with recorder.phase('urbs_report'):
+            urbs.report(model, os.path.join(directory, 'report.xlsx'))
+        with recorder.phase('urbs_report_streaming'):
+            urbs.report(model, os.path.join(directory, 'streaming.xlsx'),
+                        streaming=True)
+        with recorder.phase('urbs_figures'):
+            urbs.result_figures(model, os.path.join(directory, 'plot'),
+                                timesteps, extensions=['png'])
+        hdf5_size = os.path.getsize(filename) / 1024.0 ** 2
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    record = recorder.to_dict()
+    record['urbs_hdf5_size'] = hdf5_size
+    record['peak_rss'] = comp.peak_rss()
+    return record
+
+
+def select_sites(input_data, sites):
+    """
+    Reduces the input data to its first sites
+
+    Args:
+        input_data: input data, as returned by conn.write_data
+        sites: number of sites to keep
+
+    Returns:
+        data: a copy of the input data, with all rows and timeseries columns
+              of other sites (and transmission lines to them) dropped
+    """
+    keep = list(input_data['site'].index[:sites])
+    data = {}
+    for key, df in input_data.items():
+        if key == 'site':
+            df = df.loc[keep]
+        elif key in ('demand', 'supim'):
+            df = df.loc[:, df.columns.get_level_values(0).isin(keep)]
+        else:
+            for level in ('Site', 'Site In', 'Site Out'):
+                if level in df.index.names:
+                    df = df[df.index.get_level_values(level).isin(keep)]
+        data[key] = df.copy()
+    return data
+
+
+def comparison(u_model, o_model, threshold=0.1, benchmark=False,
+               workers=None, recorder=None):
     """
     Function for comparing urbs & oemof
 
     Args:
-        u_model: urbs model instance use create_um() to generate
-        o_model: oemof model instance use create_om() to generate
+        u_model: urbs model instance use create_um() to generate, or
+                 UrbsResult as returned by create_models()
+        o_model: oemof model instance use create_om() to generate, its
+                 energy system (o_model.es) holds the results; or
+                 OemofResult as returned by create_models()
         threshold: threshold value for outputting the differences
         benchmark: a parameter for activate/deactivate benchmarking
+        workers: number of processes rendering the comparison plots
+        recorder: (optional) comp.PhaseRecorder recording the phases
+                  'comparison' and 'plotting' (comparison of the model
+                  variables)
 
     Returns:
         urbs: a dictionary containing the specific values
         oemof:  a dictionary containing the specific values
     """
-    # init
+    recorder = recorder or comp.PhaseRecorder()
+    with recorder.phase('comparison'):
+        urbs, oemof = _compare_figures(u_model, o_model)
+
+    # compare model variables
+    if len(comp.urbs_set(u_model, 'tm')) >= 2 and not benchmark:
+        o_es = o_model.es
+        with recorder.phase('plotting'):
+            sto = comp.compare_storages(u_model, o_es, threshold, workers)
+            tra = comp.compare_transmission(u_model, o_es, threshold, workers)
+            pro = comp.compare_process(u_model, o_es, threshold, workers)
+
+    return urbs, oemof
+
+
+def _compare_figures(u_model, o_model):
+    # objective, solver metrics and LP sizes of both models
     urbs = {}
     oemof = {}
 
@@ -119,59 +380,221 @@ def comparison(u_model, o_model, threshold=0.1, benchmark=False):
         print('Diff\t', u_model.obj() - o_model.objective())
     print('----------------------------------------------------')
 
-    # create oemof energysytem
-    o_model = solph.EnergySystem()
-    o_model.restore(dpath=None, filename=None)
+    # peak memory of the worker processes (parallel mode only)
+    urbs['process_memory'] = getattr(u_model, 'process_memory', None)
+    oemof['process_memory'] = getattr(o_model, 'process_memory', None)
 
     # compare cpu and memory
     urbs['cpu'], urbs['memory'], oemof['cpu'], oemof['memory'] = \
-        comp.compare_cpu_and_memory()
+        comp.compare_cpu_and_memory(u_model.solver_metrics,
+                                    o_model.solver_metrics)
+    urbs['solver'] = u_model.solver_metrics.to_dict()
+    oemof['solver'] = o_model.solver_metrics.to_dict()
 
     # compare lp files
-    urbs['const'], oemof['const'] = comp.compare_lp_files()
-
-    # compare model variables
-    if len(u_model.tm) >= 2 and not benchmark:
-        sto = comp.compare_storages(u_model, o_model, threshold)
-        tra = comp.compare_transmission(u_model, o_model, threshold)
-        pro = comp.compare_process(u_model, o_model, threshold)
-    else:
-        pass
+    urbs_lp, oemof_lp = comp.compare_lp_files()
+    urbs['const'] = urbs_lp.n_constraints
+    oemof['const'] = oemof_lp.n_constraints
+    urbs['lp'] = urbs_lp.to_dict()
+    oemof['lp'] = oemof_lp.to_dict()
 
     return urbs, oemof
 
 
+###############################################################################
+# Concurrent Models
+###############################################################################
+class UrbsResult(ResultContainer):
+    """Picklable results of a solved urbs model
+
+    Usable in place of the model instance by comparison.
+
+    Attributes:
+        objective_value: objective value
+        solver_metrics: SolverMetrics of the solve
+        process_memory: peak memory of the building process in Mb
+    """
+
+    def __init__(self, model, process_memory=None):
+        super(UrbsResult, self).__init__(model._data,
+                                         create_result_cache(model))
+        self.objective_value = model.obj()
+        self.solver_metrics = model.solver_metrics
+        self.process_memory = process_memory
+
+    def obj(self):
+        return self.objective_value
+
+
+class OemofResult:
+    """Picklable results of a solved oemof model
+
+    Usable in place of the model instance by comparison.
+
+    Attributes:
+        objective_value: objective value
+        solver_metrics: SolverMetrics of the solve
+        process_memory: peak memory of the building process in Mb
+        es: holds the results as es.results['main']
+    """
+
+    def __init__(self, model, process_memory=None):
+        self.objective_value = model.objective()
+        self.solver_metrics = model.solver_metrics
+        self.process_memory = process_memory
+        self.es = SimpleNamespace(results={'main': model.es.results['main']},
+                                  timeindex=model.es.timeindex)
+
+    def objective(self):
+        return self.objective_value
+
+
+def _run_urbs(input_data, timesteps, symbolic, profile_dir=None,
+              progress=None):
+    # worker process: build and solve urbs, return picklable results
+    recorder = comp.PhaseRecorder(profile_dir=profile_dir)
+    model, build_time = create_um(input_data, timesteps, symbolic, recorder,
+                                  progress)
+    with recorder.phase('urbs_results'):
+        result = UrbsResult(model, comp.peak_rss())
+    return result, build_time
+
+
+def _run_oemof(input_data, timesteps, symbolic, profile_dir=None,
+               progress=None):
+    # worker process: build and solve oemof, return picklable results
+    recorder = comp.PhaseRecorder(profile_dir=profile_dir)
+    model, build_time = create_om(input_data, timesteps, symbolic=symbolic,
+                                  recorder=recorder, progress=progress)
+    return OemofResult(model, comp.peak_rss()), build_time
+
+
+def create_models(input_data, timesteps, parallel=True, symbolic=False,
+                  profile_dir=None, progress=None):
+    """
+    Creates and solves the urbs and the oemof model
+
+    Args:
+        input_data: input data
+        timesteps: simulation timesteps
+        parallel: build and solve both models at the same time, each in its
+                  own process; build time, solver metrics and peak memory
+                  are measured within the process of each framework
+        symbolic: write the LP files with human-readable labels
+        profile_dir: (optional) directory to write a cProfile run of each
+                     phase to (see comp.PhaseRecorder); default: None (no
+                     profiling)
+        progress: (optional) urbs.ProgressReporter of builds and solves; if
+                  parallel, a copy is used in each process, so its
+                  callbacks must be picklable (e.g. module level functions)
+
+    Returns:
+        urbs_model, urbs_time, oemof_model, oemof_time: the models (or, if
+        parallel, UrbsResult and OemofResult) and their build times
+    """
+    if not parallel:
+        recorder = comp.PhaseRecorder(profile_dir=profile_dir)
+        urbs_model, urbs_time = create_um(input_data, timesteps, symbolic,
+                                          recorder, progress)
+        oemof_model, oemof_time = create_om(input_data, timesteps,
+                                            symbolic=symbolic,
+                                            recorder=recorder,
+                                            progress=progress)
+        return urbs_model, urbs_time, oemof_model, oemof_time
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        urbs_run = pool.submit(_run_urbs, input_data, timesteps, symbolic,
+                               profile_dir, progress)
+        oemof_run = pool.submit(_run_oemof, input_data, timesteps, symbolic,
+                                profile_dir, progress)
+        urbs_model, urbs_time = urbs_run.result()
+        oemof_model, oemof_time = oemof_run.result()
+
+    return urbs_model, urbs_time, oemof_model, oemof_time
+
+
+###############################################################################
+# Solve
+###############################################################################
+def solve_model(model, solve, filename, logfile, symbolic=False,
+                progress=None, name=None):
+    """
+    Solves a model with GLPK, keeping the LP file written for the solver
+
+    The LP file is only written once, by the solver interface. Without
+    symbolic labels, the names used in it are listed in a label map file
+    next to it (filename + '.labels', see comp.write_label_map).
+
+    Args:
+        model: an urbs or oemof model instance
+        solve: function solving the model, given the Pyomo solve arguments
+        filename: name the LP file is kept as
+        logfile: solver log file
+        symbolic: write the LP file with human-readable labels
+        progress: (optional) urbs.ProgressReporter, reports the iterations,
+                  objective and bounds parsed from the live solver output
+        name: model name used in the progress events
+
+    Returns:
+        result: the solver results; the solution is loaded into the model
+                and the SolverMetrics are set as model.solver_metrics
+    """
+    kwargs = {'logfile': logfile, 'tee': progress is not None,
+              'keepfiles': True, 'load_solutions': False,
+              'symbolic_solver_labels': symbolic}
+    with comp.keep_problem_file(filename):
+        result, model.solver_metrics = comp.measure_solve(
+            lambda: solve(**kwargs), 'glpk', logfile, progress=progress,
+            model=name)
+
+    labels = filename + '.labels'
+    if not symbolic:
+        comp.write_label_map(model, result, labels)
+    elif os.path.exists(labels):
+        os.remove(labels)
+    model.solutions.load_from(result)
+
+    return result
+
+
 ###############################################################################
 # urbs Model
 ###############################################################################
 
 # create urbs model
-def create_um(input_data, timesteps):
+def create_um(input_data, timesteps, symbolic=False, recorder=None,
+              progress=None):
     """
     Creates an urbs model for given input, time steps
 
     Args:
         input_data: input data
         timesteps: simulation timesteps
+        symbolic: write the LP file with human-readable labels
+        recorder: (optional) comp.PhaseRecorder recording the phases
+                  'urbs_build' and 'urbs_solve'
+        progress: (optional) urbs.ProgressReporter reporting the
+                  construction of each component and the solver progress
 
     Returns:
         model: a model instance
     """
+    recorder = recorder or comp.PhaseRecorder()
+
     # create model
     print('CREATING urbs MODEL')
-    start = time.perf_counter()
-    model = urbs.create_model(input_data, 1, timesteps)
-    end = time.perf_counter()
+    with recorder.phase('urbs_build'):
+        model = urbs.create_model(input_data, 1, timesteps,
+                                  progress=progress)
 
-    # solve model and read results
+    # solve model and read results, keeping the LP file
     optim = SolverFactory('glpk')
-    result = optim.solve(model, logfile='urbs_log.txt', tee=False)
-
-    # write LP file
     filename = os.path.join(os.path.dirname(__file__), 'mimo_urbs.lp')
-    model.write(filename, io_options={'symbolic_solver_labels': True})
+    with recorder.phase('urbs_solve'):
+        solve_model(model, lambda **kwargs: optim.solve(model, **kwargs),
+                    filename, 'urbs_log.txt', symbolic, progress, 'urbs')
 
-    return model, end - start
+    return model, recorder.time('urbs_build')
 
 
 ###############################################################################
@@ -179,45 +602,66 @@ def create_um(input_data, timesteps):
 ###############################################################################
 
 # create oemof model
-def create_om(input_data, timesteps):
+def create_om(input_data, timesteps, result_dir=None, symbolic=False,
+              recorder=None, progress=None):
     """
     Creates an oemof model for given input, time steps
 
     Args:
         input_data: input data
         timesteps: simulation timesteps
+        symbolic: write the LP file with human-readable labels
+        result_dir: (optional) directory to save the results to, as
+                    'oemof-results.npz' (see oemofm.save_results); default:
+                    None (results are only kept in memory)
+        recorder: (optional) comp.PhaseRecorder recording the phases
+                  'oemof_build', 'oemof_solve' and 'oemof_results'
+        progress: (optional) urbs.ProgressReporter reporting the build (as
+                  a whole) and the solver progress
 
     Returns:
         model: a model instance
     """
+    import oemofm
+    recorder = recorder or comp.PhaseRecorder()
+
     # create oemof energy system
     print('CREATING oemof MODEL')
-    start = time.perf_counter()
-    es, model = oemofm.create_model(input_data, timesteps)
-    end = time.perf_counter()
-
-    # solve model and read results
-    model.solve(solver='glpk',
-                solve_kwargs={'logfile': 'oemof_log.txt', 'tee': False})
-
-    # write LP file
+    with recorder.phase('oemof_build'):
+        if progress is not None:
+            progress.construction_started('oemof', 'model', 'Model')
+        es, model = oemofm.create_model(input_data, timesteps)
+    if progress is not None:
+        progress.constructed('oemof', 'model', 'Model', model.nconstraints(),
+                             recorder.time('oemof_build'))
+
+    # solve model and read results, keeping the LP file
     filename = os.path.join(os.path.dirname(__file__), 'mimo_oemof.lp')
-    model.write(filename, io_options={'symbolic_solver_labels': True})
+    with recorder.phase('oemof_solve'):
+        solve_model(model,
+                    lambda **kwargs: model.solve(solver='glpk',
+                                                 solve_kwargs=kwargs),
+                    filename, 'oemof_log.txt', symbolic, progress, 'oemof')
 
     # draw graph
     graph = False
     if graph:
+        from oemof.graph import create_nx_graph
         graph = create_nx_graph(es, model)
         oemofm.draw_graph(graph, plot=True, layout='neato', node_size=3000,
                           node_color={'b_0': '#cd3333',
                                       'b_1': '#7EC0EE',
                                       'b_2': '#eeac7e'})
 
-    # get results
-    es.results['main'] = outputlib.processing.results(model)
-    es.dump(dpath=None, filename=None)
+    # get results, kept in memory with the energy system (model.es)
+    with recorder.phase('oemof_results'):
+        es.results['main'] = oemofm.extract_results(model)
+        if result_dir is not None:
+            oemofm.save_results(es.results['main'],
+                                os.path.join(result_dir,
+                                             'oemof-results.npz'))
 
-    return model, end - start
+    return model, recorder.time('oemof_build')
 
 
 if __name__ == '__main__':
@@ -234,8 +678,24 @@ if __name__ == '__main__':
     (offset, length) = (0, 10)  # time step selection
     timesteps = range(offset, offset + length + 1)
 
+    # profiling of each phase, enabled by the environment variable
+    # MIMO_PROFILE (see comp.profile_directory)
+    profile_dir = comp.profile_directory()
+    recorder = comp.PhaseRecorder(profile_dir=profile_dir)
+
+    # progress of model builds and solves as JSON log lines, enabled by the
+    # environment variable MIMO_PROGRESS
+    progress = None
+    if os.environ.get('MIMO_PROGRESS'):
+        logging.basicConfig(format='%(message)s', level=logging.INFO)
+        progress = urbs.ProgressReporter(
+            logger=logging.getLogger('mimo.progress'))
+
     # load data
-    data = conn.read_data(input_file)
+    with recorder.phase('input'):
+        data = conn.read_data(input_file)
+        if not connection:
+            input_data = conn.write_data(data)
 
     # establish connection to OEP
     if connection:
@@ -272,10 +732,13 @@ if __name__ == '__main__':
         # write data
         input_data = conn.write_data(input_data)
 
-    else:
-        # write data
-        input_data = data
-        input_data = conn.write_data(input_data)
+    # validate data
+    with recorder.phase('validation'):
+        urbs.validate_input(input_data)
+
+    # preprocess data once for both models
+    with recorder.phase('compile'):
+        input_data = compile_input(input_data)
 
     # benchmarking
     if benchmark:
@@ -286,7 +749,12 @@ if __name__ == '__main__':
     # comparing
     else:
         print('COMPARING-------------------------------------------')
-        urbs_model, urbs_time = create_um(input_data, timesteps)
-        oemof_model, oemof_time = create_om(input_data, timesteps)
-        comparison(urbs_model, oemof_model, threshold=0.1)
+        urbs_model, urbs_time, oemof_model, oemof_time = create_models(
+            input_data, timesteps, parallel=True, profile_dir=profile_dir,
+            progress=progress)
+        comparison(urbs_model, oemof_model, threshold=0.1,
+                   recorder=recorder)
         print('COMPARING-COMPLETED---------------------------------')
+
+    if profile_dir is not None:
+        print('Profiles written to', profile_dir)
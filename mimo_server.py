@@ -0,0 +1,509 @@
+"""Local model server keeping imports, inputs and urbs models warm
+
+Every run of mimo.py imports Pyomo, oemof, pandas and matplotlib, parses
+the Excel input and builds the models anew. This server pays for that once:
+it keeps the parsed input files and the built and solved urbs models in
+memory and answers what-if queries over localhost HTTP or a Unix socket.
+
+A query names an input file, a time step selection and a scenario delta,
+a list of changes to the input data (see apply_delta). Queries are solved
+one after another by a single worker thread, as Pyomo models and solver
+plugins are not thread-safe; concurrent queries wait in its queue.
+
+Usage:
+    python mimo_server.py --port 8765 --memory-cap 4000
+    python mimo_server.py --socket /tmp/mimo.sock
+
+    curl localhost:8765/solve -d '{"timesteps": [0, 24], "delta": [
+        {"sheet": "commodity", "index": ["Mid", "Gas", "Stock"],
+         "column": "price", "factor": 1.5}]}'
+    curl --unix-socket /tmp/mimo.sock http://mimo/status
+
+Endpoints:
+    GET /status: held models, queue length and memory
+    POST /solve: solves a scenario, returns its summary (see solve)
+    POST /timeseries: timeseries of a commodity of a held model
+    POST /evict: drops a held model ({"key": ...}) or all models ({})
+"""
+
+###############################################################################
+# IMPORTS
+###############################################################################
+import argparse
+import gc
+import hashlib
+import json
+import os
+import queue
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+from pyomo.opt.base import SolverFactory
+
+import comparison as comp
+import connection_oep as conn
+import urbs
+from mimo import solve_model
+
+# default time step selection (offset, length), as in mimo.py
+DEFAULT_TIMESTEPS = (0, 10)
+
+
+###############################################################################
+# Scenario Deltas
+###############################################################################
+def apply_delta(input_data, delta):
+    """
+    Applies a scenario delta to the input data
+
+    Each change of the delta is a dict with the keys
+        sheet: input data key, e.g. 'commodity', 'process' or 'demand'
+        column: column name; for 'demand', 'supim' and 'eff_factor' a
+                [site, commodity] pair
+        index: (optional) row label, a list for multi-level indices (e.g.
+               ["Mid", "Gas", "Stock"]); default: all rows
+        value: new value, or
+        factor: factor the current values are multiplied with
+
+    Args:
+        input_data: input data, as returned by conn.write_data
+        delta: list of changes
+
+    Returns:
+        data: the changed input data; changed sheets are copies, the others
+              are shared with input_data (returned as is without changes)
+    """
+    if not delta:
+        return input_data
+
+    data = dict(input_data)
+    copied = set()
+    for change in delta or []:
+        sheet = change.get('sheet')
+        if sheet not in data:
+            raise ValueError('unknown sheet {!r}'.format(sheet))
+        if ('value' in change) == ('factor' in change):
+            raise ValueError('a change needs either a value or a factor')
+        if sheet not in copied:
+            data[sheet] = data[sheet].copy()
+            copied.add(sheet)
+        df = data[sheet]
+
+        column = change.get('column')
+        if isinstance(column, list):
+            column = tuple(column)
+        if column not in df.columns:
+            raise ValueError('unknown column {!r} of sheet {!r}'.format(
+                column, sheet))
+        index = change.get('index', slice(None))
+        if isinstance(index, list):
+            index = tuple(index)
+        try:
+            current = df.loc[index, column]
+        except KeyError:
+            raise ValueError('unknown index {!r} of sheet {!r}'.format(
+                index, sheet))
+
+        if 'value' in change:
+            df.loc[index, column] = change['value']
+        else:
+            df.loc[index, column] = current * change['factor']
+    return data
+
+
+def scenario_key(input_file, timesteps, delta):
+    """
+    Returns a short key identifying a scenario
+
+    Args:
+        input_file: input file name
+        timesteps: (offset, length) time step selection
+        delta: list of changes, see apply_delta
+
+    Returns:
+        key: hex digest of the scenario
+    """
+    scenario = json.dumps([os.path.abspath(input_file), list(timesteps),
+                           delta or []], sort_keys=True, default=str)
+    return hashlib.sha1(scenario.encode()).hexdigest()[:12]
+
+
+###############################################################################
+# Model Store
+###############################################################################
+class ModelStore:
+    """Held models in least recently used order
+
+    Models are evicted when they were idle for longer than idle_timeout,
+    when more than max_models are held, or while the resident memory of the
+    server exceeds memory_cap (the newest model is always kept).
+
+    Attributes:
+        memory_cap: (optional) resident memory limit in Mb
+        idle_timeout: (optional) seconds a model is held without being used
+        max_models: largest number of held models
+        entries: OrderedDict of key: {'model', 'summary', 'last_used'}
+    """
+
+    def __init__(self, memory_cap=None, idle_timeout=None, max_models=8):
+        self.memory_cap = memory_cap
+        self.idle_timeout = idle_timeout
+        self.max_models = max_models
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the entry of a held model and marks it used, or None"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry['last_used'] = time.time()
+            self.entries.move_to_end(key)
+        return entry
+
+    def add(self, key, model, summary):
+        """Holds a model and evicts others as needed"""
+        self.entries[key] = {'model': model, 'summary': summary,
+                             'last_used': time.time()}
+        self.entries.move_to_end(key)
+        return self.evict()
+
+    def remove(self, key=None):
+        """Drops one (or, without key, all) held models"""
+        keys = list(self.entries) if key is None else [key]
+        for key in keys:
+            if self.entries.pop(key, None) is None:
+                raise ValueError('no model {!r} held'.format(key))
+        gc.collect()
+        return keys
+
+    def evict(self):
+        """
+        Evicts idle models, then the least recently used ones above the
+        model count and memory limits
+
+        Returns:
+            evicted: list of the evicted keys
+        """
+        evicted = []
+        if self.idle_timeout is not None:
+            now = time.time()
+            for key, entry in list(self.entries.items()):
+                if now - entry['last_used'] > self.idle_timeout:
+                    evicted.append(key)
+                    del self.entries[key]
+        while len(self.entries) > max(self.max_models, 1):
+            evicted.append(self.entries.popitem(last=False)[0])
+        if evicted:
+            gc.collect()
+
+        # freed memory is not always returned to the system, so this may
+        # evict more models than strictly needed
+        while self.memory_cap is not None and len(self.entries) > 1:
+            memory = resident_memory()
+            if memory is None or memory <= self.memory_cap:
+                break
+            evicted.append(self.entries.popitem(last=False)[0])
+            gc.collect()
+        return evicted
+
+
+def resident_memory():
+    """
+    Returns the current resident memory of this process in Mb
+
+    Returns:
+        memory in Mb, or None if it cannot be determined
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024.0 ** 2
+    try:
+        # Linux: resident pages are the second field
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 ** 2
+
+
+###############################################################################
+# Server
+###############################################################################
+class ModelServer:
+    """Solves scenario queries on a worker thread, keeping models warm
+
+    Attributes:
+        store: ModelStore of the built and solved urbs models
+        inputs: dict of input file: (modification time, ModelInput)
+        jobs: queue of the pending queries
+        workdir: directory for the LP and log files of the solves
+    """
+
+    def __init__(self, memory_cap=None, idle_timeout=600, max_models=8,
+                 input_file='mimo.xlsx'):
+        self.store = ModelStore(memory_cap, idle_timeout, max_models)
+        self.inputs = {}
+        self.input_file = input_file
+        self.jobs = queue.Queue()
+        self.workdir = tempfile.mkdtemp(prefix='mimo-server-')
+        self.started = time.time()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def submit(self, function, *args):
+        """
+        Queues a call for the worker thread
+
+        Returns:
+            a concurrent.futures.Future of the call
+        """
+        future = Future()
+        self.jobs.put((future, function, args))
+        return future
+
+    def close(self):
+        """Stops the worker thread and removes the working directory"""
+        self.jobs.put(None)
+        self._worker.join()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _work(self):
+        # worker thread: run queued calls, evict idle models in between
+        while True:
+            try:
+                job = self.jobs.get(timeout=10)
+            except queue.Empty:
+                self.store.evict()
+                continue
+            if job is None:
+                return
+            future, function, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except BaseException as error:
+                future.set_exception(error)
+
+    def input(self, input_file):
+        """
+        Returns the parsed, validated and compiled input data of a file
+
+        The data is parsed again when the file was modified.
+        """
+        modified = os.path.getmtime(input_file)
+        cached = self.inputs.get(input_file)
+        if cached is None or cached[0] != modified:
+            input_data = conn.write_data(conn.read_data(input_file))
+            urbs.validate_input(input_data)
+            self.inputs[input_file] = (modified,
+                                       urbs.compile_input(input_data))
+        return self.inputs[input_file][1]
+
+    def solve(self, request):
+        """
+        Solves a scenario, or returns the summary of its held model
+
+        Args:
+            request: dict with the optional keys 'input' (input file;
+                     default: mimo.xlsx), 'timesteps' ([offset, length];
+                     default: [0, 10]) and 'delta' (see apply_delta)
+
+        Returns:
+            summary: dict with the keys 'key' (scenario key), 'objective',
+                     'costs' (by cost type), 'process_capacity' (total by
+                     'site.process'), 'build_time', 'solve_time', 'solver'
+                     (see comp.SolverMetrics), 'evicted' (keys evicted to
+                     make room) and 'cached' (whether the model was held)
+        """
+        input_file = request.get('input', self.input_file)
+        offset, length = request.get('timesteps', DEFAULT_TIMESTEPS)
+        delta = request.get('delta', [])
+        key = scenario_key(input_file, (offset, length), delta)
+
+        entry = self.store.get(key)
+        if entry is not None:
+            return dict(entry['summary'], cached=True, evicted=[])
+
+        data = apply_delta(self.input(input_file), delta)
+        recorder = comp.PhaseRecorder()
+        with recorder.phase('build'):
+            model = urbs.create_model(data, 1,
+                                      range(offset, offset + length + 1))
+
+        # solve, dropping the LP file afterwards
+        optim = SolverFactory('glpk')
+        filename = os.path.join(self.workdir, key + '.lp')
+        with recorder.phase('solve'):
+            solve_model(model, lambda **kwargs: optim.solve(model, **kwargs),
+                        filename, os.path.join(self.workdir, key + '.log'))
+        for name in (filename, filename + '.labels'):
+            if os.path.exists(name):
+                os.remove(name)
+
+        costs, cpro, _, _ = urbs.get_constants(model)
+        summary = {
+            'key': key,
+            'objective': model.obj(),
+            'costs': {str(cost_type): float(value)
+                      for cost_type, value in costs.items()},
+            'process_capacity': {'.'.join(map(str, index)): float(value)
+                                 for index, value in cpro['Total'].items()},
+            'build_time': recorder.time('build'),
+            'solve_time': recorder.time('solve'),
+            'solver': model.solver_metrics.to_dict()}
+        evicted = self.store.add(key, model, summary)
+        return dict(summary, cached=False, evicted=evicted)
+
+    def timeseries(self, request):
+        """
+        Returns the timeseries of a commodity of a held model
+
+        Args:
+            request: dict with the keys 'key' (scenario key), 'commodity'
+                     and 'sites' (a site name or list of site names)
+
+        Returns:
+            dict of 'created', 'consumed', 'stored', 'imported', 'exported'
+            and 'dsm': the DataFrames of urbs.get_timeseries in the pandas
+            'split' JSON orientation
+        """
+        entry = self.store.get(request.get('key'))
+        if entry is None:
+            raise ValueError('no model {!r} held'.format(request.get('key')))
+        frames = urbs.get_timeseries(entry['model'], request['commodity'],
+                                     request['sites'])
+        names = ('created', 'consumed', 'stored', 'imported', 'exported',
+                 'dsm')
+        return {name: json.loads(pd.DataFrame(df).to_json(orient='split'))
+                for name, df in zip(names, frames)}
+
+    def evict(self, request):
+        """Drops a held model ({'key': ...}) or all models ({})"""
+        return {'evicted': self.store.remove(request.get('key'))}
+
+    def status(self):
+        """Returns the held models, queue length and memory"""
+        return {'models': {key: entry['summary']['objective']
+                           for key, entry in self.store.entries.items()},
+                'queued': self.jobs.qsize(),
+                'inputs': list(self.inputs),
+                'memory': resident_memory(),
+                'memory_cap': self.store.memory_cap,
+                'uptime': time.time() - self.started}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # JSON requests and responses; all model work runs on the worker thread
+    routes = {'/status': 'status', '/solve': 'solve',
+              '/timeseries': 'timeseries', '/evict': 'evict'}
+
+    def do_GET(self):
+        if self.path != '/status':
+            return self._respond(404, {'error': 'unknown path'})
+        self._call('status')
+
+    def do_POST(self):
+        if self.path not in self.routes:
+            return self._respond(404, {'error': 'unknown path'})
+        try:
+            size = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(size) or b'{}')
+        except ValueError as error:
+            return self._respond(400, {'error': str(error)})
+        if self.path == '/status':
+            return self._call('status')
+        self._call(self.routes[self.path], request)
+
+    def _call(self, name, *args):
+        server = self.server.models
+        future = server.submit(getattr(server, name), *args)
+        try:
+            self._respond(200, future.result())
+        except (KeyError, ValueError, TypeError) as error:
+            self._respond(400, {'error': str(error)})
+        except Exception as error:
+            self._respond(500, {'error': '{}: {}'.format(
+                type(error).__name__, error)})
+
+    def _respond(self, status, body):
+        content = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(port=8765, socket_path=None, **kwargs):
+    """
+    Runs the model server until interrupted
+
+    Args:
+        port: localhost port, if no socket_path is given
+        socket_path: (optional) Unix socket to listen on instead
+        kwargs: arguments of ModelServer, e.g. memory_cap (Mb)
+
+    Returns:
+        Nothing
+    """
+    models = ModelServer(**kwargs)
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        httpd = _UnixHTTPServer(socket_path, _Handler)
+        address = socket_path
+    else:
+        httpd = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        address = 'http://127.0.0.1:{}'.format(port)
+    httpd.models = models
+
+    print('mimo model server listening on', address)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        models.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', dest='socket_path',
+                        help='listen on this Unix socket instead of a port')
+    parser.add_argument('--input', dest='input_file', default='mimo.xlsx',
+                        help='default input file of queries')
+    parser.add_argument('--memory-cap', type=float,
+                        help='resident memory limit in Mb')
+    parser.add_argument('--idle-timeout', type=float, default=600,
+                        help='seconds an unused model is held')
+    parser.add_argument('--max-models', type=int, default=8)
+    args = parser.parse_args()
+    serve(**vars(args))
@@ -0,0 +1,8 @@
+"""Model input
+
+Compiled input data shared by the urbs and oemof model builders. Neither
+framework is imported here.
+
+"""
+
+from .ir import *
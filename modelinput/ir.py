@@ -0,0 +1,287 @@
+import copy
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# investment cost columns annualised with the 'annuity-factor' of their row:
+# sheet: [(cost column, annualised column), ...]
+ANNUALISED_COSTS = {
+    'process': [('inv-cost', 'inv-annuity')],
+    'transmission': [('inv-cost', 'inv-annuity')],
+    'storage': [('inv-cost-p', 'inv-annuity-p'),
+                ('inv-cost-c', 'inv-annuity-c')],
+    }
+
+
+def annuity_factor(n, i):
+    """Annuity factor formula.
+
+    Evaluates the annuity factor formula for depreciation duration
+    and interest rate. Works also well for equally sized numpy arrays
+    of values for n and i.
+
+    Args:
+        n: depreciation period (years)
+        i: interest rate (e.g. 0.06 means 6 %)
+
+    Returns:
+        Value of the expression :math:`\\frac{(1+i)^n i}{(1+i)^n - 1}`
+
+    Example:
+        >>> round(annuity_factor(20, 0.07), 5)
+        0.09439
+
+    """
+    if i == 0:
+        return 1 / n
+    else:
+        return (1+i)**n * i / ((1+i)**n - 1)
+
+
+class ParameterTable:
+    """Rows of an input sheet as typed column arrays
+
+    Numeric columns keep their array type, all others are object arrays.
+    The arrays are copies, they do not keep the DataFrame alive. A row is
+    found through its slot, so looking up a value is one dict lookup and
+    one array access.
+
+    Attributes:
+        names: index level names, e.g. ['Site', 'Process']
+        keys: list of row keys (tuples for multi-level indices)
+        slots: dict of row key: slot
+        columns: dict of column name: array
+    """
+
+    def __init__(self, names, keys, columns):
+        self.names = list(names)
+        self.keys = list(keys)
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df):
+        """Creates a table from an input DataFrame"""
+        columns = {}
+        for column in df.columns:
+            values = df[column].values
+            if values.dtype.kind in 'biuf':
+                columns[column] = values.copy()
+            else:
+                columns[column] = values.astype(object)
+        return cls(df.index.names, df.index.tolist(), columns)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def value(self, key, column):
+        """Returns the value of a row and column"""
+        return self.columns[column][self.slots[key]]
+
+    def get(self, key, column, default=None):
+        """Returns the value of a row and column, or default if missing"""
+        slot = self.slots.get(key)
+        if slot is None or column not in self.columns:
+            return default
+        return self.columns[column][slot]
+
+    def row(self, key):
+        """Returns a row as dict of column: value"""
+        slot = self.slots[key]
+        return {column: values[slot]
+                for column, values in self.columns.items()}
+
+    def level(self, name):
+        """Returns the values of an index level, one per row"""
+        position = self.names.index(name)
+        if len(self.names) == 1:
+            return list(self.keys)
+        return [key[position] for key in self.keys]
+
+    def unique(self, name):
+        """Returns the distinct values of an index level, in order"""
+        return list(dict.fromkeys(self.level(name)))
+
+    def to_frame(self):
+        """Returns the table as DataFrame"""
+        if len(self.names) > 1:
+            index = pd.MultiIndex.from_tuples(self.keys, names=self.names)
+        else:
+            index = pd.Index(self.keys, name=self.names[0])
+        return pd.DataFrame(self.columns, index=index,
+                            columns=list(self.columns))
+
+
+class TimeSeries:
+    """Timeseries of an input sheet as one float array
+
+    Attributes:
+        timesteps: list of the time steps (index 't')
+        keys: list of (site, commodity) columns
+        slots: dict of column key: column slot
+        steps: dict of time step: row slot
+        values: float array (time steps x columns)
+    """
+
+    def __init__(self, timesteps, keys, values):
+        self.timesteps = list(timesteps)
+        self.keys = list(keys)
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
+        self.steps = {t: slot for slot, t in enumerate(self.timesteps)}
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df):
+        """Creates timeseries from an input DataFrame"""
+        return cls(df.index.tolist(), df.columns.tolist(),
+                   df.values.astype(float))
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def value(self, key, t):
+        """Returns the value of a column at time step t"""
+        return self.values[self.steps[t], self.slots[key]]
+
+    def column(self, key):
+        """Returns the values of a column, one per time step"""
+        return self.values[:, self.slots[key]]
+
+    def to_frame(self):
+        """Returns the timeseries as DataFrame"""
+        columns = (pd.MultiIndex.from_tuples(self.keys) if self.keys
+                   else pd.Index([]))
+        return pd.DataFrame(self.values,
+                            index=pd.Index(self.timesteps, name='t'),
+                            columns=columns)
+
+
+class ModelInput(Mapping):
+    """Compiled input data of the urbs and oemof model builders
+
+    Produced once per input by compile_input, then consumed by both
+    urbs.create_model and oemofm.create_model. It is a read-only mapping of
+    the input DataFrames, so it can be passed wherever the input dict is
+    expected. The derived annuity factors and annualised investment costs
+    are computed here, not by the builders.
+
+    Every sheet is also held as ParameterTable (TimeSeries for sheets
+    indexed by 't'). A compact copy (see compact) keeps these arrays only
+    and rebuilds the DataFrames when indexed.
+
+    Attributes:
+        data: dict of the input DataFrames, None for a compact copy;
+              process, transmission and storage carry the derived columns
+              'annuity-factor' and 'inv-annuity' ('inv-annuity-p',
+              'inv-annuity-c')
+        tables: dict of sheet: ParameterTable or TimeSeries
+        sites: list of site names
+        site_slots: dict of site name: slot
+        commodity, process, transmission, storage: ParameterTables
+        process_sites, storage_sites: int arrays of the site slot of each
+                                      process and storage row
+        transmission_sites: int array (rows x 2) of the site slots of each
+                            transmission row (site in, site out)
+        r_in, r_out: dicts of (process, commodity): input/output ratio
+        demand, supim: TimeSeries
+        global_prop: dict of property: value
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.sites = data['site'].index.tolist()
+        self.site_slots = {site: slot for slot, site in enumerate(self.sites)}
+
+        self.tables = {}
+        for sheet, df in data.items():
+            if df.index.names == ['t']:
+                self.tables[sheet] = TimeSeries.from_frame(df)
+            else:
+                self.tables[sheet] = ParameterTable.from_frame(df)
+        self.commodity = self.tables['commodity']
+        self.process = self.tables['process']
+        self.transmission = self.tables['transmission']
+        self.storage = self.tables['storage']
+
+        self.process_sites = self._site_slots(self.process.level('Site'))
+        self.storage_sites = self._site_slots(self.storage.level('Site'))
+        self.transmission_sites = np.column_stack([
+            self._site_slots(self.transmission.level('Site In')),
+            self._site_slots(self.transmission.level('Site Out'))])
+
+        ratio = data['process_commodity']['ratio']
+        self.r_in = ratio.xs('In', level='Direction').to_dict()
+        self.r_out = ratio.xs('Out', level='Direction').to_dict()
+
+        self.demand = self.tables['demand']
+        self.supim = self.tables['supim']
+        self.global_prop = data['global_prop']['value'].to_dict()
+
+    def __getitem__(self, key):
+        if self.data is None:
+            return self.tables[key].to_frame()
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.tables
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def compact(self):
+        """Returns a copy holding the parameter arrays only
+
+        The copy shares the arrays, but not the DataFrames: indexing it
+        rebuilds them from the arrays.
+        """
+        compact = copy.copy(self)
+        compact.data = None
+        return compact
+
+    def _site_slots(self, sites):
+        # slots of site names, -1 for sites missing in the site sheet
+        return np.array([self.site_slots.get(site, -1) for site in sites],
+                        dtype=int)
+
+
+def compile_input(data):
+    """Compiles input data into a ModelInput
+
+    The input DataFrames are left untouched: process, transmission and
+    storage are copied to add the derived cost columns.
+
+    Args:
+        data: input data, a dict of DataFrames as returned by read_excel or
+            conn.write_data, or a ModelInput (returned as is)
+
+    Returns:
+        a ModelInput
+
+    Example:
+        >>> model_input = compile_input(read_excel('mimo-example.xlsx'))
+        >>> prob = create_model(model_input, 1, range(1, 25))
+    """
+    if isinstance(data, ModelInput):
+        return data
+
+    data = dict(data)
+    for sheet, costs in ANNUALISED_COSTS.items():
+        df = data[sheet].copy()
+        data[sheet] = df
+        if 'depreciation' not in df or 'wacc' not in df:
+            continue
+        df['annuity-factor'] = [annuity_factor(n, i) for n, i in
+                                zip(df['depreciation'], df['wacc'])]
+        for cost, annuity in costs:
+            df[annuity] = df[cost] * df['annuity-factor']
+    return ModelInput(data)
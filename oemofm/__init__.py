@@ -3,3 +3,4 @@
 """
 
 from .model import *
+from .results import *
@@ -1,11 +1,8 @@
-from oemof.tools import economics
-from oemof.network import Node
 from itertools import combinations
-import matplotlib.pyplot as plt
 import oemof.solph as solph
-import networkx as nx
 import pandas as pd
 import math
+from modelinput import compile_input
 
 
 class Site:
@@ -208,13 +205,16 @@ def create_model(data, timesteps=None):
     Creates an oemof model for given input, time steps
 
     Args:
-        data: input data
+        data: input data, or a ModelInput compiled from it (see
+              urbs.compile_input)
         timesteps: simulation timesteps
 
     Returns:
         es: an oemof energy system
         model: an oemof model instance
     """
+    data = compile_input(data)
+
     # Parameters
     weight = float(8760)/(len(timesteps))
     timesteps = timesteps[-1]
@@ -224,14 +224,13 @@ def create_model(data, timesteps=None):
                                     freq='H')
 
     # Create Energy System
+    # nodes are added explicitly below instead of through the global
+    # Node.registry, so that several models can be built concurrently
     es = solph.EnergySystem(timeindex=date_time_index)
-    Node.registry = es
 
-    # Fix Data
-    data['demand'] = data['demand'].shift(-1)
-    data['demand'] = data['demand'][:-1]
-    data['supim'] = data['supim'].shift(-1)
-    data['supim'] = data['supim'][:-1]
+    # Fix Data (the timeseries are taken from the second timestep on)
+    demand_ts = data.demand
+    supim_ts = data.supim
 
     # Create Sites
     """Syntax
@@ -249,82 +248,71 @@ def create_model(data, timesteps=None):
                                initial-cap, eff-in, eff-out, discharge)}
         )
     """
-    sites = dict.fromkeys(data['site'].index)
+    tables = parameter_tables(data)
+    process = tables['process']
+    storage = tables['storage']
+    sites = dict.fromkeys(data.sites)
 
     for site in sites:
-        # Create Lists and Dicts for Sites
-        df1 = data['commodity'].index.get_level_values('Site') == site
-        df2 = data['commodity'].index.get_level_values('Type') == 'Stock'
-        df3 = data['commodity'].index.get_level_values('Type') == 'Demand'
-        df4 = data['commodity'].index.get_level_values('Type') == 'SupIm'
-        df5 = data['storage'].index.get_level_values('Storage').unique()
+        # commodities of this site by type, in index order
+        commodities = tables['commodity'].get(site, {})
+        stock = commodities.get('Stock', [])
+        demand = commodities.get('Demand', [])
+        supim = commodities.get('SupIm', [])
 
         # Bus List
-        bus_df1 = data['commodity'][df1 & df2].index.remove_unused_levels() \
-            .get_level_values('Commodity')
-        bus_df2 = data['commodity'][df1 & df3].index.remove_unused_levels() \
-            .get_level_values('Commodity')
-        bus_list = bus_df1.append(bus_df2).tolist()
+        bus_list = stock + demand
 
         # Source Dict
         source_dict = {}
-        for item in bus_df1:
-            source_dict[item] = data['commodity']['price'][site][item]['Stock']
+        for item in stock:
+            source_dict[item] = tables['price'][(site, item, 'Stock')]
 
         # RSource List & Dict
-        r_df = data['commodity'][df1 & df4].index.remove_unused_levels() \
-            .get_level_values('Commodity')
-        rsource_list = r_df.tolist()
         rsource_dict = {}
-        for item in rsource_list:
+        for item in supim:
+            pro = process[(site, tables['fuel_process'][(site, item)])]
             rsource_dict[item] = (
-                data['supim'][site][item],
-                economics.annuity(
-                    data['process']['inv-cost'][site].filter(like=item).values[0],
-                    data['process']['depreciation'][site].filter(like=item).values[0],
-                    data['process']['wacc'][site].filter(like=item).values[0]),
-                data['process']['cap-up'][site].filter(like=item).values[0],
-                data['process']['inst-cap'][site].filter(like=item).values[0])
+                supim_ts.column((site, item))[1:],
+                pro['inv-annuity'],
+                pro['cap-up'],
+                pro['inst-cap'])
 
         # Transformer Dict
         transformer_dict = {}
-        for item in bus_df1:
+        for item in stock:
+            name = tables['fuel_process'][(site, item)]
+            pro = process[(site, name)]
             transformer_dict[item] = (
-                economics.annuity(data['process']['inv-cost'][site].filter(like=item).values[0],
-                                  data['process']['depreciation'][site].filter(like=item).values[0],
-                                  data['process']['wacc'][site].filter(like=item).values[0]),
-                data['process']['cap-up'][site].filter(like=item).values[0],
-                data['process']['inst-cap'][site].filter(like=item).values[0],
-                data['process']['var-cost'][site].filter(like=item).values[0],
-                data['process_commodity']['ratio'].filter(like=item).filter(like='CO2').values[0],
-                data['process_commodity']['ratio'].filter(like=item).filter(like='In').values[0],
-                data['process_commodity']['ratio'].filter(like=item).filter(like='Elec').values[0])
+                pro['inv-annuity'],
+                pro['cap-up'],
+                pro['inst-cap'],
+                pro['var-cost'],
+                tables['r_out'].get((name, 'CO2'), 0),
+                tables['r_in'][(name, item)],
+                tables['r_out'][(name, 'Elec')])
 
         # Sink Dict
         sink_dict = {}
-        for item in bus_df2:
-            sink_dict[item] = data['demand'][site][item]
+        for item in demand:
+            sink_dict[item] = demand_ts.column((site, item))[1:]
 
         # Storage Tuple
         storage_dict = {}
-        for item in df5:
+        for item, sto in storage.get(site, []):
             storage_dict[item] = (
-                economics.annuity(data['storage']['inv-cost-p'][site].filter(like=item).values[0],
-                                  data['storage']['depreciation'][site].filter(like=item).values[0],
-                                  data['storage']['wacc'][site].filter(like=item).values[0]),
-                data['storage']['cap-up-p'][site].filter(like=item).values[0],
-                data['storage']['inst-cap-p'][site].filter(like=item).values[0],
-                data['storage']['var-cost-p'][site].filter(like=item).values[0],
-                economics.annuity(data['storage']['inv-cost-c'][site].filter(like=item).values[0],
-                                  data['storage']['depreciation'][site].filter(like=item).values[0],
-                                  data['storage']['wacc'][site].filter(like=item).values[0]),
-                data['storage']['cap-up-c'][site].filter(like=item).values[0],
-                data['storage']['inst-cap-c'][site].filter(like=item).values[0],
-                data['storage']['var-cost-c'][site].filter(like=item).values[0],
-                data['storage']['init'][site].filter(like=item).values[0],
-                data['storage']['eff-in'][site].filter(like=item).values[0],
-                data['storage']['eff-out'][site].filter(like=item).values[0],
-                data['storage']['discharge'][site].filter(like=item).values[0])
+                sto['inv-annuity-p'],
+                sto['cap-up-p'],
+                sto['inst-cap-p'],
+                sto['var-cost-p'],
+                sto['inv-annuity-c'],
+                sto['cap-up-c'],
+                sto['inst-cap-c'],
+                sto['var-cost-c'],
+                sto['init'],
+                sto['eff-in'],
+                sto['eff-out'],
+                sto['discharge'])
 
         # Site Creation
         sites[site] = Site(site, data, weight,
@@ -336,6 +324,8 @@ def create_model(data, timesteps=None):
                            storage=storage_dict)
 
         sites[site] = sites[site]._create_components()
+        for components in sites[site][1:]:
+            es.add(*components.values())
 
     # Create Transmission Lines
     """Syntax
@@ -344,21 +334,20 @@ def create_model(data, timesteps=None):
          specs=[(annuity, max-cap, existing-cap, var-cost, eff)]
         )
     """
-    lines_list = list(data['transmission'].reset_index(level=[2, 3]).index.values)
-    lines_list = (set(tuple(sorted(line)) for line in lines_list))
+    lines_list = set(tuple(sorted(line)) for line in tables['transmission'])
     lines = dict.fromkeys(lines_list)
 
     for line in lines:
+        tra = tables['transmission'][line]
         lines[line] = Line(sites[line[0]], sites[line[1]], weight, specs=[
-            economics.annuity(data['transmission']['inv-cost'][line][0],
-                              data['transmission']['depreciation'][line][0],
-                              data['transmission']['wacc'][line][0]),
-            data['transmission']['cap-up'][line][0],
-            data['transmission']['inst-cap'][line][0],
-            data['transmission']['var-cost'][line][0],
-            data['transmission']['eff'][line][0]])
+            tra['inv-annuity'],
+            tra['cap-up'],
+            tra['inst-cap'],
+            tra['var-cost'],
+            tra['eff']])
 
         lines[line] = lines[line]._create_lines()
+        es.add(*lines[line].values())
 
     # create model
     model = solph.Model(es)
@@ -367,26 +356,27 @@ def create_model(data, timesteps=None):
     # add storage investment symmetry constraint
     for site in sites:
         el = es.groups['b_Elec_'+sites[site][0]]
-        sto = es.groups['storage_Pump_'+sites[site][0]]
+        for item, sto in storage.get(site, []):
+            st = es.groups['storage_'+item+'_'+sites[site][0]]
 
-        solph.constraints.equate_variables(
-            model,
-            model.InvestmentFlow.invest[el, sto],
-            model.InvestmentFlow.invest[sto, el])
+            solph.constraints.equate_variables(
+                model,
+                model.InvestmentFlow.invest[el, st],
+                model.InvestmentFlow.invest[st, el])
 
     # add storage power/capacity ratio constraint
     for site in sites:
-        if math.isnan(data['storage']['ep-ratio'][site].filter(like='Pump').values[0]):
-            continue
-        else:
-            el = es.groups['b_Elec_'+sites[site][0]]
-            sto = es.groups['storage_Pump_'+sites[site][0]]
+        el = es.groups['b_Elec_'+sites[site][0]]
+        for item, sto in storage.get(site, []):
+            if math.isnan(sto.get('ep-ratio', float('nan'))):
+                continue
+            st = es.groups['storage_'+item+'_'+sites[site][0]]
 
             solph.constraints.equate_variables(
                 model,
-                model.InvestmentFlow.invest[el, sto],
-                model.GenericInvestmentStorageBlock.invest[sto],
-                factor1=data['storage']['ep-ratio'][site].filter(like='Pump').values[0])
+                model.InvestmentFlow.invest[el, st],
+                model.GenericInvestmentStorageBlock.invest[st],
+                factor1=sto['ep-ratio'])
 
     # add transmission lines symmetry constraint
     lines_sym = []
@@ -408,13 +398,73 @@ def create_model(data, timesteps=None):
             model.InvestmentFlow.invest[b1, l1])
 
     # add emission constraint
-    if not math.isinf(data['global_prop']['value']['CO2 limit']):
-        limit = data['global_prop']['value']['CO2 limit']
+    if not math.isinf(data.global_prop['CO2 limit']):
+        limit = data.global_prop['CO2 limit']
         solph.constraints.emission_limit(model, limit=limit)
 
     return es, model
 
 
+def parameter_tables(data):
+    """
+    Builds exact-key parameter tables from the compiled input once
+
+    Args:
+        data: a ModelInput, see urbs.compile_input
+
+    Returns:
+        tables: a dict of dicts with the keys
+            'commodity': {site: {type: [commodity, ...]}}, in index order
+            'price': {(site, commodity, type): price}
+            'process': {(site, process): {column: value}}
+            'fuel_process': {(site, commodity): process consuming it}
+            'r_in', 'r_out': {(process, commodity): ratio}
+            'storage': {site: [(storage, {column: value}), ...]}
+            'transmission': {(site_in, site_out): {column: value}}
+    """
+    tables = {}
+
+    # commodities by site and type
+    tables['commodity'] = {}
+    for site, com, com_type in data.commodity:
+        tables['commodity'].setdefault(site, {}) \
+                           .setdefault(com_type, []).append(com)
+    tables['price'] = dict(zip(data.commodity.keys,
+                               data.commodity.columns['price']))
+
+    # processes and their input/output ratios
+    tables['process'] = {key: data.process.row(key) for key in data.process}
+    tables['r_in'] = data.r_in
+    tables['r_out'] = data.r_out
+
+    # process of a site consuming a commodity (first one, if several)
+    inputs = {}
+    for pro, com in tables['r_in']:
+        inputs.setdefault(pro, []).append(com)
+    tables['fuel_process'] = {}
+    for site, pro in data.process:
+        for com in inputs.get(pro, []):
+            tables['fuel_process'].setdefault((site, com), pro)
+
+    # storages by site (one entry per storage name, first commodity)
+    tables['storage'] = {}
+    seen = set()
+    for site, sto, com in data.storage:
+        if (site, sto) not in seen:
+            seen.add((site, sto))
+            tables['storage'].setdefault(site, []).append(
+                (sto, data.storage.row((site, sto, com))))
+
+    # transmission by (site in, site out), first transmission/commodity
+    tables['transmission'] = {}
+    for sin, sout, tra, com in data.transmission:
+        if (sin, sout) not in tables['transmission']:
+            tables['transmission'][(sin, sout)] = data.transmission.row(
+                (sin, sout, tra, com))
+
+    return tables
+
+
 def draw_graph(grph, edge_labels=True, node_color='#AFAFAF',
                edge_color='#CFCFCF', plot=True, node_size=2000,
                with_labels=True, arrows=True, layout='neato'):
@@ -449,6 +499,9 @@ def draw_graph(grph, edge_labels=True, node_color='#AFAFAF',
     layout : string
         networkx graph layout, one of: neato, dot, twopi, circo, fdp, sfdp.
     """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     if type(node_color) is dict:
         node_color = [node_color.get(g, '#AFAFAF') for g in grph.nodes()]
 
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+
+class ModelResults:
+    """Flow, investment and storage content values of a solved oemof model
+
+    All values are read from the model variables in a single pass by
+    extract_results. Time dependent values are held in dense arrays with one
+    row per timestep, columns are found by node labels in constant time.
+
+    Attributes:
+        timesteps: A list of timesteps (model.TIMESTEPS)
+        flows: A list of (source label, target label) tuples
+        flow_values: An array (timesteps x flows) of flow values
+        invest: A dict of (source label, target label): invested capacity
+        storages: A list of storage labels
+        content_values: An array (timesteps x storages) of storage contents
+        storage_invest: A dict of storage label: invested capacity
+    """
+
+    def __init__(self, timesteps, flows, flow_values, invest,
+                 storages, content_values, storage_invest):
+        self.timesteps = list(timesteps)
+        self.flows = list(flows)
+        self.flow_values = flow_values
+        self.invest = invest
+        self.storages = list(storages)
+        self.content_values = content_values
+        self.storage_invest = storage_invest
+
+        # lookup tables: flow -> column, node label -> its flow columns
+        self._flow_col = {flow: k for k, flow in enumerate(self.flows)}
+        self._storage_col = {label: k for k, label in enumerate(storages)}
+        self._node_flows = {}
+        for k, (source, target) in enumerate(self.flows):
+            self._node_flows.setdefault(source, []).append(k)
+            self._node_flows.setdefault(target, []).append(k)
+
+    def flow(self, source, target):
+        """Returns the flow values between two nodes as array"""
+        return self.flow_values[:, self._flow_col[(source, target)]]
+
+    def content(self, storage):
+        """Returns the content values of a storage as array"""
+        return self.content_values[:, self._storage_col[storage]]
+
+    def node(self, label):
+        """
+        Returns all results of a node, laid out as outputlib.views.node
+
+        Args:
+            label: node label
+
+        Returns:
+            a dict with the keys 'sequences' (DataFrame, one column per flow
+            and storage content) and 'scalars' (Series of invested
+            capacities), with the column keys ((source, target), 'flow'),
+            ((storage, 'None'), 'capacity') and ((source, target), 'invest')
+        """
+        sequences = {}
+        scalars = {}
+        for k in self._node_flows.get(label, []):
+            flow = self.flows[k]
+            sequences[(flow, 'flow')] = self.flow_values[:, k]
+            if flow in self.invest:
+                scalars[(flow, 'invest')] = self.invest[flow]
+
+        if label in self._storage_col:
+            sequences[((label, 'None'), 'capacity')] = self.content(label)
+        if label in self.storage_invest:
+            scalars[((label, 'None'), 'invest')] = self.storage_invest[label]
+
+        index = pd.Index(self.timesteps, name='timestep')
+        return {'sequences': pd.DataFrame(sequences, index=index),
+                'scalars': pd.Series(scalars, dtype=float)}
+
+
+def extract_results(model):
+    """
+    Reads the results of a solved oemof model into arrays in one pass
+
+    Args:
+        model: a solved oemof model instance
+
+    Returns:
+        results: a ModelResults object
+    """
+    timesteps = list(model.TIMESTEPS)
+    row = {t: k for k, t in enumerate(timesteps)}
+
+    # flows
+    flows = list(model.flows)
+    flow_col = {flow: k for k, flow in enumerate(flows)}
+    flow_values = _var_array(
+        model.flow, (len(timesteps), len(flows)),
+        lambda key: (row[key[2]], flow_col[key[:2]]))
+
+    # invested flow capacities
+    invest = {}
+    if hasattr(model, 'InvestmentFlow'):
+        for (source, target), value in \
+                model.InvestmentFlow.invest.get_values().items():
+            invest[(source.label, target.label)] = _value(value)
+
+    # storage contents and invested storage capacities
+    storages = []
+    contents = []
+    storage_invest = {}
+    for name in ('GenericStorageBlock', 'GenericInvestmentStorageBlock'):
+        block = getattr(model, name, None)
+        if block is None:
+            continue
+        var = getattr(block, 'capacity', None)
+        if var is None:
+            var = block.storage_content
+        col = {}
+        for n in sorted(set(key[0] for key in var), key=lambda n: n.label):
+            col[n] = len(col)
+            storages.append(n.label)
+        contents.append(_var_array(var, (len(timesteps), len(col)),
+                                   lambda key: (row[key[1]], col[key[0]])))
+        if hasattr(block, 'invest'):
+            for n, value in block.invest.get_values().items():
+                storage_invest[n.label] = _value(value)
+
+    if contents:
+        content_values = np.hstack(contents)
+    else:
+        content_values = np.zeros((len(timesteps), 0))
+
+    return ModelResults(timesteps,
+                        [(source.label, target.label)
+                         for source, target in flows],
+                        flow_values, invest,
+                        storages, content_values, storage_invest)
+
+
+def _var_array(var, shape, position):
+    # dense array of all values of an indexed pyomo variable; missing
+    # entries and unsolved variables are NaN
+    array = np.full(shape, np.nan)
+    values = var.get_values()
+    if values:
+        rows, cols = zip(*[position(key) for key in values])
+        array[list(rows), list(cols)] = [_value(v) for v in values.values()]
+    return array
+
+
+def _value(value):
+    # pyomo reports unsolved variables as None
+    return np.nan if value is None else value
+
+
+def save_results(results, filename):
+    """
+    Saves ModelResults column by column into a NumPy .npz file
+
+    Args:
+        results: a ModelResults object
+        filename: file name, '.npz' is appended if missing
+
+    Returns:
+        Nothing
+    """
+    np.savez(filename,
+             timesteps=np.array(results.timesteps),
+             flows=_label_array(results.flows, 2),
+             flow_values=results.flow_values,
+             invest=_label_array(list(results.invest), 2),
+             invest_values=np.array(list(results.invest.values()),
+                                    dtype=float),
+             storages=_label_array(results.storages, 1),
+             content_values=results.content_values,
+             storage_invest=_label_array(list(results.storage_invest), 1),
+             storage_invest_values=np.array(
+                 list(results.storage_invest.values()), dtype=float))
+
+
+def load_results(filename):
+    """
+    Loads ModelResults saved by save_results
+
+    Args:
+        filename: name of the .npz file
+
+    Returns:
+        results: a ModelResults object
+    """
+    with np.load(filename) as f:
+        return ModelResults(
+            f['timesteps'].tolist(),
+            [tuple(flow) for flow in f['flows'].tolist()],
+            f['flow_values'],
+            dict(zip([tuple(flow) for flow in f['invest'].tolist()],
+                     f['invest_values'].tolist())),
+            f['storages'].tolist(),
+            f['content_values'],
+            dict(zip(f['storage_invest'].tolist(),
+                     f['storage_invest_values'].tolist())))
+
+
+def _label_array(labels, width):
+    # labels as string array, also with the right shape if empty
+    if width == 1:
+        return np.array(labels, dtype=str)
+    return np.array(labels, dtype=str).reshape(-1, width)
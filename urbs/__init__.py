@@ -13,9 +13,15 @@ commodities.
 from .data import COLORS
 from .model import create_model
 from .input import read_excel, get_input
-from .validation import validate_input
+from .validation import ValidationError, check_input, validate_input
+from modelinput import (ModelInput, ParameterTable, TimeSeries,
+                        compile_input)
+from .progress import ProgressReporter, ProgressModel
+# matplotlib, pytables and xlsxwriter are only imported by the functions
+# drawing, storing and streaming results
 from .output import get_constants, get_timeseries
-from .plot import plot, result_figures, to_color
+from .plot import plot, plot_data, draw_plot, result_figures, to_color
 from .pyomoio import get_entity, get_entities, list_entities
-from .report import report
+from .report import report, report_timeseries, compare_reports
+from .resultcube import ResultCube, create_result_cube
 from .saveload import load, save
@@ -2,6 +2,8 @@ import pandas as pd
 from xlrd import XLRDError
 import pyomo.core as pyomo
 from .modelhelper import *
+from modelinput import compile_input
+from .progress import ProgressModel
 
 
 def read_excel(filename):
@@ -86,74 +88,40 @@ def read_excel(filename):
 
 
 # preparing the pyomo model
-def pyomo_model_prep(data, timesteps):
-    m = pyomo.ConcreteModel()
+def pyomo_model_prep(data, timesteps, progress=None):
+    data = compile_input(data)
+    if progress is None:
+        m = pyomo.ConcreteModel()
+    else:
+        # reports the construction of each component
+        m = ProgressModel(progress, name='urbs')
 
     # Preparations
     # ============
-    # Data import. Syntax to access a value within equation definitions looks
-    # like this:
+    # Parameter import. The input is held once, as compact parameter store
+    # of arrays with a slot index per table (see ModelInput.compact). Syntax
+    # to access a value within equation definitions looks like this:
     #
-    #     m.storage.loc[site, storage, commodity][attribute]
+    #     m.params.storage.value((site, storage, commodity), attribute)
     #
-    m.global_prop = data['global_prop']
-    m.site = data['site']
-    m.commodity = data['commodity']
-    m.process = data['process']
-    m.process_commodity = data['process_commodity']
-    m.transmission = data['transmission']
-    m.storage = data['storage']
-    m.demand = data['demand']
-    m.supim = data['supim']
+    # The annuity factors of process, transmission and storage are derived
+    # from WACC and depreciation duration by compile_input.
+    m.params = data.compact()
     m.timesteps = timesteps
 
-    # Converting Data frames to dict
-    m.commodity_dict = m.commodity.to_dict()
-    m.demand_dict = m.demand.to_dict()
-    m.supim_dict = m.supim.to_dict()
-
-    # process input/output ratios
-    m.r_in = m.process_commodity.xs('In', level='Direction')['ratio']
-    m.r_out = m.process_commodity.xs('Out', level='Direction')['ratio']
-    m.r_in_dict = m.r_in.to_dict()
-    m.r_out_dict = m.r_out.to_dict()
-
     # storages with fixed initial state
-    m.stor_init_bound = m.storage['init']
-    m.stor_init_bound = m.stor_init_bound[m.stor_init_bound >= 0]
+    storage = m.params.storage
+    m.stor_init_bound = [key for key, init
+                         in zip(storage.keys, storage.columns['init'])
+                         if init >= 0]
 
     # storages with fixed energy-to-power ratio
-    try:
-        m.sto_ep_ratio = m.storage['ep-ratio']
-        m.sto_ep_ratio = m.sto_ep_ratio[m.sto_ep_ratio >= 0]
-    except:
-        m.sto_ep_ratio = pd.DataFrame() 
-    
-    # derive annuity factor from WACC and depreciation duration
-    m.process['annuity-factor'] = (m.process.apply(lambda x:
-                                   annuity_factor(x['depreciation'],
-                                                  x['wacc']),
-                                   axis=1))
-    try:
-        m.transmission['annuity-factor'] = (m.transmission.apply(lambda x:
-                                            annuity_factor(x['depreciation'],
-                                                           x['wacc']),
-                                            axis=1))
-    except ValueError:
-        pass
-    try:
-        m.storage['annuity-factor'] = (m.storage.apply(lambda x:
-                                       annuity_factor(x['depreciation'],
-                                                      x['wacc']),
-                                       axis=1))
-    except ValueError:
-        pass
-
-    # Converting Data frames to dictionaries
-    #
-    m.process_dict = m.process.to_dict()  # Changed
-    m.transmission_dict = m.transmission.to_dict()  # Changed
-    m.storage_dict = m.storage.to_dict()  # Changed
+    if 'ep-ratio' in storage.columns:
+        m.sto_ep_ratio = [key for key, ep_ratio
+                          in zip(storage.keys, storage.columns['ep-ratio'])
+                          if ep_ratio >= 0]
+    else:
+        m.sto_ep_ratio = []
     return m
 
 
@@ -202,7 +170,8 @@ def get_input(prob, name):
         # attributes, e.g. `prob.process`.
         return getattr(prob, name)
     elif hasattr(prob, '_data') and name in prob._data:
-        # load case: input data is accessible via the input data cache dict
+        # input data cache: the compact parameter store of a model (which
+        # rebuilds the DataFrame) or the input dict of a loaded result
         return prob._data[name]
     else:
         # unknown
@@ -5,27 +5,31 @@ from .modelhelper import *
 from .input import *
 
 
-def create_model(data, dt=1, timesteps=None, dual=False):
+def create_model(data, dt=1, timesteps=None, dual=False, progress=None):
     """Create a pyomo ConcreteModel urbs object from given input data.
 
     Args:
         data: a dict of 6 DataFrames with the keys 'commodity', 'process',
-            'transmission', 'storage', 'demand' and 'supim'.
+            'transmission', 'storage', 'demand' and 'supim', or a
+            ModelInput compiled from it (see compile_input)
         dt: timestep duration in hours (default: 1)
         timesteps: optional list of timesteps, default: demand timeseries
         dual: set True to add dual variables to model (slower); default: False
+        progress: (optional) ProgressReporter, reports the construction of
+            each set, parameter, variable and constraint family
 
     Returns:
         a pyomo ConcreteModel object
     """
 
     # Optional
+    data = compile_input(data)
     if not timesteps:
-        timesteps = data['demand'].index.tolist()
-    m = pyomo_model_prep(data, timesteps)  # preparing pyomo model
+        timesteps = data.demand.timesteps
+    m = pyomo_model_prep(data, timesteps, progress)  # preparing pyomo model
     m.name = 'urbs'
     m.created = datetime.now().strftime('%Y%m%dT%H%M')
-    m._data = data
+    m._data = m.params
 
     # Parameters
 
@@ -67,33 +71,32 @@ def create_model(data, dt=1, timesteps=None, dual=False):
 
     # site (e.g. north, middle, south...)
     m.sit = pyomo.Set(
-        initialize=m.commodity.index.get_level_values('Site').unique(),
+        initialize=m.params.commodity.unique('Site'),
         doc='Set of sites')
 
     # commodity (e.g. solar, wind, coal...)
     m.com = pyomo.Set(
-        initialize=m.commodity.index.get_level_values('Commodity').unique(),
+        initialize=m.params.commodity.unique('Commodity'),
         doc='Set of commodities')
 
     # commodity type (i.e. SupIm, Demand, Stock, Env)
     m.com_type = pyomo.Set(
-        initialize=m.commodity.index.get_level_values('Type').unique(),
+        initialize=m.params.commodity.unique('Type'),
         doc='Set of commodity types')
 
     # process (e.g. Wind turbine, Gas plant, Photovoltaics...)
     m.pro = pyomo.Set(
-        initialize=m.process.index.get_level_values('Process').unique(),
+        initialize=m.params.process.unique('Process'),
         doc='Set of conversion processes')
 
     # tranmission (e.g. hvac, hvdc, pipeline...)
     m.tra = pyomo.Set(
-        initialize=m.transmission.index.get_level_values('Transmission')
-                                       .unique(),
+        initialize=m.params.transmission.unique('Transmission'),
         doc='Set of transmission technologies')
 
     # storage (e.g. hydrogen, pump storage)
     m.sto = pyomo.Set(
-        initialize=m.storage.index.get_level_values('Storage').unique(),
+        initialize=m.params.storage.unique('Storage'),
         doc='Set of storage technologies')
 
     # cost_type
@@ -105,20 +108,20 @@ def create_model(data, dt=1, timesteps=None, dual=False):
     # tuple sets
     m.com_tuples = pyomo.Set(
         within=m.sit*m.com*m.com_type,
-        initialize=m.commodity.index,
+        initialize=m.params.commodity.keys,
         doc='Combinations of defined commodities, e.g. (Mid,Elec,Demand)')
     m.pro_tuples = pyomo.Set(
         within=m.sit*m.pro,
-        initialize=m.process.index,
+        initialize=m.params.process.keys,
         doc='Combinations of possible processes, e.g. (North,Coal plant)')
     m.tra_tuples = pyomo.Set(
         within=m.sit*m.sit*m.tra*m.com,
-        initialize=m.transmission.index,
+        initialize=m.params.transmission.keys,
         doc='Combinations of possible transmissions, e.g. '
             '(South,Mid,hvac,Elec)')
     m.sto_tuples = pyomo.Set(
         within=m.sit*m.sto*m.com,
-        initialize=m.storage.index,
+        initialize=m.params.storage.keys,
         doc='Combinations of possible storage by site, e.g. (Mid,Bat,Elec)')
 
     # commodity type subsets
@@ -144,27 +147,27 @@ def create_model(data, dt=1, timesteps=None, dual=False):
         within=m.sit*m.pro*m.com,
         initialize=[(site, process, commodity)
                     for (site, process) in m.pro_tuples
-                    for (pro, commodity) in m.r_in.index
+                    for (pro, commodity) in m.params.r_in
                     if process == pro],
         doc='Commodities consumed by process by site, e.g. (Mid,PV,Solar)')
     m.pro_output_tuples = pyomo.Set(
         within=m.sit*m.pro*m.com,
         initialize=[(site, process, commodity)
                     for (site, process) in m.pro_tuples
-                    for (pro, commodity) in m.r_out.index
+                    for (pro, commodity) in m.params.r_out
                     if process == pro],
         doc='Commodities produced by process by site, e.g. (Mid,PV,Elec)')
 
     # storage tuples for storages with fixed initial state
     m.sto_init_bound_tuples = pyomo.Set(
         within=m.sit*m.sto*m.com,
-        initialize=m.stor_init_bound.index,
+        initialize=m.stor_init_bound,
         doc='storages with fixed initial state')
 
     # storage tuples for storages with given energy to power ratio
     m.sto_ep_ratio_tuples = pyomo.Set(
         within=m.sit*m.sto*m.com,
-        initialize=m.sto_ep_ratio.index,
+        initialize=m.sto_ep_ratio,
         doc='storages with given energy to power ratio')
 
     # Variables
@@ -409,7 +412,7 @@ def res_vertex_rule(m, tm, sit, com, com_type):
     # constraint is about power (MW), not energy (MWh)
     if com in m.com_demand:
         try:
-            power_surplus -= m.demand_dict[(sit, com)][tm]
+            power_surplus -= m.params.demand.value((sit, com), tm)
         except KeyError:
             pass
 
@@ -422,26 +425,27 @@ def res_vertex_rule(m, tm, sit, com, com_type):
 def def_process_capacity_rule(m, sit, pro):
     return (m.cap_pro[sit, pro] ==
             m.cap_pro_new[sit, pro] +
-            m.process_dict['inst-cap'][(sit, pro)])
+            m.params.process.value((sit, pro), 'inst-cap'))
 
 
 # process input power == process throughput * input ratio
 def def_process_input_rule(m, tm, sit, pro, co):
     return (m.e_pro_in[tm, sit, pro, co] ==
-            m.tau_pro[tm, sit, pro] * m.r_in_dict[(pro, co)])
+            m.tau_pro[tm, sit, pro] * m.params.r_in[(pro, co)])
 
 
 # process output power = process throughput * output ratio
 def def_process_output_rule(m, tm, sit, pro, co):
     return (m.e_pro_out[tm, sit, pro, co] ==
-            m.tau_pro[tm, sit, pro] * m.r_out_dict[(pro, co)])
+            m.tau_pro[tm, sit, pro] * m.params.r_out[(pro, co)])
 
 
 # process input (for supim commodity) = process capacity * timeseries
 def def_intermittent_supply_rule(m, tm, sit, pro, coin):
     if coin in m.com_supim:
         return (m.e_pro_in[tm, sit, pro, coin] ==
-                m.cap_pro[sit, pro] * m.supim_dict[(sit, coin)][tm] * m.dt)
+                m.cap_pro[sit, pro] *
+                m.params.supim.value((sit, coin), tm) * m.dt)
     else:
         return pyomo.Constraint.Skip
 
@@ -453,9 +457,9 @@ def res_process_throughput_by_capacity_rule(m, tm, sit, pro):
 
 # lower bound <= process capacity <= upper bound
 def res_process_capacity_rule(m, sit, pro):
-    return (m.process_dict['cap-lo'][sit, pro],
+    return (m.params.process.value((sit, pro), 'cap-lo'),
             m.cap_pro[sit, pro],
-            m.process_dict['cap-up'][sit, pro])
+            m.params.process.value((sit, pro), 'cap-up'))
 
 
 # transmission
@@ -464,14 +468,14 @@ def res_process_capacity_rule(m, sit, pro):
 def def_transmission_capacity_rule(m, sin, sout, tra, com):
     return (m.cap_tra[sin, sout, tra, com] ==
             m.cap_tra_new[sin, sout, tra, com] +
-            m.transmission_dict['inst-cap'][(sin, sout, tra, com)])
+            m.params.transmission.value((sin, sout, tra, com), 'inst-cap'))
 
 
 # transmission output == transmission input * efficiency
 def def_transmission_output_rule(m, tm, sin, sout, tra, com):
     return (m.e_tra_out[tm, sin, sout, tra, com] ==
             m.e_tra_in[tm, sin, sout, tra, com] *
-            m.transmission_dict['eff'][(sin, sout, tra, com)])
+            m.params.transmission.value((sin, sout, tra, com), 'eff'))
 
 
 # transmission input <= transmission capacity
@@ -482,9 +486,9 @@ def res_transmission_input_by_capacity_rule(m, tm, sin, sout, tra, com):
 
 # lower bound <= transmission capacity <= upper bound
 def res_transmission_capacity_rule(m, sin, sout, tra, com):
-    return (m.transmission_dict['cap-lo'][(sin, sout, tra, com)],
+    return (m.params.transmission.value((sin, sout, tra, com), 'cap-lo'),
             m.cap_tra[sin, sout, tra, com],
-            m.transmission_dict['cap-up'][(sin, sout, tra, com)])
+            m.params.transmission.value((sin, sout, tra, com), 'cap-up'))
 
 
 # transmission capacity from A to B == transmission capacity from B to A
@@ -498,27 +502,28 @@ def res_transmission_symmetry_rule(m, sin, sout, tra, com):
 # + newly stored energy * input efficiency
 # - retrieved energy / output efficiency
 def def_storage_state_rule(m, t, sit, sto, com):
+    storage = m.params.storage
     return (m.e_sto_con[t, sit, sto, com] ==
             m.e_sto_con[t-1, sit, sto, com] *
-            (1 - m.storage_dict['discharge'][(sit, sto, com)]) ** m.dt.value +
+            (1 - storage.value((sit, sto, com), 'discharge')) ** m.dt.value +
             m.e_sto_in[t, sit, sto, com] *
-            m.storage_dict['eff-in'][(sit, sto, com)] -
+            storage.value((sit, sto, com), 'eff-in') -
             m.e_sto_out[t, sit, sto, com] /
-            m.storage_dict['eff-out'][(sit, sto, com)])
+            storage.value((sit, sto, com), 'eff-out'))
 
 
 # storage power == new storage power + existing storage power
 def def_storage_power_rule(m, sit, sto, com):
     return (m.cap_sto_p[sit, sto, com] ==
             m.cap_sto_p_new[sit, sto, com] +
-            m.storage_dict['inst-cap-p'][(sit, sto, com)])
+            m.params.storage.value((sit, sto, com), 'inst-cap-p'))
 
 
 # storage capacity == new storage capacity + existing storage capacity
 def def_storage_capacity_rule(m, sit, sto, com):
     return (m.cap_sto_c[sit, sto, com] ==
             m.cap_sto_c_new[sit, sto, com] +
-            m.storage_dict['inst-cap-c'][(sit, sto, com)])
+            m.params.storage.value((sit, sto, com), 'inst-cap-c'))
 
 
 # storage input <= storage power
@@ -538,16 +543,16 @@ def res_storage_state_by_capacity_rule(m, t, sit, sto, com):
 
 # lower bound <= storage power <= upper bound
 def res_storage_power_rule(m, sit, sto, com):
-    return (m.storage_dict['cap-lo-p'][(sit, sto, com)],
+    return (m.params.storage.value((sit, sto, com), 'cap-lo-p'),
             m.cap_sto_p[sit, sto, com],
-            m.storage_dict['cap-up-p'][(sit, sto, com)])
+            m.params.storage.value((sit, sto, com), 'cap-up-p'))
 
 
 # lower bound <= storage capacity <= upper bound
 def res_storage_capacity_rule(m, sit, sto, com):
-    return (m.storage_dict['cap-lo-c'][(sit, sto, com)],
+    return (m.params.storage.value((sit, sto, com), 'cap-lo-c'),
             m.cap_sto_c[sit, sto, com],
-            m.storage_dict['cap-up-c'][(sit, sto, com)])
+            m.params.storage.value((sit, sto, com), 'cap-up-c'))
 
 
 # initialization of storage content in first timestep t[1]
@@ -557,11 +562,11 @@ def res_initial_and_final_storage_state_rule(m, t, sit, sto, com):
     if t == m.t[1]:  # first timestep (Pyomo uses 1-based indexing)
         return (m.e_sto_con[t, sit, sto, com] ==
                 m.cap_sto_c[sit, sto, com] *
-                m.storage_dict['init'][(sit, sto, com)])
+                m.params.storage.value((sit, sto, com), 'init'))
     elif t == m.t[len(m.t)]:  # last timestep
         return (m.e_sto_con[t, sit, sto, com] ==
                 m.cap_sto_c[sit, sto, com] *
-                m.storage_dict['init'][(sit, sto, com)])
+                m.params.storage.value((sit, sto, com), 'init'))
     else:
         return pyomo.Constraint.Skip
 
@@ -574,14 +579,14 @@ def res_initial_and_final_storage_state_var_rule(m, t, sit, sto, com):
 def def_storage_energy_power_ratio_rule(m, sit, sto, com):
     return (m.cap_sto_c[sit, sto, com] ==
             m.cap_sto_p[sit, sto, com] *
-            m.storage_dict['ep-ratio'][(sit, sto, com)])
+            m.params.storage.value((sit, sto, com), 'ep-ratio'))
 
 
 # total CO2 output <= Global CO2 limit
 def res_global_co2_limit_rule(m):
-    if math.isinf(m.global_prop.loc['CO2 limit', 'value']):
+    if math.isinf(m.params.global_prop['CO2 limit']):
         return pyomo.Constraint.Skip
-    elif m.global_prop.loc['CO2 limit', 'value'] >= 0:
+    elif m.params.global_prop['CO2 limit'] >= 0:
         co2_output_sum = 0
         for tm in m.tm:
             for sit in m.sit:
@@ -591,7 +596,7 @@ def res_global_co2_limit_rule(m):
 
         # scaling to annual output (cf. definition of m.weight)
         co2_output_sum *= m.weight
-        return (co2_output_sum <= m.global_prop.loc['CO2 limit', 'value'])
+        return (co2_output_sum <= m.params.global_prop['CO2 limit'])
     else:
         return pyomo.Constraint.Skip
 
@@ -618,53 +623,53 @@ def def_costs_rule(m, cost_type):
     if cost_type == 'Invest':
         return m.costs[cost_type] == \
             sum(m.cap_pro_new[p] *
-                m.process_dict['inv-cost'][p] *
-                m.process_dict['annuity-factor'][p]
+                m.params.process.value(p, 'inv-cost') *
+                m.params.process.value(p, 'annuity-factor')
                 for p in m.pro_tuples) + \
             sum(m.cap_tra_new[t] *
-                m.transmission_dict['inv-cost'][t] *
-                m.transmission_dict['annuity-factor'][t]
+                m.params.transmission.value(t, 'inv-cost') *
+                m.params.transmission.value(t, 'annuity-factor')
                 for t in m.tra_tuples) + \
             sum(m.cap_sto_p_new[s] *
-                m.storage_dict['inv-cost-p'][s] *
-                m.storage_dict['annuity-factor'][s] +
+                m.params.storage.value(s, 'inv-cost-p') *
+                m.params.storage.value(s, 'annuity-factor') +
                 m.cap_sto_c_new[s] *
-                m.storage_dict['inv-cost-c'][s] *
-                m.storage_dict['annuity-factor'][s]
+                m.params.storage.value(s, 'inv-cost-c') *
+                m.params.storage.value(s, 'annuity-factor')
                 for s in m.sto_tuples)
 
     elif cost_type == 'Fixed':
         return m.costs[cost_type] == \
-            sum(m.cap_pro[p] * m.process_dict['fix-cost'][p]
+            sum(m.cap_pro[p] * m.params.process.value(p, 'fix-cost')
                 for p in m.pro_tuples) + \
-            sum(m.cap_tra[t] * m.transmission_dict['fix-cost'][t]
+            sum(m.cap_tra[t] * m.params.transmission.value(t, 'fix-cost')
                 for t in m.tra_tuples) + \
-            sum(m.cap_sto_p[s] * m.storage_dict['fix-cost-p'][s] +
-                m.cap_sto_c[s] * m.storage_dict['fix-cost-c'][s]
+            sum(m.cap_sto_p[s] * m.params.storage.value(s, 'fix-cost-p') +
+                m.cap_sto_c[s] * m.params.storage.value(s, 'fix-cost-c')
                 for s in m.sto_tuples)
 
     elif cost_type == 'Variable':
         return m.costs[cost_type] == \
             sum(m.tau_pro[(tm,) + p] * m.weight *
-                m.process_dict['var-cost'][p]
+                m.params.process.value(p, 'var-cost')
                 for tm in m.tm
                 for p in m.pro_tuples) + \
             sum(m.e_tra_in[(tm,) + t] * m.weight *
-                m.transmission_dict['var-cost'][t]
+                m.params.transmission.value(t, 'var-cost')
                 for tm in m.tm
                 for t in m.tra_tuples) + \
             sum(m.e_sto_con[(tm,) + s] * m.weight *
-                m.storage_dict['var-cost-c'][s] +
+                m.params.storage.value(s, 'var-cost-c') +
                 m.weight *
                 (m.e_sto_in[(tm,) + s] + m.e_sto_out[(tm,) + s]) *
-                m.storage_dict['var-cost-p'][s]
+                m.params.storage.value(s, 'var-cost-p')
                 for tm in m.tm
                 for s in m.sto_tuples)
 
     elif cost_type == 'Fuel':
         return m.costs[cost_type] == sum(
             m.e_co_stock[(tm,) + c] * m.weight *
-            m.commodity_dict['price'][c]
+            m.params.commodity.value(c, 'price')
             for tm in m.tm for c in m.com_tuples
             if c[1] in m.com_stock)
 
@@ -672,7 +677,7 @@ def def_costs_rule(m, cost_type):
         return m.costs[cost_type] == sum(
             - commodity_balance(m, tm, sit, com) *
             m.weight *
-            m.commodity_dict['price'][(sit, com, com_type)]
+            m.params.commodity.value((sit, com, com_type), 'price')
             for tm in m.tm
             for sit, com, com_type in m.com_tuples
             if com in m.com_env)
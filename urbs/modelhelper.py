@@ -1,29 +1,5 @@
 import pandas as pd
-
-
-def annuity_factor(n, i):
-    """Annuity factor formula.
-
-    Evaluates the annuity factor formula for depreciation duration
-    and interest rate. Works also well for equally sized numpy arrays
-    of values for n and i.
-
-    Args:
-        n: depreciation period (years)
-        i: interest rate (e.g. 0.06 means 6 %)
-
-    Returns:
-        Value of the expression :math:`\\frac{(1+i)^n i}{(1+i)^n - 1}`
-
-    Example:
-        >>> round(annuity_factor(20, 0.07), 5)
-        0.09439
-
-    """
-    if i == 0:
-        return 1 / n
-    else:
-        return (1+i)**n * i / ((1+i)**n - 1)
+from modelinput import annuity_factor
 
 
 def commodity_balance(m, tm, sit, com):
@@ -48,11 +24,11 @@ def commodity_balance(m, tm, sit, com):
     balance = (sum(m.e_pro_in[(tm, site, process, com)]
                    # usage as input for process increases balance
                    for site, process in m.pro_tuples
-                   if site == sit and (process, com) in m.r_in_dict) -
+                   if site == sit and (process, com) in m.params.r_in) -
                sum(m.e_pro_out[(tm, site, process, com)]
                    # output from processes decreases balance
                    for site, process in m.pro_tuples
-                   if site == sit and (process, com) in m.r_out_dict) +
+                   if site == sit and (process, com) in m.params.r_out) +
                sum(m.e_tra_in[(tm, site_in, site_out, transmission, com)]
                    # exports increase balance
                    for site_in, site_out, transmission, commodity
@@ -4,7 +4,7 @@ from .pyomoio import get_entity, get_entities
 from .util import is_string
 
 
-def get_constants(instance):
+def get_constants(instance, cube=None):
     """Return summary DataFrames for important variables
 
     Usage:
@@ -12,6 +12,8 @@ def get_constants(instance):
 
     Args:
         instance: a urbs model instance
+        cube: (optional) a ResultCube of the current solution of instance,
+              see create_result_cube; read from instead of the instance
 
     Returns:
         (costs, cpro, ctra, csto) tuple
@@ -31,11 +33,19 @@ def get_constants(instance):
         South        0
         Name: Total, dtype: int64
     """
-    costs = get_entity(instance, 'costs')
-    cpro = get_entities(instance, ['cap_pro', 'cap_pro_new'])
-    ctra = get_entities(instance, ['cap_tra', 'cap_tra_new'])
-    csto = get_entities(instance, ['cap_sto_c', 'cap_sto_c_new',
-                                   'cap_sto_p', 'cap_sto_p_new'])
+    if cube is not None:
+        # read from the dense arrays of the result cube
+        costs = cube.to_series('costs')
+        cpro = cube.to_frame(['cap_pro', 'cap_pro_new'])
+        ctra = cube.to_frame(['cap_tra', 'cap_tra_new'])
+        csto = cube.to_frame(['cap_sto_c', 'cap_sto_c_new',
+                              'cap_sto_p', 'cap_sto_p_new'])
+    else:
+        costs = get_entity(instance, 'costs')
+        cpro = get_entities(instance, ['cap_pro', 'cap_pro_new'])
+        ctra = get_entities(instance, ['cap_tra', 'cap_tra_new'])
+        csto = get_entities(instance, ['cap_sto_c', 'cap_sto_c_new',
+                                       'cap_sto_p', 'cap_sto_p_new'])
 
     # better labels and index names and return sorted
     if not cpro.empty:
@@ -53,7 +63,7 @@ def get_constants(instance):
     return costs, cpro, ctra, csto
 
 
-def get_timeseries(instance, com, sites, timesteps=None):
+def get_timeseries(instance, com, sites, timesteps=None, cube=None):
     """Return DataFrames of all timeseries referring to given commodity
 
     Usage:
@@ -65,6 +75,8 @@ def get_timeseries(instance, com, sites, timesteps=None):
         com: a commodity name
         sites: a site name or list of site names
         timesteps: optional list of timesteps, default: all modelled timesteps
+        cube: (optional) a ResultCube of the current solution of instance,
+              see create_result_cube; sliced instead of the instance
 
     Returns:
         a tuple of (created, consumed, storage, imported, exported, dsm) with
@@ -77,6 +89,10 @@ def get_timeseries(instance, com, sites, timesteps=None):
         - exported: timeseries of commodity export
         - dsm: timeseries of demand-side management
     """
+    if cube is not None:
+        # slice the dense arrays of the result cube instead
+        return _get_timeseries_from_cube(cube, com, sites, timesteps)
+
     if timesteps is None:
         # default to all simulated timesteps
         timesteps = sorted(get_entity(instance, 'tm').index)
@@ -224,6 +240,118 @@ def get_timeseries(instance, com, sites, timesteps=None):
     return created, consumed, stored, imported, exported, dsm
 
 
+def _get_timeseries_from_cube(cube, com, sites, timesteps=None):
+    """Return the same DataFrames as get_timeseries, read from a ResultCube.
+
+    Args:
+        cube: a ResultCube, see create_result_cube
+        com: a commodity name
+        sites: a site name or list of site names
+        timesteps: optional list of timesteps, default: all modelled timesteps
+
+    Returns:
+        a tuple of (created, consumed, storage, imported, exported, dsm)
+    """
+    if timesteps is None:
+        timesteps = cube.timesteps
+    else:
+        timesteps = sorted(timesteps)
+
+    if is_string(sites):
+        sites = [sites]
+
+    # flows only exist in modelled timesteps, storage levels and demand
+    # also in the initial one (cf. get_timeseries)
+    modelled = set(cube.timesteps)
+    flow_steps = [t for t in timesteps if t in modelled]
+    index = pd.Index(timesteps, name='t')
+    flow_index = pd.Index(flow_steps, name='t')
+
+    def series(values, index=flow_index):
+        return pd.Series(values, index=index)
+
+    def frame(name, columns_dim, **selection):
+        # sum over everything except time and columns_dim; drop zero columns
+        if com not in cube.axis(name, 'com'):
+            return pd.DataFrame(index=flow_index)
+        values = cube.sum(name, keep=('t', columns_dim),
+                          t=flow_steps, com=com, **selection)
+        columns = cube.labels(name, columns_dim, selection.get(columns_dim))
+        return drop_all_zero_columns(
+            pd.DataFrame(values, index=flow_index, columns=columns))
+
+    # DEMAND
+    if com in cube.axis('demand', 'com'):
+        demand = series(cube.sum('demand', t=timesteps, sit=sites, com=com),
+                        index)
+    else:
+        demand = series(0, index)
+
+    # STOCK
+    if ('Stock' in cube.axis('e_co_stock', 'com_type') and
+            com in cube.axis('e_co_stock', 'com')):
+        stock = series(cube.sum('e_co_stock', t=flow_steps, sit=sites,
+                                com=com, com_type='Stock'))
+    else:
+        stock = series(0)
+    stock.name = 'Stock'
+
+    # PROCESS
+    created = frame('e_pro_out', 'pro', sit=sites)
+    consumed = frame('e_pro_in', 'pro', sit=sites)
+
+    # TRANSMISSION
+    if com in cube.axis('e_tra_in', 'com'):
+        other_sites = [sit for sit in cube.sites.labels if sit not in sites]
+
+        internal_import = series(cube.sum(
+            'e_tra_out', t=flow_steps, sit=sites, sit_=sites, com=com))
+        imported = frame('e_tra_out', 'sit', sit=other_sites, sit_=sites)
+        imported.columns.name = 'sit'
+
+        internal_export = series(cube.sum(
+            'e_tra_in', t=flow_steps, sit=sites, sit_=sites, com=com))
+        exported = frame('e_tra_in', 'sit_', sit=sites, sit_=other_sites)
+        exported.columns.name = 'sit_'
+    else:
+        imported = pd.DataFrame(index=flow_index)
+        exported = pd.DataFrame(index=flow_index)
+        internal_export = series(0)
+        internal_import = series(0)
+
+    # to be discussed: increase demand by internal transmission losses
+    demand = demand.add(internal_export - internal_import, fill_value=0)
+
+    # STORAGE
+    if com in cube.axis('e_sto_con', 'com'):
+        stored = pd.DataFrame(
+            {label: cube.sum(name, t=timesteps, sit=sites, com=com)
+             for label, name in [('Level', 'e_sto_con'),
+                                 ('Stored', 'e_sto_in'),
+                                 ('Retrieved', 'e_sto_out')]},
+            index=index, columns=['Level', 'Stored', 'Retrieved'])
+    else:
+        stored = pd.DataFrame(0, index=index,
+                              columns=['Level', 'Stored', 'Retrieved'])
+
+    # DEMAND SIDE MANAGEMENT
+    # the cube holds no DSM variables, so the demand is never shifted
+    delta = series(0, index)
+    shifted = demand + delta
+
+    shifted.name = 'Shifted'
+    demand.name = 'Unshifted'
+    delta.name = 'Delta'
+
+    dsm = pd.concat((shifted, demand, delta), axis=1)
+
+    # JOINS
+    created = created.join(stock)  # show stock as created
+    consumed = consumed.join(shifted.rename('Demand'))
+
+    return created, consumed, stored, imported, exported, dsm
+
+
 def drop_all_zero_columns(df):
     """ Drop columns from DataFrame if they contain only zeros.
 
@@ -1,12 +1,13 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from random import random
 from .data import COLORS
 from .input import get_input
 from .output import get_constants, get_timeseries
 from .pyomoio import get_entity
+from .resultcube import create_result_cube
 from .util import is_string
 
 
@@ -59,7 +60,7 @@ def sort_plot_elements(elements):
 def plot(prob, com, sit, dt, timesteps, timesteps_plot,
          power_name='Power', energy_name='Energy',
          power_unit='MW', energy_unit='MWh', time_unit='h',
-         figure_size=(16, 12)):
+         figure_size=(16, 12), max_points='auto'):
     """Plot a stacked timeseries of commodity balance and storage.
 
     Creates a stackplot of the energy balance of a given commodity, together
@@ -79,29 +80,56 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
         energy_unit: optional string for storage plot; default: 'MWh'
         time_unit: optional string for time unit label; default: 'h'
         figure_size: optional (width, height) tuple in inch; default: (16, 12)
+        max_points: optional maximum number of drawn timesteps, see
+                    reduce_plot_data; 'auto' adapts it to the figure width,
+                    None draws every timestep; default: 'auto'
 
     Returns:
         fig: figure handle
     """
-    import matplotlib.pyplot as plt
-    import matplotlib as mpl
+    data = plot_data(prob, com, sit, dt, timesteps, timesteps_plot)
+    return draw_plot(data, power_name=power_name, energy_name=energy_name,
+                     power_unit=power_unit, energy_unit=energy_unit,
+                     time_unit=time_unit, figure_size=figure_size,
+                     max_points=max_points)
+
+
+def plot_data(prob, com, sit, dt, timesteps, timesteps_plot, cube=None):
+    """Extract the data of a commodity balance plot into plain arrays.
+
+    This is the model-dependent half of `plot`. The returned dict only
+    contains lists, numbers and NumPy arrays, so it is cheap to pickle and
+    can be drawn by `draw_plot` in another process.
+
+    Args:
+        prob: urbs model instance
+        com: commodity name to plot
+        sit: site name to plot
+        dt: length of each time step (unit: hours)
+        timesteps: modelled timesteps
+        timesteps_plot: timesteps to be plotted
+        cube: (optional) a ResultCube of the current solution of prob, see
+              create_result_cube
 
+    Returns:
+        dict of plot data
+    """
     if timesteps is None:
         # default to all simulated timesteps
         timesteps = sorted(get_entity(prob, 'tm').index)
 
     # convert timesteps to hour series for the plots
-    hoursteps = timesteps * dt[0]
-    hoursteps_plot = timesteps_plot * dt[0]
+    hoursteps = np.asarray(timesteps) * dt[0]
+    hoursteps_plot = np.asarray(timesteps_plot) * dt[0]
 
     if is_string(sit):
         # wrap single site in 1-element list for consistent behaviour
         sit = [sit]
 
     (created, consumed, stored, imported, exported,
-     dsm) = get_timeseries(prob, com, sit, timesteps)
+     dsm) = get_timeseries(prob, com, sit, timesteps, cube=cube)
 
-    costs, cpro, ctra, csto = get_constants(prob)
+    costs, cpro, ctra, csto = get_constants(prob, cube)
 
     # move retrieved/stored storage timeseries to created/consumed and
     # rename storage columns back to 'storage' for color mapping
@@ -127,7 +155,7 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
         df_dsm = get_input(prob, 'dsm')
         plot_dsm = df_dsm.loc[(sit, com),
                               ['cap-max-do', 'cap-max-up']].sum().sum() > 0
-    except (KeyError, TypeError):
+    except (KeyError, TypeError, ValueError):
         plot_dsm = False
 
     # remove all columns from created which are all-zeros in both created and
@@ -148,6 +176,129 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
     created = sort_plot_elements(created)
     consumed = sort_plot_elements(consumed)
 
+    # upper limit of the storage plot: total storage capacity
+    try:
+        storage_limit = 0.5 + csto.loc[sit, :, com]['C Total'].sum()
+    except KeyError:
+        storage_limit = None
+
+    return {
+        'com': com,
+        'sit': list(sit),
+        'dt': dt[0],
+        'hoursteps': hoursteps,
+        'hoursteps_plot': hoursteps_plot,
+        'created_columns': list(created.columns),
+        'created': created.values,
+        'consumed_columns': list(consumed.columns),
+        'consumed': consumed.values,
+        'stored': stored.values,
+        'demand': demand.values,
+        'original': original.values,
+        'deltademand': deltademand.values,
+        'plot_dsm': plot_dsm,
+        'storage_limit': storage_limit,
+        }
+
+
+def reduce_plot_data(data, max_points):
+    """Reduce the timesteps of plot data to those that are visible.
+
+    Crops the data to the plotted period and, if still more than max_points
+    timesteps remain, splits the period into buckets and keeps only the
+    timesteps at which the total created, total consumed and stored amount
+    reach their minimum and maximum within a bucket. All timeseries keep the
+    same timesteps, so the drawn stacks still balance at every point and
+    peaks are not flattened.
+
+    Args:
+        data: dict of plot data, see `plot_data`
+        max_points: maximum number of timesteps to keep
+
+    Returns:
+        dict of plot data with fewer timesteps
+    """
+    hoursteps = data['hoursteps']
+    hoursteps_plot = data['hoursteps_plot']
+    if len(hoursteps) < 3 or len(hoursteps_plot) == 0:
+        return data
+
+    # crop to plotted period, with one timestep of margin on each side
+    visible = np.nonzero((hoursteps >= hoursteps_plot[0]) &
+                         (hoursteps <= hoursteps_plot[-1]))[0]
+    if len(visible) == 0:
+        return data
+    first = max(visible[0] - 1, 1)
+    last = min(visible[-1] + 2, len(hoursteps))
+    steps = np.arange(first, last)
+
+    if len(steps) > max_points:
+        # flow timeseries are shifted by one against storage/demand ones
+        signals = [data['created'].sum(axis=1)[steps - 1],
+                   data['consumed'].sum(axis=1)[steps - 1],
+                   data['stored'][steps]]
+
+        # min and max of each signal per bucket
+        buckets = max(max_points // (2 * len(signals)), 1)
+        picked = []
+        for bucket in np.array_split(np.arange(len(steps)), buckets):
+            for signal in signals:
+                picked.append(bucket[np.argmin(signal[bucket])])
+                picked.append(bucket[np.argmax(signal[bucket])])
+        steps = steps[np.unique(picked)]
+
+    # the initial timestep always stays first, flows refer to keep[1:]
+    keep = np.insert(steps, 0, 0)
+    flows = steps - 1
+
+    reduced = dict(data)
+    reduced['hoursteps'] = hoursteps[keep]
+    for name in ['stored', 'original', 'deltademand']:
+        reduced[name] = data[name][keep]
+    for name in ['created', 'consumed', 'demand']:
+        reduced[name] = data[name][flows]
+    return reduced
+
+
+def draw_plot(data, power_name='Power', energy_name='Energy',
+              power_unit='MW', energy_unit='MWh', time_unit='h',
+              figure_size=(16, 12), max_points='auto'):
+    """Draw a commodity balance plot from data extracted by `plot_data`.
+
+    Args:
+        data: dict of plot data, see `plot_data`
+        power_name: optional string for 'power' label; default: 'Power'
+        power_unit: optional string for unit; default: 'MW'
+        energy_name: optional string for 'energy' label; default: 'Energy'
+        energy_unit: optional string for storage plot; default: 'MWh'
+        time_unit: optional string for time unit label; default: 'h'
+        figure_size: optional (width, height) tuple in inch; default: (16, 12)
+        max_points: optional maximum number of drawn timesteps, see
+                    reduce_plot_data; 'auto' (default) uses two points per
+                    pixel column of the figure, None draws every timestep
+
+    Returns:
+        fig: figure handle
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib as mpl
+
+    if max_points == 'auto':
+        max_points = int(2 * figure_size[0] * mpl.rcParams['figure.dpi'])
+    if max_points:
+        data = reduce_plot_data(data, max_points)
+
+    com = data['com']
+    sit = data['sit']
+    dt = data['dt']
+    hoursteps = data['hoursteps']
+    hoursteps_plot = data['hoursteps_plot']
+    created_columns = data['created_columns']
+    created = data['created']
+    consumed_columns = data['consumed_columns']
+    consumed = data['consumed']
+    plot_dsm = data['plot_dsm']
+
     # FIGURE
     fig = plt.figure(figsize=figure_size)
     all_axes = []
@@ -164,11 +315,11 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
 
     # stack plot for consumed commodities (divided by dt for power)
     sp00 = ax0.stackplot(hoursteps[1:],
-                         -consumed.as_matrix().T/dt[0],
-                         labels=tuple(consumed.columns),
+                         -consumed.T/dt,
+                         labels=tuple(consumed_columns),
                          linewidth=0.15)
     # color
-    for k, commodity in enumerate(consumed.columns):
+    for k, commodity in enumerate(consumed_columns):
         commodity_color = to_color(commodity)
 
         sp00[k].set_facecolor(commodity_color)
@@ -178,11 +329,11 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
 
     # stack plot for created commodities (divided by dt for power)
     sp0 = ax0.stackplot(hoursteps[1:],
-                        created.as_matrix().T/dt[0],
-                        labels=tuple(created.columns),
+                        created.T/dt,
+                        labels=tuple(created_columns),
                         linewidth=0.15)
 
-    for k, commodity in enumerate(created.columns):
+    for k, commodity in enumerate(created_columns):
         commodity_color = to_color(commodity)
 
         sp0[k].set_facecolor(commodity_color)
@@ -196,10 +347,10 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
     handles, labels = ax0.get_legend_handles_labels()
 
     # add "only" consumed commodities to the legend
-    for item in consumed.columns[::-1]:
+    for k, item in reversed(list(enumerate(consumed_columns))):
         # if item not in created add to legend, except items
         # from consumed which are all-zeros
-        if item in created.columns or consumed[item].any():
+        if item in created_columns or consumed[:, k].any():
             pass
         else:
             # remove item/commodity is not consumed
@@ -225,11 +376,11 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
     # PLOT DEMAND
 
     # line plot for demand (unshifted) commodities (divided by dt for power)
-    ax0.plot(hoursteps, original.values/dt[0], linewidth=0.8,
+    ax0.plot(hoursteps, data['original']/dt, linewidth=0.8,
              color=to_color('Unshifted'))
 
     # line plot for demand (shifted) commodities (divided by dt for power)
-    ax0.plot(hoursteps[1:], demand.values/dt[0], linewidth=1.0,
+    ax0.plot(hoursteps[1:], data['demand']/dt, linewidth=1.0,
              color=to_color('Shifted'))
 
     # PLOT STORAGE
@@ -237,7 +388,7 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
     all_axes.append(ax1)
 
     # stack plot for stored commodities
-    sp1 = ax1.stackplot(hoursteps, stored.values, linewidth=0.15)
+    sp1 = ax1.stackplot(hoursteps, data['stored'], linewidth=0.15)
     if plot_dsm:
         # hide xtick labels only if DSM plot follows
         plt.setp(ax1.get_xticklabels(), visible=False)
@@ -250,10 +401,8 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
     sp1[0].set_edgecolor(to_color('Decoration'))
     ax1.set_ylabel('{} ({})'.format(energy_name, energy_unit))
 
-    try:
-        ax1.set_ylim((0, 0.5 + csto.loc[sit, :, com]['C Total'].sum()))
-    except KeyError:
-        pass
+    if data['storage_limit'] is not None:
+        ax1.set_ylim((0, data['storage_limit']))
 
     # PLOT DEMAND SIDE MANAGEMENT
     if plot_dsm:
@@ -262,7 +411,7 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
 
         # bar plot for DSM up-/downshift power (bar width depending on dt)
         ax2.bar(hoursteps,
-                deltademand.values/dt[0], width=0.8 * dt[0],
+                data['deltademand']/dt, width=0.8 * dt,
                 color=to_color('Delta'),
                 edgecolor='none')
 
@@ -271,16 +420,16 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
         ax2.set_ylabel('{} ({})'.format(power_name, power_unit))
 
     # make xtick distance duration-dependent
-    if len(timesteps_plot) > 26 * 168 / dt[0]:    # time horizon > half a year
-        steps_between_ticks = int(168 * 4 / dt[0])  # tick every four weeks
-    elif len(timesteps_plot) > 3 * 168 / dt[0]:   # time horizon > three weeks
-        steps_between_ticks = int(168 / dt[0])      # tick every week
-    elif len(timesteps_plot) > 2 * 24 / dt[0]:    # time horizon > two days
-        steps_between_ticks = int(24 / dt[0])       # tick every day
-    elif len(timesteps_plot) > 24 / dt[0]:        # time horizon > a day
-        steps_between_ticks = int(6 / dt[0])        # tick every six hours
-    else:                                         # time horizon <= a day
-        steps_between_ticks = int(3 / dt[0])        # tick every three hours
+    if len(hoursteps_plot) > 26 * 168 / dt:    # time horizon > half a year
+        steps_between_ticks = int(168 * 4 / dt)  # tick every four weeks
+    elif len(hoursteps_plot) > 3 * 168 / dt:   # time horizon > three weeks
+        steps_between_ticks = int(168 / dt)      # tick every week
+    elif len(hoursteps_plot) > 2 * 24 / dt:    # time horizon > two days
+        steps_between_ticks = int(24 / dt)       # tick every day
+    elif len(hoursteps_plot) > 24 / dt:        # time horizon > a day
+        steps_between_ticks = int(6 / dt)        # tick every six hours
+    else:                                      # time horizon <= a day
+        steps_between_ticks = int(3 / dt)        # tick every three hours
 
     hoursteps_plot_ = hoursteps_plot[(steps_between_ticks-1):]
     hoursteps_plot_ = hoursteps_plot_[::steps_between_ticks]  # take whole h's
@@ -315,7 +464,7 @@ def plot(prob, com, sit, dt, timesteps, timesteps_plot,
 
 def result_figures(prob, figure_basename, timesteps, plot_title_prefix=None,
                    plot_tuples=None, plot_sites_name={},
-                   periods=None, extensions=None, **kwds):
+                   periods=None, extensions=None, workers=None, **kwds):
     """Create plots for multiple periods and sites and save them to files.
 
     Args:
@@ -330,11 +479,17 @@ def result_figures(prob, figure_basename, timesteps, plot_title_prefix=None,
                  default: one period 'all' with all timesteps is assumed
         extensions: (optional) list of file extensions for plot images
                     default: png, pdf
-        **kwds: (optional) keyword arguments are forwarded to urbs.plot()
+        workers: (optional) number of worker processes rendering the figures
+                 concurrently; default: None (render one after another)
+        **kwds: (optional) keyword arguments are forwarded to urbs.plot(),
+                e.g. max_points=None to draw every timestep
     """
     # retrieve parameter 'dt' from the model
     dt = get_entity(prob, 'dt')
 
+    # build the result cube once, so that all plots slice their data from it
+    cube = create_result_cube(prob)
+
     # default to all demand (sit, com) tuples if none are specified
     if plot_tuples is None:
         plot_tuples = get_input(prob, 'demand').columns
@@ -347,41 +502,90 @@ def result_figures(prob, figure_basename, timesteps, plot_title_prefix=None,
     if extensions is None:
         extensions = ['png', 'pdf']
 
-    # create timeseries plot for each demand (site, commodity) timeseries
-    for sit, com in plot_tuples:
-        # wrap single site name in 1-element list for consistent behaviour
-        if is_string(sit):
-            help_sit = [sit]
-        else:
-            help_sit = sit
-            sit = tuple(sit)
-
-        try:
-            plot_sites_name[sit]
-        except:
-            plot_sites_name[sit] = str(sit)
-
-        for period, periodrange in periods.items():
-            # do the plotting
-            fig = plot(prob, com, help_sit, dt, timesteps, periodrange, **kwds)
-
-            # change the figure title
-            ax0 = fig.get_axes()[0]
-            # if no custom title prefix is specified, use the figure_basename
-            if not plot_title_prefix:
-                plot_title_prefix = os.path.basename(figure_basename)
-
-            new_figure_title = '{}: {} in {}'.format(
-                plot_title_prefix, com, plot_sites_name[sit])
-            ax0.set_title(new_figure_title)
-
-            # save plot to files
-            for ext in extensions:
-                fig_filename = '{}-{}-{}-{}.{}'.format(
+    # if no custom title prefix is specified, use the figure_basename
+    if not plot_title_prefix:
+        plot_title_prefix = os.path.basename(figure_basename)
+
+    def figures():
+        # plot data, title and file names of each figure; data is always
+        # extracted here, drawing happens here or in the pool
+        for sit, com in plot_tuples:
+            # wrap single site name in 1-element list for consistent
+            # behaviour
+            if is_string(sit):
+                help_sit = [sit]
+            else:
+                help_sit = sit
+                sit = tuple(sit)
+
+            try:
+                plot_sites_name[sit]
+            except:
+                plot_sites_name[sit] = str(sit)
+
+            for period, periodrange in periods.items():
+                data = plot_data(prob, com, help_sit, dt, timesteps,
+                                 periodrange, cube)
+
+                new_figure_title = '{}: {} in {}'.format(
+                    plot_title_prefix, com, plot_sites_name[sit])
+
+                fig_filenames = ['{}-{}-{}-{}.{}'.format(
                     figure_basename, com, ''.join(
                         plot_sites_name[sit]), period, ext)
-                fig.savefig(fig_filename, bbox_inches='tight')
-            plt.close(fig)
+                    for ext in extensions]
+
+                yield data, new_figure_title, fig_filenames
+
+    # create timeseries plot for each demand (site, commodity) timeseries
+    if not workers:
+        for data, title, filenames in figures():
+            _render_figure(data, title, filenames, kwds)
+        return
+
+    # the pool is shut down on any error, also one raised while extracting
+    # the plot data; figures not yet started are cancelled then
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=init_render_worker) as pool:
+        futures = []
+        try:
+            for data, title, filenames in figures():
+                futures.append(pool.submit(
+                    _render_figure, data, title, filenames, kwds))
+
+            # wait for all figures, re-raising the first rendering error
+            for future in futures:
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def init_render_worker():
+    """Initializer of figure rendering worker processes
+
+    Render workers never show figures, so matplotlib is switched to a file
+    backend. Pass as initializer to a ProcessPoolExecutor.
+    """
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def _render_figure(data, title, filenames, kwds):
+    import matplotlib.pyplot as plt
+
+    # do the plotting
+    fig = draw_plot(data, **kwds)
+
+    # change the figure title
+    ax0 = fig.get_axes()[0]
+    ax0.set_title(title)
+
+    # save plot to files
+    for fig_filename in filenames:
+        fig.savefig(fig_filename, bbox_inches='tight')
+    plt.close(fig)
 
 
 def to_color(obj=None):
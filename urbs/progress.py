@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+
+import pyomo.core as pyomo
+
+
+class ProgressReporter(object):
+    """Reports the progress of model construction and solves.
+
+    Every event is a flat dict, passed to all callbacks and, if a logger is
+    given, logged as one JSON line. Common keys are 'event' ('construct' or
+    'solve'), 'model' (model name) and 'elapsed' (seconds since the first
+    event of this kind and model).
+
+    'construct' events are reported before ('status': 'start') and after
+    ('status': 'done') the construction of each model component, with the
+    keys 'component', 'kind' (e.g. 'Constraint'), 'count' (components done)
+    and, when done, 'elements', 'seconds' and 'rate' (elements per second).
+    Given reference times of an earlier run, they also hold 'progress'
+    (fraction of the reference construction time done) and 'eta' (seconds).
+
+    'solve' events hold the figures parsed from the live solver output,
+    e.g. 'iteration', 'objective', 'infeasibility', 'bound' and 'gap'
+    (see comparison.PROGRESS_PARSERS), and 'rate' (iterations per second).
+
+    Usage:
+        reporter = ProgressReporter(callbacks=[print])
+        model = create_model(data, 1, timesteps, progress=reporter)
+
+    Attributes:
+        callbacks: list of functions, called with each event dict
+        logger: (optional) logging.Logger for structured log lines
+        level: log level of the log lines
+        reference: dict of model name: {component: seconds}, e.g. the times
+                   of an earlier run
+        times: dict of model name: {component: seconds} of this run
+    """
+
+    def __init__(self, callbacks=None, logger=None, level=logging.INFO,
+                 reference=None):
+        self.callbacks = list(callbacks or [])
+        self.logger = logger
+        self.level = level
+        self.reference = reference or {}
+        self.times = {}
+        self._start = {}
+
+    def report(self, event, model, **fields):
+        """Passes an event to the callbacks and the logger"""
+        now = time.perf_counter()
+        start = self._start.setdefault((event, model), now)
+        record = {'event': event, 'model': model, 'elapsed': now - start}
+        record.update(fields)
+        for callback in self.callbacks:
+            callback(record)
+        if self.logger is not None:
+            self.logger.log(self.level, json.dumps(record, default=str))
+        return record
+
+    def construction_started(self, model, component, kind):
+        """Reports the start of a component construction"""
+        return self.report('construct', model, status='start',
+                           component=component, kind=kind,
+                           count=len(self.times.get(model, {})))
+
+    def constructed(self, model, component, kind, elements, seconds):
+        """Reports a constructed component"""
+        times = self.times.setdefault(model, {})
+        times[component] = seconds
+        fields = {'status': 'done', 'component': component, 'kind': kind,
+                  'count': len(times), 'elements': elements,
+                  'seconds': seconds,
+                  'rate': elements / seconds if seconds > 0 else None}
+
+        # estimate from the reference times of the same components
+        reference = self.reference.get(model)
+        if reference:
+            total = sum(reference.values())
+            done = sum(reference.get(name, 0) for name in times)
+            if total > 0 and done > 0:
+                fields['progress'] = min(done / total, 1.0)
+                fields['eta'] = max(total - done, 0) * \
+                    sum(times.values()) / done
+        return self.report('construct', model, **fields)
+
+
+class ProgressModel(pyomo.ConcreteModel):
+    """ConcreteModel reporting the construction of each component.
+
+    Components are constructed when they are added to a concrete model, so
+    the construction of each set, parameter, variable, expression and
+    constraint family is timed in add_component.
+
+    Args:
+        reporter: a ProgressReporter
+        name: model name used in the reported events
+    """
+
+    def __init__(self, reporter, name='unknown', *args, **kwargs):
+        super(ProgressModel, self).__init__(*args, name=name, **kwargs)
+        self._progress = reporter
+
+    def add_component(self, name, val):
+        reporter = self.__dict__.get('_progress')
+        if reporter is None:
+            return super(ProgressModel, self).add_component(name, val)
+
+        kind = _kind(val)
+        reporter.construction_started(self.name, name, kind)
+        start = time.perf_counter()
+        super(ProgressModel, self).add_component(name, val)
+        seconds = time.perf_counter() - start
+        elements = len(val) if val.is_indexed() else 1
+        reporter.constructed(self.name, name, kind, elements, seconds)
+
+
+def _kind(component):
+    # component type name, e.g. 'Constraint' (ctype: Pyomo >= 5.7)
+    ctype = getattr(component, 'ctype', None)
+    if ctype is None:
+        ctype = component.type()
+    return ctype.__name__
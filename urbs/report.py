@@ -1,10 +1,19 @@
+import math
+import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from .input import get_input
 from .output import get_constants, get_timeseries
+from .resultcube import create_result_cube
 from .util import is_string
 
+# sheets of every report, before the timeseries sheets
+REPORT_SHEETS = ['Costs', 'Process caps', 'Transmission caps',
+                 'Storage caps', 'Commodity sums']
 
-def report(instance, filename, report_tuples=None, report_sites_name={}):
+
+def report(instance, filename, report_tuples=None, report_sites_name={},
+           streaming=False):
     """Write result summary to a spreadsheet file
 
     Args:
@@ -13,7 +22,11 @@ def report(instance, filename, report_tuples=None, report_sites_name={}):
         report_tuples: (optional) list of (sit, com) tuples for which to
                        create detailed timeseries sheets
         report_sites_name: (optional) dict of names for created timeseries
-                       sheets
+                       sheets; tuples of the same name and commodity are
+                       added together into one sheet
+        streaming: (optional) if True, write each sheet as soon as it is
+                   computed with xlsxwriter in constant-memory mode instead
+                   of collecting all timeseries tableaus first
     Returns:
         Nothing
     """
@@ -21,90 +34,385 @@ def report(instance, filename, report_tuples=None, report_sites_name={}):
     if report_tuples is None:
         report_tuples = get_input(instance, 'demand').columns
 
-    costs, cpro, ctra, csto = get_constants(instance)
+    # build the result cube once, so that all timeseries are sliced from it
+    cube = create_result_cube(instance)
+
+    if streaming:
+        return _report_streaming(instance, cube, filename, report_tuples,
+                                 report_sites_name)
+
+    costs, cpro, ctra, csto = get_constants(instance, cube)
 
     # create spreadsheet writer object
     with pd.ExcelWriter(filename) as writer:
 
         # write constants to spreadsheet
-        costs.to_frame().to_excel(writer, 'Costs')
-        cpro.to_excel(writer, 'Process caps')
-        ctra.to_excel(writer, 'Transmission caps')
-        csto.to_excel(writer, 'Storage caps')
+        costs.to_frame().to_excel(writer, sheet_name='Costs')
+        cpro.to_excel(writer, sheet_name='Process caps')
+        ctra.to_excel(writer, sheet_name='Transmission caps')
+        csto.to_excel(writer, sheet_name='Storage caps')
 
-        # initialize timeseries tableaus
+        # collect timeseries data, one tableau per sheet
+        groups = _report_groups(report_tuples, report_sites_name)
         energies = []
         timeseries = {}
-        help_ts = {}
-
-        # collect timeseries data
-        for sit, com in report_tuples:
-
-            # wrap single site name in 1-element list for consistent behavior
-            if is_string(sit):
-                help_sit = [sit]
-            else:
-                help_sit = sit
-                sit = tuple(sit)
-
-            # check existence of predefined names, else define them
-            try:
-                report_sites_name[sit]
-            except:
-                report_sites_name[sit] = str(sit)
-
-            for lv in help_sit:
-                (created, consumed, stored, imported, exported,
-                 dsm) = get_timeseries(instance, com, lv)
-
-                overprod = pd.DataFrame(
-                    columns=['Overproduction'],
-                    data=created.sum(axis=1) - consumed.sum(axis=1) +
-                    imported.sum(axis=1) - exported.sum(axis=1) +
-                    stored['Retrieved'] - stored['Stored'])
-
-                tableau = pd.concat(
-                    [created, consumed, stored, imported, exported, overprod,
-                     dsm],
-                    axis=1,
-                    keys=['Created', 'Consumed', 'Storage', 'Import from',
-                          'Export to', 'Balance', 'DSM'])
-                help_ts[(lv, com)] = tableau.copy()
-
-                # timeseries sums
-                help_sums = pd.concat([created.sum(), consumed.sum(),
-                                       stored.sum().drop('Level'),
-                                       imported.sum(), exported.sum(),
-                                       overprod.sum(), dsm.sum()],
-                                      axis=0,
-                                      keys=['Created', 'Consumed', 'Storage',
-                                            'Import', 'Export', 'Balance',
-                                            'DSM'])
-                try:
-                    timeseries[(report_sites_name[sit], com)] = timeseries[
-                        (report_sites_name[sit], com)].add(
-                            help_ts[(lv, com)], axis=1, fill_value=0)
-                    sums = sums.add(help_sums, fill_value=0)
-                except:
-                    timeseries[(report_sites_name[sit], com)] = help_ts[
-                        (lv, com)]
-                    sums = help_sums
-
-            energies.append(sums.to_frame("{}.{}".format(
-                report_sites_name[sit], com)))
+        for (name, com), help_sit in groups.items():
+            tableau, sums = _group_tableau(instance, cube, com, help_sit)
+            timeseries[(name, com)] = tableau
+            energies.append(sums.to_frame("{}.{}".format(name, com)))
 
         # write timeseries data (if any)
         if timeseries:
             # concatenate Commodity sums
             energy = pd.concat(energies, axis=1).fillna(0)
-            energy.to_excel(writer, 'Commodity sums')
+            energy.to_excel(writer, sheet_name='Commodity sums')
 
             # write timeseries to individual sheets
-            for sit, com in report_tuples:
-                if isinstance(sit, list):
-                    sit = tuple(sit)
-                # sheet names cannot be longer than 31 characters...
-                sheet_name = "{}.{} timeseries".format(
-                    report_sites_name[sit], com)[:31]
-                timeseries[(report_sites_name[sit], com)].to_excel(
-                    writer, sheet_name)
+            for key, sheet_name in _sheet_names(groups).items():
+                timeseries[key].to_excel(writer, sheet_name=sheet_name)
+
+
+def compare_reports(filename, other):
+    """Compare the sheets and values of two report spreadsheets
+
+    Meant to check that a streaming report holds the same results as a
+    normal report of the same instance (see report). The two differ in
+    layout only: pandas merges repeated labels and writes the index names
+    of timeseries sheets into a row of their own, the streaming writer
+    repeats labels. Both are brought into the streaming layout first.
+
+    Args:
+        filename: a spreadsheet file written by report
+        other: another spreadsheet file written by report
+
+    Returns:
+        list of differences, as readable strings; empty if both files hold
+        the same sheets, in the same order, with the same values
+    """
+    sheets = pd.read_excel(filename, sheet_name=None, header=None)
+    other_sheets = pd.read_excel(other, sheet_name=None, header=None)
+    if list(sheets) != list(other_sheets):
+        return ['sheets differ: {} != {}'.format(list(sheets),
+                                                 list(other_sheets))]
+
+    differences = []
+    for name in sheets:
+        # timeseries sheets have two column levels, all others one
+        header_rows = 1 if name in REPORT_SHEETS else 2
+        df = _unmerge_sheet(sheets[name], header_rows)
+        other_df = _unmerge_sheet(other_sheets[name], header_rows)
+        if df.shape != other_df.shape:
+            differences.append('{}: shape {} != {}'.format(
+                name, df.shape, other_df.shape))
+            continue
+
+        # cells are compared as numbers where possible, else as text
+        values = df.apply(pd.to_numeric, errors='coerce')
+        other_values = other_df.apply(pd.to_numeric, errors='coerce')
+        numeric = values.notna() & other_values.notna()
+        equal = ((values - other_values).abs() <=
+                 1e-9 * (1 + other_values.abs()))
+        same_text = ((df.astype(str) == other_df.astype(str)) |
+                     (df.isna() & other_df.isna()))
+        mismatches = int((~equal.where(numeric, same_text)).values.sum())
+        if mismatches:
+            differences.append('{}: {} cells differ'.format(
+                name, mismatches))
+    return differences
+
+
+def _unmerge_sheet(df, header_rows):
+    # bring a sheet read with header=None into the streaming layout
+    df = df.reset_index(drop=True)
+    df.columns = range(df.shape[1])
+
+    # a row with the index names only follows the headers: move them into
+    # the last header row
+    if header_rows > 1 and len(df) > header_rows:
+        names = df.iloc[header_rows]
+        width = int(names.notna().values.argmin()) if names.isna().any() \
+            else 0
+        if (width > 0 and names.iloc[width:].isna().all() and
+                df.iloc[header_rows - 1, :width].isna().all()):
+            df.iloc[header_rows - 1, :width] = names.iloc[:width].values
+            df = df.drop(header_rows).reset_index(drop=True)
+
+    # merged column labels: repeat them to the right
+    header = df.iloc[:header_rows].copy()
+    for row in range(header_rows - 1):
+        labels = header.iloc[row]
+        first = labels.first_valid_index()
+        if first is not None:
+            header.iloc[row, first:] = labels.iloc[first:].ffill().values
+
+    # merged index labels: repeat them downwards, in the leading text
+    # columns of the data rows
+    data = df.iloc[header_rows:].copy()
+    for column in data.columns:
+        values = data[column].dropna()
+        if values.empty or not values.map(is_string).all():
+            break
+        data[column] = data[column].ffill()
+    return pd.concat([header, data])
+
+
+def report_timeseries(instance, directory, report_tuples=None,
+                      report_sites_name={}, file_format='csv', workers=None):
+    """Write timeseries tableaus to one CSV or Parquet file each
+
+    Each (sit, com) tuple is computed and written independently, so the
+    files can be produced by parallel worker processes. Workers only receive
+    the result cube (plain NumPy arrays), never the model instance.
+
+    Args:
+        instance: a urbs model instance
+        directory: output directory, created if not existent
+        report_tuples: (optional) list of (sit, com) tuples for which to
+                       create timeseries files
+        report_sites_name: (optional) dict of names for created files
+        file_format: (optional) 'csv' (default) or 'parquet' (needs
+                     pyarrow)
+        workers: (optional) number of worker processes; default: None
+                 (write sequentially in this process)
+    Returns:
+        list of written file names, in the order of report_tuples, followed
+        by the file of commodity sums
+    """
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError("Unknown file_format '{}'".format(file_format))
+
+    # default to all demand (sit, com) tuples if none are specified
+    if report_tuples is None:
+        report_tuples = get_input(instance, 'demand').columns
+
+    cube = create_result_cube(instance)
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    jobs = []
+    for sit, com in report_tuples:
+        if is_string(sit):
+            help_sit = [sit]
+        else:
+            help_sit = list(sit)
+            sit = tuple(sit)
+        name = report_sites_name.get(sit, str(sit))
+        filename = os.path.join(
+            directory, '{}.{}.{}'.format(name, com, file_format))
+        jobs.append((help_sit, com, filename, file_format))
+
+    if workers:
+        # ship only the cube to the workers (once each), not the pyomo model
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(cube,)) as pool:
+            futures = [pool.submit(_write_timeseries_file, None, None, *job)
+                       for job in jobs]
+            sums = [future.result() for future in futures]
+    else:
+        sums = [_write_timeseries_file(instance, cube, *job)
+                for job in jobs]
+
+    if not jobs:
+        return []
+
+    # commodity sums of all tuples in one small file
+    names = [os.path.splitext(os.path.basename(job[2]))[0] for job in jobs]
+    energy = pd.concat([s.to_frame(name) for s, name in zip(sums, names)],
+                       axis=1).fillna(0)
+    sums_filename = os.path.join(directory, 'commodity-sums.csv')
+    energy.to_csv(sums_filename)
+
+    return [job[2] for job in jobs] + [sums_filename]
+
+
+def _timeseries_tableau(instance, cube, com, sit):
+    # timeseries tableau and its sums for a single site and commodity
+    (created, consumed, stored, imported, exported,
+     dsm) = get_timeseries(instance, com, sit, cube=cube)
+
+    overprod = pd.DataFrame(
+        columns=['Overproduction'],
+        data=created.sum(axis=1) - consumed.sum(axis=1) +
+        imported.sum(axis=1) - exported.sum(axis=1) +
+        stored['Retrieved'] - stored['Stored'])
+
+    tableau = pd.concat(
+        [created, consumed, stored, imported, exported, overprod,
+         dsm],
+        axis=1,
+        keys=['Created', 'Consumed', 'Storage', 'Import from',
+              'Export to', 'Balance', 'DSM'])
+
+    # timeseries sums
+    sums = pd.concat([created.sum(), consumed.sum(),
+                      stored.sum().drop('Level'),
+                      imported.sum(), exported.sum(),
+                      overprod.sum(), dsm.sum()],
+                     axis=0,
+                     keys=['Created', 'Consumed', 'Storage',
+                           'Import', 'Export', 'Balance',
+                           'DSM'])
+    return tableau, sums
+
+
+def _report_groups(report_tuples, report_sites_name):
+    # sites of the report tuples by (sheet name, com); tuples of the same
+    # name and commodity are added together into one sheet
+    groups = {}
+    for sit, com in report_tuples:
+        # wrap single site name in 1-element list for consistent behavior
+        if is_string(sit):
+            help_sit = [sit]
+        else:
+            help_sit = list(sit)
+            sit = tuple(sit)
+        name = report_sites_name.get(sit, str(sit))
+        groups.setdefault((name, com), []).extend(help_sit)
+    return groups
+
+
+def _sheet_names(groups):
+    # timeseries sheet name of each group; sheet names cannot be longer than
+    # 31 characters and must be unique (regardless of case), so names equal
+    # after the cut get a numbered suffix
+    used = {name.lower() for name in REPORT_SHEETS}
+    sheet_names = {}
+    for name, com in groups:
+        full_name = "{}.{} timeseries".format(name, com)
+        sheet_name = full_name[:31]
+        number = 1
+        while sheet_name.lower() in used:
+            number += 1
+            suffix = '~{}'.format(number)
+            sheet_name = full_name[:31 - len(suffix)] + suffix
+        used.add(sheet_name.lower())
+        sheet_names[(name, com)] = sheet_name
+    return sheet_names
+
+
+def _group_tableau(instance, cube, com, help_sit):
+    # sum tableaus of all sites in a group; only one group is held at once
+    tableau, sums = None, None
+    for lv in help_sit:
+        help_tableau, help_sums = _timeseries_tableau(instance, cube, com,
+                                                      lv)
+        if tableau is None:
+            tableau, sums = help_tableau, help_sums
+        else:
+            tableau = tableau.add(help_tableau, axis=1, fill_value=0)
+            sums = sums.add(help_sums, fill_value=0)
+    return tableau, sums
+
+
+# result cube of a report worker process, set by _init_worker
+_worker_cube = None
+
+
+def _init_worker(cube):
+    global _worker_cube
+    _worker_cube = cube
+
+
+def _write_timeseries_file(instance, cube, help_sit, com, filename,
+                           file_format):
+    # compute and write one timeseries file, return its sums; workers have
+    # no instance, only the cube
+    if cube is None:
+        cube = _worker_cube
+    tableau, sums = _group_tableau(instance, cube, com, help_sit)
+    if file_format == 'parquet':
+        # parquet needs flat string column labels
+        tableau.columns = ['.'.join(map(str, col))
+                           for col in tableau.columns]
+        tableau.to_parquet(filename)
+    else:
+        tableau.to_csv(filename)
+    return sums
+
+
+def _report_streaming(instance, cube, filename, report_tuples,
+                      report_sites_name):
+    # spreadsheet report written sheet by sheet in constant-memory mode
+    import xlsxwriter
+
+    costs, cpro, ctra, csto = get_constants(instance, cube)
+
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+    try:
+        _write_frame(workbook.add_worksheet('Costs'), costs.to_frame())
+        _write_frame(workbook.add_worksheet('Process caps'), cpro)
+        _write_frame(workbook.add_worksheet('Transmission caps'), ctra)
+        _write_frame(workbook.add_worksheet('Storage caps'), csto)
+
+        if len(report_tuples) == 0:
+            return
+
+        # the sums sheet keeps its position, but is filled in last
+        sums_sheet = workbook.add_worksheet('Commodity sums')
+        energies = []
+
+        groups = _report_groups(report_tuples, report_sites_name)
+        sheet_names = _sheet_names(groups)
+        for (name, com), help_sit in groups.items():
+            tableau, sums = _group_tableau(instance, cube, com, help_sit)
+            energies.append(sums.to_frame("{}.{}".format(name, com)))
+            _write_frame(workbook.add_worksheet(sheet_names[(name, com)]),
+                         tableau)
+
+        _write_frame(sums_sheet, pd.concat(energies, axis=1).fillna(0))
+    finally:
+        workbook.close()
+
+
+def _write_frame(worksheet, df):
+    """Write a DataFrame to a worksheet strictly row by row.
+
+    In constant-memory mode, xlsxwriter flushes each row once a later row is
+    started, so cells must be written in row-major order. DataFrame.to_excel
+    writes column by column, which is why this small writer is used instead.
+
+    Args:
+        worksheet: an xlsxwriter worksheet
+        df: a DataFrame (with optional MultiIndex index and columns)
+
+    Returns:
+        Nothing
+    """
+    index_width = df.index.nlevels
+    row = 0
+
+    # one header row per column level, last one also carries index names
+    column_levels = df.columns.nlevels
+    for level in range(column_levels):
+        if column_levels > 1:
+            labels = df.columns.get_level_values(level)
+        else:
+            labels = df.columns
+        if level == column_levels - 1:
+            _write_cells(worksheet, row, 0, df.index.names)
+        _write_cells(worksheet, row, index_width, labels)
+        row += 1
+
+    for key, values in zip(df.index, df.values):
+        if index_width == 1:
+            key = (key,)
+        _write_cells(worksheet, row, 0, key)
+        _write_cells(worksheet, row, index_width, values)
+        row += 1
+
+
+def _write_cells(worksheet, row, col, values):
+    # write a row of cells, leaving empty/NaN cells blank
+    for offset, value in enumerate(values):
+        if hasattr(value, 'item'):
+            # numpy scalar to python scalar
+            value = value.item()
+        if value is None:
+            continue
+        if isinstance(value, float) and math.isnan(value):
+            continue
+        if not isinstance(value, (str, int, float)):
+            value = str(value)
+        worksheet.write(row, col + offset, value)
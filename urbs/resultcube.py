@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+from .input import get_input
+from .pyomoio import get_entity
+
+# variable families stored in a result cube:
+# family name: (dimension names, [entity names sharing these dimensions])
+CUBE_FAMILIES = {
+    'pro': (('t', 'sit', 'pro', 'com'), ['e_pro_in', 'e_pro_out']),
+    'tra': (('t', 'sit', 'sit_', 'tra', 'com'), ['e_tra_in', 'e_tra_out']),
+    'sto': (('t', 'sit', 'sto', 'com'),
+            ['e_sto_con', 'e_sto_in', 'e_sto_out']),
+    'stock': (('t', 'sit', 'com', 'com_type'), ['e_co_stock']),
+    'cap_pro': (('sit', 'pro'), ['cap_pro', 'cap_pro_new']),
+    'cap_tra': (('sit', 'sit_', 'tra', 'com'), ['cap_tra', 'cap_tra_new']),
+    'cap_sto': (('sit', 'sto', 'com'),
+                ['cap_sto_c', 'cap_sto_c_new', 'cap_sto_p', 'cap_sto_p_new']),
+    'costs': (('cost_type',), ['costs']),
+    }
+
+
+class Axis(object):
+    """Ordered labels of one cube dimension with constant-time lookups.
+
+    Args:
+        name: dimension name, e.g. 't' or 'sit'
+        labels: iterable of unique labels, in axis order
+    """
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = list(labels)
+        self._pos = {label: k for k, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self._pos
+
+    def __repr__(self):
+        return 'Axis({!r}, {} labels)'.format(self.name, len(self.labels))
+
+    def loc(self, label):
+        """Return position of a single label; raises KeyError if unknown."""
+        return self._pos[label]
+
+    def locs(self, labels):
+        """Return positions of all known labels, silently skipping others."""
+        pos = self._pos
+        return np.array([pos[label] for label in labels if label in pos],
+                        dtype=int)
+
+
+class CubeFamily(object):
+    """Dense arrays of several variables sharing the same dimensions.
+
+    Attributes:
+        dims: tuple of dimension names
+        axes: dict of dimension name -> Axis
+        values: dict of variable name -> ndarray of shape (len(axes[d]) ...)
+        mask: boolean ndarray, True where an index tuple is defined
+    """
+    def __init__(self, dims, axes, values, mask):
+        self.dims = tuple(dims)
+        self.axes = axes
+        self.values = values
+        self.mask = mask
+
+    @property
+    def shape(self):
+        return tuple(len(self.axes[dim]) for dim in self.dims)
+
+
+class ResultCube(object):
+    """Result container with dense NumPy arrays per variable family.
+
+    The cube is built once from a solved urbs instance (or a loaded result
+    container) by `create_result_cube`. Every variable family holds dense
+    arrays with labelled axes, so that slicing by time, site, process or
+    commodity is done by integer indexing instead of pandas MultiIndex
+    operations. Undefined index combinations are filled with zeros; the
+    family's mask tells them apart from actual zero values.
+
+    Attributes:
+        families: dict of family name -> CubeFamily
+        timesteps: list of modelled timesteps (set 'tm')
+        sites: Axis of all sites from the input sheet 'Site'
+    """
+    def __init__(self, families, timesteps, sites):
+        self.families = families
+        self.timesteps = list(timesteps)
+        self.sites = sites
+        self._family_of = {}
+        for family_name, family in families.items():
+            for name in family.values:
+                self._family_of[name] = family
+
+    def __contains__(self, name):
+        return name in self._family_of
+
+    def family(self, name):
+        """Return the CubeFamily holding variable (or family) name."""
+        if name in self.families:
+            return self.families[name]
+        return self._family_of[name]
+
+    def axis(self, name, dim):
+        """Return the Axis of dimension dim for variable name."""
+        return self.family(name).axes[dim]
+
+    def select(self, name, **selection):
+        """Return a sub-array of variable name.
+
+        Args:
+            name: variable name, e.g. 'e_pro_out'
+            **selection: dimension name -> label or list of labels. A single
+                label drops that dimension, a list keeps it (unknown labels
+                in a list are skipped). Dimensions not given are kept whole.
+
+        Returns:
+            (array, dims) tuple: the selected ndarray and its dimension names
+        """
+        family = self.family(name)
+        array = family.values[name]
+        dims = []
+        axis_no = 0
+        for dim in family.dims:
+            if dim not in selection or selection[dim] is None:
+                dims.append(dim)
+                axis_no += 1
+                continue
+            labels = selection[dim]
+            axis = family.axes[dim]
+            if isinstance(labels, (list, tuple, set, range, np.ndarray,
+                                   pd.Index)):
+                array = array.take(axis.locs(labels), axis=axis_no)
+                dims.append(dim)
+                axis_no += 1
+            else:
+                array = array.take(axis.loc(labels), axis=axis_no)
+        return array, tuple(dims)
+
+    def sum(self, name, keep=('t',), **selection):
+        """Select from variable name and sum over all dimensions not kept.
+
+        Args:
+            name: variable name, e.g. 'e_pro_out'
+            keep: dimension names to keep, in the desired output order
+            **selection: see `select`
+
+        Returns:
+            ndarray with one axis per kept dimension
+        """
+        array, dims = self.select(name, **selection)
+        keep = [dim for dim in keep if dim in dims]
+        summed = tuple(k for k, dim in enumerate(dims) if dim not in keep)
+        if summed:
+            array = array.sum(axis=summed)
+        remaining = [dim for dim in dims if dim in keep]
+        return array.transpose([remaining.index(dim) for dim in keep])
+
+    def labels(self, name, dim, selection=None):
+        """Return axis labels of dimension dim, optionally only those given.
+
+        Args:
+            name: variable name
+            dim: dimension name
+            selection: (optional) list of labels; if given, only the known
+                labels of this list are returned, in the same order as
+                `select` arranges them
+
+        Returns:
+            list of labels
+        """
+        axis = self.axis(name, dim)
+        if selection is None:
+            return list(axis.labels)
+        return [axis.labels[k] for k in axis.locs(selection)]
+
+    def to_frame(self, names):
+        """Return defined entries of variables as a long-format DataFrame.
+
+        Args:
+            names: list of variable names of the same family
+
+        Returns:
+            a DataFrame with the family dimensions as (Multi)Index and one
+            column per variable, identical to `get_entities`
+        """
+        family = self.family(names[0])
+        positions = np.nonzero(family.mask)
+        if len(positions[0]) == 0:
+            return pd.DataFrame()
+        levels = [np.asarray(family.axes[dim].labels, dtype=object)[pos]
+                  for dim, pos in zip(family.dims, positions)]
+        if len(levels) > 1:
+            index = pd.MultiIndex.from_arrays(levels, names=family.dims)
+        else:
+            index = pd.Index(levels[0], name=family.dims[0])
+        return pd.DataFrame({name: family.values[name][positions]
+                             for name in names},
+                            index=index, columns=names)
+
+    def to_series(self, name):
+        """Return defined entries of variable name as long-format Series."""
+        frame = self.to_frame([name])
+        if frame.empty:
+            return pd.Series(name=name)
+        return frame[name]
+
+
+def _build_family(dims, names, series, time_axis):
+    # per-dimension axes from the labels occurring in this family only,
+    # except for the time axis, which is shared by all families
+    non_empty = [s for s in series if not s.empty]
+    axes = {}
+    for k, dim in enumerate(dims):
+        if dim == 't':
+            axes[dim] = time_axis
+            continue
+        labels = set()
+        for s in non_empty:
+            labels.update(s.index.get_level_values(k))
+        axes[dim] = Axis(dim, sorted(labels))
+
+    lookup = {dim: pd.Index(axes[dim].labels) for dim in dims}
+    shape = tuple(len(axes[dim]) for dim in dims)
+    mask = np.zeros(shape, dtype=bool)
+    values = {}
+    for name, s in zip(names, series):
+        array = np.zeros(shape)
+        if not s.empty:
+            position = tuple(
+                lookup[dim].get_indexer(s.index.get_level_values(k))
+                for k, dim in enumerate(dims))
+            array[position] = s.values.astype(float)
+            mask[position] = True
+        values[name] = array
+    return CubeFamily(dims, axes, values, mask)
+
+
+def _build_demand(demand, time_axis):
+    # input demand timeseries as family ('t', 'sit', 'com')
+    if demand.empty:
+        columns = []
+    else:
+        columns = list(demand.columns)
+    axes = {'t': time_axis,
+            'sit': Axis('sit', sorted(set(c[0] for c in columns))),
+            'com': Axis('com', sorted(set(c[1] for c in columns)))}
+    shape = (len(axes['t']), len(axes['sit']), len(axes['com']))
+    array = np.zeros(shape)
+    mask = np.zeros(shape, dtype=bool)
+    rows = demand.index.get_indexer(time_axis.labels)
+    defined = rows >= 0
+    for sit, com in columns:
+        k, j = axes['sit'].loc(sit), axes['com'].loc(com)
+        array[defined, k, j] = demand[(sit, com)].values[rows[defined]]
+        mask[defined, k, j] = True
+    return CubeFamily(('t', 'sit', 'com'), axes, {'demand': array}, mask)
+
+
+def create_result_cube(prob):
+    """Create a ResultCube from a solved urbs instance or result container.
+
+    Usage:
+        cube = create_result_cube(prob)
+        created = get_timeseries(prob, 'Elec', 'Mid', cube=cube)[0]
+
+    Given the cube, `get_timeseries` and `get_constants` read from it instead
+    of re-deriving the pandas reshapes for every call. The cube is a snapshot
+    of the current solution: create a new one after a re-solve.
+
+    Args:
+        prob: a urbs model instance containing a solution, or a result
+            container as returned by `load`
+
+    Returns:
+        a ResultCube
+    """
+    time_axis = Axis('t', sorted(get_entity(prob, 't').index))
+    timesteps = sorted(get_entity(prob, 'tm').index)
+    sites = Axis('sit', get_input(prob, 'site').index)
+
+    families = {}
+    for family_name, (dims, names) in CUBE_FAMILIES.items():
+        series = [get_entity(prob, name) for name in names]
+        families[family_name] = _build_family(dims, names, series, time_axis)
+    families['demand'] = _build_demand(get_input(prob, 'demand'), time_axis)
+
+    return ResultCube(families, timesteps, sites)
@@ -1,11 +1,29 @@
 import pandas as pd
 
 
+class ValidationError(ValueError):
+    """Raised by validate_input; holds all violations found in the input.
+
+    Attributes:
+        violations: DataFrame as returned by check_input
+    """
+    def __init__(self, violations):
+        self.violations = violations
+        lines = ['{} {}: {}'.format(v.sheet, v.label, v.message)
+                 if v.label is not None else
+                 '{}: {}'.format(v.sheet, v.message)
+                 for v in violations.itertuples()]
+        super(ValidationError, self).__init__(
+            '{} input violation(s) found:\n'.format(len(lines)) +
+            '\n'.join(lines))
+
+
 def validate_input(data):
     """ Input validation function
 
     This function raises errors if inconsistent or illogical inputs are
-    made, that might lead to erreneous results.
+    made, that might lead to erreneous results. All violations are collected
+    first (see check_input) and reported together.
 
     Args:
         data: Input data frames as read in by input.read_excel
@@ -13,119 +31,139 @@ def validate_input(data):
     Returns:
         Customized error messages.
 
+    Raises:
+        ValidationError: a ValueError listing all violations
+
     """
+    violations = check_input(data)
+    if not violations.empty:
+        raise ValidationError(violations)
+
+
+def check_input(data):
+    """ Collect all input violations without raising
+
+    All checks work on whole columns and on set differences of the index
+    frames, so the run time grows linearly with the input size.
+
+    Args:
+        data: Input data frames as read in by input.read_excel
+
+    Returns:
+        DataFrame with one row per violation and the columns 'sheet',
+        'check', 'label' (offending row label or None) and 'message';
+        empty if the input is valid
+
+    """
+    violations = []
+
+    def add(sheet, check, message, label=None):
+        violations.append((sheet, check, label, message))
+
+    def add_rows(sheet, check, message, mask):
+        for label in mask.index[mask.values]:
+            add(sheet, check, message, label)
+
+    process = data['process']
+    transmission = data['transmission']
+    storage = data['storage']
+    commodity = data['commodity']
 
     # Ensure correct formation of vertex rule
-    for (sit, pro) in data['process'].index:
-        for com in data['commodity'].index.get_level_values('Commodity'):
-            simplified_pro_com_index = ([(p, c) for p, c, d in
-                                        data['process_commodity'].index
-                                        .tolist()])
-            simplified_com_index = ([(s, c) for s, c, t in data['commodity']
-                                    .index.tolist()])
-            if ((pro, com) in simplified_pro_com_index and
-                    (sit, com) not in simplified_com_index):
-                raise ValueError('Commodities used in a process at a site must'
-                                 ' be specified in the commodity input sheet'
-                                 '! The pair (' + sit + ',' + com + ')'
-                                 ' is not in commodity input sheet.')
+    pro_com = (process.index.to_frame(index=False)[['Site', 'Process']]
+               .merge(data['process_commodity'].index
+                      .to_frame(index=False)[['Process', 'Commodity']],
+                      on='Process'))
+    used = set(zip(pro_com['Site'], pro_com['Commodity']))
+    defined = set(zip(commodity.index.get_level_values('Site'),
+                      commodity.index.get_level_values('Commodity')))
+    known = set(commodity.index.get_level_values('Commodity'))
+    for sit, com in sorted(used - defined):
+        if com in known:
+            add('Commodity', 'vertex rule',
+                'Commodities used in a process at a site must be '
+                'specified in the commodity input sheet! The pair (' +
+                sit + ',' + com + ') is not in commodity input sheet.',
+                (sit, com))
 
     # Identify infeasible process, transmission and storage capacity
     # constraints before solving
-    for index in data['process'].index:
-        if not (data['process'].loc[index]['cap-lo'] <=
-                data['process'].loc[index]['cap-up'] and
-                data['process'].loc[index]['inst-cap'] <=
-                data['process'].loc[index]['cap-up']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all processes.')
-
-    for index in data['transmission'].index:
-        if not (data['transmission'].loc[index]['cap-lo'] <=
-                data['transmission'].loc[index]['cap-up'] and
-                data['transmission'].loc[index]['inst-cap'] <=
-                data['transmission'].loc[index]['cap-up']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all transmissions.')
-
-    for index in data['storage'].index:
-        if not (data['storage'].loc[index]['cap-lo-p'] <=
-                data['storage'].loc[index]['cap-up-p'] and
-                data['storage'].loc[index]['inst-cap-p'] <=
-                data['storage'].loc[index]['cap-up-p']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all storage powers.')
-
-        elif not (data['storage'].loc[index]['cap-lo-c'] <=
-                  data['storage'].loc[index]['cap-up-c'] and
-                  data['storage'].loc[index]['inst-cap-c'] <=
-                  data['storage'].loc[index]['cap-up-c']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all storage capacities.')
-                                 
-    if 'ep-ratio' in list(data['storage']):
-        if (data['storage']['ep-ratio'] <= 0).any():
-            raise ValueError("In worksheet 'storage' all values in column 'ep-ratio'"
-                             " must be either positive (for a fixed energy-to-power"
-                             " ratio) or left empty for independent sizing of"
-                             " storage energy and power capacities.")    
-        for index in data['storage'].index:
-            if data['storage'].loc[index]['ep-ratio'] > 0: 
-                if (data['storage'].loc[index]['cap-lo-p'] *
-                    data['storage'].loc[index]['ep-ratio'] >
-                    data['storage'].loc[index]['cap-up-c'] or
-                    data['storage'].loc[index]['cap-up-p'] *
-                    data['storage'].loc[index]['ep-ratio'] <
-                    data['storage'].loc[index]['cap-lo-c']):
-                    raise ValueError('Ensure that the upper and lower limits for'
-                                ' power and energy capacities of the storage '
-                                +str(index)+
-                                ' are consistent with the given energy-to'
-                                '-power ratio.')
-        
+    add_rows('Process', 'capacity bounds',
+             'Ensure cap_lo <= cap_up and inst_cap <= cap_up'
+             ' for all processes.',
+             ~((process['cap-lo'] <= process['cap-up']) &
+               (process['inst-cap'] <= process['cap-up'])))
+
+    if not transmission.empty:
+        add_rows('Transmission', 'capacity bounds',
+                 'Ensure cap_lo <= cap_up and inst_cap <= cap_up'
+                 ' for all transmissions.',
+                 ~((transmission['cap-lo'] <= transmission['cap-up']) &
+                   (transmission['inst-cap'] <= transmission['cap-up'])))
+
+    if not storage.empty:
+        add_rows('Storage', 'power bounds',
+                 'Ensure cap_lo <= cap_up and inst_cap <= cap_up'
+                 ' for all storage powers.',
+                 ~((storage['cap-lo-p'] <= storage['cap-up-p']) &
+                   (storage['inst-cap-p'] <= storage['cap-up-p'])))
+        add_rows('Storage', 'capacity bounds',
+                 'Ensure cap_lo <= cap_up and inst_cap <= cap_up'
+                 ' for all storage capacities.',
+                 ~((storage['cap-lo-c'] <= storage['cap-up-c']) &
+                   (storage['inst-cap-c'] <= storage['cap-up-c'])))
+
+    if 'ep-ratio' in list(storage):
+        ep_ratio = storage['ep-ratio']
+        add_rows('Storage', 'ep-ratio sign',
+                 "All values in column 'ep-ratio' must be either positive "
+                 "(for a fixed energy-to-power ratio) or left empty for "
+                 "independent sizing of storage energy and power "
+                 "capacities.",
+                 ep_ratio <= 0)
+        add_rows('Storage', 'ep-ratio bounds',
+                 'Ensure that the upper and lower limits for power and '
+                 'energy capacities of the storage are consistent with the '
+                 'given energy-to-power ratio.',
+                 (ep_ratio > 0) &
+                 ((storage['cap-lo-p'] * ep_ratio > storage['cap-up-c']) |
+                  (storage['cap-up-p'] * ep_ratio < storage['cap-lo-c'])))
+
     # Identify SupIm values larger than 1, which lead to an infeasible model
-    if (data['supim'] > 1).sum().sum() > 0:
-        raise ValueError('All values in Sheet SupIm must be <= 1.')
+    supim_max = data['supim'].max()
+    add_rows('SupIm', 'supim range',
+             'All values in Sheet SupIm must be <= 1.',
+             supim_max > 1)
 
     # Identify non sensible values for inputs
-    if (data['storage']['init'] > 1).any():
-        raise ValueError("In worksheet 'storage' all values in column 'init'"
-                         " must be either in [0,1] (for a fixed initial"
-                         " storage level) or 'nan' for a variable initial"
-                         " storage level")
+    if 'init' in list(storage):
+        add_rows('Storage', 'init range',
+                 "All values in column 'init' must be either in [0,1] (for "
+                 "a fixed initial storage level) or 'nan' for a variable "
+                 "initial storage level",
+                 storage['init'] > 1)
 
     # Identify outdated column label 'maxperstep' on the commodity tab and
     # suggest a rename to 'maxperhour'
-    if 'maxperstep' in list(data['commodity']):
-        raise KeyError("Maximum allowable commodities are defined by per "
-                       "hour. Please change the column name 'maxperstep' "
-                       "in the commodity worksheet to 'maxperhour' and "
-                       "ensure that the input values are adjusted "
-                       "correspondingly.")
+    if 'maxperstep' in list(commodity):
+        add('Commodity', 'outdated column',
+            "Maximum allowable commodities are defined by per hour. Please "
+            "change the column name 'maxperstep' in the commodity worksheet "
+            "to 'maxperhour' and ensure that the input values are adjusted "
+            "correspondingly.")
 
     # Identify inconsistencies in site names throughout worksheets
-    for site in data['site'].index.tolist():
-        if site not in data['commodity'].index.levels[0].tolist():
-            raise KeyError("All names in the column 'Site' in input worksheet "
-                           "'Commodity' must be from the list of site names "
-                           "specified in the worksheet 'Site'.")
-
-    for site in data['site'].index.tolist():
-        if site not in data['process'].index.levels[0].tolist():
-            raise KeyError("All names in the column 'Site' in input worksheet "
-                           "'Process' must be from the list of site names "
-                           "specified in the worksheet 'Site'.")
-
-    if not data['storage'].empty:
-        for site in data['site'].index.tolist():
-            if site not in data['storage'].index.levels[0].tolist():
-                raise KeyError("All names in the column 'Site' in input "
-                               "worksheet 'Storage' must be from the list of "
-                               "site names specified in the worksheet 'Site'.")
-
-    if not data['dsm'].empty:
-        for site in data['site'].index.tolist():
-            if site not in data['dsm'].index.levels[0].tolist():
-                raise KeyError("All names in the column 'Site' in input "
-                               "worksheet 'DSM' must be from the list of site "
-                               "names specified in the worksheet 'Site'.")
+    sites = set(data['site'].index)
+    for sheet, key in [('Commodity', 'commodity'), ('Process', 'process'),
+                       ('Storage', 'storage'), ('DSM', 'dsm')]:
+        df = data.get(key)
+        if df is None or df.empty:
+            continue
+        for site in sorted(sites - set(df.index.get_level_values(0))):
+            add(sheet, 'site names',
+                "All names in the column 'Site' in input worksheet '{}' "
+                "must be from the list of site names specified in the "
+                "worksheet 'Site'.".format(sheet), site)
+
+    return pd.DataFrame(violations,
+                        columns=['sheet', 'check', 'label', 'message'])